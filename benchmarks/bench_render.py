@@ -0,0 +1,51 @@
+"""
+Compare the heatmap render modes of the kamaji CLI.
+
+Usage:
+    python benchmarks/bench_render.py [--repeat 5] [--dpi 400]
+"""
+
+import argparse
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from kamaji.rendering import HeatmapRenderer  # noqa: E402
+
+CASES = [
+    ("annotated", "png"),
+    ("annotated", "svg"),
+    ("fast", "png"),
+    ("fast", "svg"),
+    ("raw", "png"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dpi", type=int, default=400)
+    args = parser.parse_args()
+
+    counts = np.random.default_rng(0).poisson(3, size=(31, 12))
+    renderer = HeatmapRenderer()
+
+    print(f"{'mode':<10} {'format':<6} {'best (s)':>10} {'mean (s)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, fmt in CASES:
+            output = Path(tmp) / f"heatmap.{fmt}"
+            timings = timeit.repeat(
+                lambda: renderer.render(counts, output, fmt=fmt, dpi=args.dpi, mode=mode),
+                number=1,
+                repeat=args.repeat,
+            )
+            print(f"{mode:<10} {fmt:<6} {min(timings):>10.3f} {sum(timings) / len(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
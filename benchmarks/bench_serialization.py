@@ -0,0 +1,72 @@
+"""
+Compare the JSON backends, and boto3's typed-value conversion with the codec's, on large synthetic histories.
+
+Times encoding and decoding a user's whole attributes: as JSON with every
+installed backend (CSV exports, local persistence), as the typed values of
+a DynamoDB item, and as a compressed archive blob.
+
+Usage:
+    python benchmarks/bench_serialization.py [--events 20000] [--number 20] [--repeat 5]
+"""
+
+import argparse
+import sys
+import timeit
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "lambda"))
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer  # noqa: E402
+
+from kamaji.synthetic import GeneratorConfig, generate_user  # noqa: E402
+from persistence import JSON_BACKENDS, deserialize_map, load_json_backend, serialize_map  # noqa: E402
+
+
+def _time(function, number: int, repeat: int) -> float:
+    """Best time of one call, in milliseconds."""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000, help="Events in the synthetic history")
+    parser.add_argument("--number", type=int, default=20, help="Calls per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    _, attributes = generate_user(0, GeneratorConfig(users=1, events=args.events))
+    serializer, deserializer = TypeSerializer(), TypeDeserializer()
+    typed = serializer.serialize(attributes)
+    print(f"{len(attributes)} days, {args.events} events, {len(load_json_backend('json').dumps(attributes))} bytes of JSON")
+
+    print(f"\n{'typed values':<14} {'encode (ms)':>12} {'decode (ms)':>12}")
+    for name, encode, decode in (
+        ("boto3", serializer.serialize, deserializer.deserialize),
+        ("codec", serialize_map, deserialize_map),
+    ):
+        encoding = _time(lambda: encode(attributes), args.number, args.repeat)
+        decoding = _time(lambda: decode(typed), args.number, args.repeat)
+        print(f"{name:<14} {encoding:>12.2f} {decoding:>12.2f}")
+
+    print(f"\n{'JSON backend':<14} {'dumps (ms)':>12} {'loads (ms)':>12} {'typed (ms)':>12} {'archive (ms)':>13}")
+    for name in JSON_BACKENDS:
+        try:
+            backend = load_json_backend(name)
+        except ImportError:
+            print(f"{name:<14} {'not installed':>12}")
+            continue
+        data = backend.dumps(attributes)
+        typed_data = backend.dumps(typed)
+        blob = zlib.compress(data)
+        dumping = _time(lambda: backend.dumps(attributes), args.number, args.repeat)
+        loading = _time(lambda: backend.loads(data), args.number, args.repeat)
+        # A DynamoDB JSON export row, decoded into the days it holds
+        typed_loading = _time(lambda: deserialize_map(backend.loads(typed_data)), args.number, args.repeat)
+        archive_loading = _time(lambda: backend.loads_days(zlib.decompress(blob)), args.number, args.repeat)
+        print(f"{name:<14} {dumping:>12.2f} {loading:>12.2f} {typed_loading:>12.2f} {archive_loading:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare building the static intents' responses on each request with returning prebuilt ones.
+
+Times each handler's handle() on a real HandlerInput, as the skill pipeline
+calls it after the localization interceptor ran.
+
+Usage:
+    python benchmarks/bench_static_responses.py [--number 20000] [--repeat 5] [--locale it-IT]
+"""
+
+import argparse
+import logging
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "lambda"))
+
+from ask_sdk_core.attributes_manager import AttributesManager  # noqa: E402
+from ask_sdk_core.handler_input import HandlerInput  # noqa: E402
+from ask_sdk_core.response_helper import ResponseFactory  # noqa: E402
+from ask_sdk_model import IntentRequest, LaunchRequest, RequestEnvelope  # noqa: E402
+from ask_sdk_model.intent import Intent  # noqa: E402
+
+from constants import intents  # noqa: E402
+from handlers import (  # noqa: E402
+    CancelOrStopIntentHandler,
+    FallbackIntentHandler,
+    HelpIntentHandler,
+    LaunchRequestHandler,
+    StaticResponses,
+)
+from interceptors import LocalizationInterceptor  # noqa: E402
+
+CASES = [
+    ("Launch", LaunchRequestHandler, None),
+    ("Help", HelpIntentHandler, intents.AMAZON_HELP),
+    ("CancelOrStop", CancelOrStopIntentHandler, intents.AMAZON_STOP),
+    ("Fallback", FallbackIntentHandler, intents.AMAZON_FALLBACK),
+]
+
+
+def _handler_input(localization: LocalizationInterceptor, locale: str, intent_name) -> HandlerInput:
+    if intent_name is None:
+        request = LaunchRequest(request_id="bench", locale=locale)
+    else:
+        request = IntentRequest(request_id="bench", locale=locale, intent=Intent(name=intent_name))
+    handler_input = HandlerInput(
+        request_envelope=RequestEnvelope(request=request),
+        attributes_manager=AttributesManager(request_envelope=RequestEnvelope(request=request)),
+    )
+    localization.process(handler_input)
+    return handler_input
+
+
+def _handle(handler, handler_input: HandlerInput):
+    # Every request gets a fresh response builder
+    handler_input.response_builder = ResponseFactory()
+    return handler.handle(handler_input)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--locale", default="it-IT")
+    args = parser.parse_args()
+
+    # Handlers log every entry at INFO, which would dominate the timings
+    logging.disable(logging.INFO)
+    localization = LocalizationInterceptor()
+    static_responses = StaticResponses(localization.strings_for)
+
+    print(f"{'handler':<14} {'built (us)':>11} {'prebuilt (us)':>14} {'saving':>8}")
+    for name, handler_class, intent_name in CASES:
+        handler_input = _handler_input(localization, args.locale, intent_name)
+        built = handler_class()
+        prebuilt = handler_class(static_responses)
+        static_responses.preload([prebuilt], [args.locale])
+        timings = {}
+        for label, handler in (("built", built), ("prebuilt", prebuilt)):
+            best = min(timeit.repeat(
+                lambda: _handle(handler, handler_input),
+                number=args.number,
+                repeat=args.repeat,
+            ))
+            timings[label] = best / args.number * 1e6
+        saving = 1 - timings["prebuilt"] / timings["built"]
+        print(f"{name:<14} {timings['built']:>11.2f} {timings['prebuilt']:>14.2f} {saving:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Merge the request profiles written by the skill's profiling interceptors.
+
+Copy the .pstats files out of the Lambda's /tmp (or KAMAJI_PROFILE_DIR), then:
+
+Usage:
+    python benchmarks/merge_pstats.py profiles/*.pstats [--top 30] [--sort tottime] [--output merged.pstats]
+"""
+
+import argparse
+import pstats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profiles", nargs="+", help=".pstats files to merge")
+    parser.add_argument("--top", type=int, default=30, help="Functions to print")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key, e.g. cumulative or tottime")
+    parser.add_argument("--output", help="Also write the merged profile, e.g. for snakeviz")
+    args = parser.parse_args()
+
+    stats = pstats.Stats(*args.profiles)
+    print(f"Merged {len(args.profiles)} profiles")
+    if args.output:
+        stats.dump_stats(args.output)
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Parsing of exported persistent attributes into flat integer arrays."""
+
+import csv
+import gzip
+import sys
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TypedDict
+
+import numpy as np
+
+from persistence.codec import loads
+from persistence.recurring import RECURRING_KEY
+from persistence.schema import is_reserved_key
+
+# A single user's attributes can easily exceed the csv module's 128 KiB default
+csv.field_size_limit(sys.maxsize)
+
+
+class Activity(TypedDict):
+    S: str
+
+
+class ActivityList(TypedDict):
+    L: list[Activity]
+
+
+class YearActivities(TypedDict):
+    M: dict[str, ActivityList]
+
+
+UserActivities = tuple[str, dict[str, YearActivities]]
+
+
+def _recurring_cells(
+    recurring: dict, first_year: int, last_year: int
+) -> Iterator[tuple[int, int, int]]:
+    """
+    Yield a (year, month, day) cell for every year a typed recurring event occurs in.
+
+    Open-ended events span ``first_year`` to ``last_year``.
+    """
+    for recurring_date, recurrences in recurring["M"].items():
+        recurring_month, recurring_day = (int(part) for part in recurring_date.split("-"))
+        for recurrence in recurrences["L"]:
+            fields = recurrence["M"]
+            start = int(fields["start"]["N"]) if "start" in fields else first_year
+            end = int(fields["end"]["N"]) if "end" in fields else last_year
+            for recurring_year in range(start, end + 1):
+                yield recurring_year, recurring_month, recurring_day
+
+
+@dataclass
+class ActivityArrays:
+    """
+    Column-oriented view of every (user, year, month, day) cell with events.
+
+    ``user`` holds indexes into ``users``; ``count`` is the number of events
+    stored in that cell.
+    """
+
+    users: list[str]
+    user: np.ndarray
+    year: np.ndarray
+    month: np.ndarray
+    day: np.ndarray
+    count: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    @property
+    def years(self) -> np.ndarray:
+        return np.unique(self.year)
+
+
+def read_export(activities_file_path: Path) -> Iterator[UserActivities]:
+    """Yield (user id, attributes) for every row of a console CSV export."""
+    with open(activities_file_path, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row["id"], loads(row["attributes"])
+
+
+def read_dynamodb_json_export(activities_file_path: Path) -> Iterator[UserActivities]:
+    """Yield (user id, attributes) from a DynamoDB JSON lines export, optionally gzipped."""
+    opener = gzip.open if activities_file_path.suffix == ".gz" else open
+    with opener(activities_file_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = loads(line)["Item"]
+            yield item["id"]["S"], item["attributes"]["M"]
+
+
+def read_activities(activities_file_path: Path) -> Iterator[UserActivities]:
+    """Read a console CSV export or, for .json/.ndjson(.gz) files, a DynamoDB JSON export."""
+    suffixes = activities_file_path.suffixes
+    if suffixes[-1:] == [".gz"]:
+        suffixes = suffixes[:-1]
+    if suffixes[-1:] in ([".json"], [".ndjson"], [".jsonl"]):
+        return read_dynamodb_json_export(activities_file_path)
+    return read_export(activities_file_path)
+
+
+def parse_activities(items: Iterable[UserActivities], current_year: Optional[int] = None) -> ActivityArrays:
+    """
+    Flatten users' nested "M-D" -> year -> list maps into integer columns.
+
+    Recurring events count once in every year they occur in. Those without
+    a start or end year span the user's years with events, up to
+    ``current_year`` (this year by default).
+    """
+    current_year = current_year or date.today().year
+    users: list[str] = []
+    user, year, month, day, count = [], [], [], [], []
+    for user_id, activities in items:
+        user_idx = len(users)
+        users.append(user_id)
+        user_years = []
+        for activities_date, activities_years in activities.items():
+            if is_reserved_key(activities_date):
+                continue
+            activity_month, activity_day = activities_date.split("-")
+            for activity_year, activity_list in activities_years["M"].items():
+                user.append(user_idx)
+                year.append(int(activity_year))
+                month.append(int(activity_month))
+                day.append(int(activity_day))
+                count.append(len(activity_list["L"]))
+                user_years.append(int(activity_year))
+        if RECURRING_KEY in activities:
+            first_year = min(user_years, default=current_year)
+            last_year = max(user_years + [current_year])
+            for cell in _recurring_cells(activities[RECURRING_KEY], first_year, last_year):
+                user.append(user_idx)
+                year.append(cell[0])
+                month.append(cell[1])
+                day.append(cell[2])
+                count.append(1)
+    return ActivityArrays(
+        users=users,
+        user=np.array(user, dtype=np.int32),
+        year=np.array(year, dtype=np.int32),
+        month=np.array(month, dtype=np.int8),
+        day=np.array(day, dtype=np.int8),
+        count=np.array(count, dtype=np.int64),
+    )
+
+
+def month_day_counts(arrays: ActivityArrays, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sum events into the 31 x 12 (day x month) heatmap grid."""
+    counts = np.zeros((31, 12), dtype=np.int64)
+    day, month, count = arrays.day, arrays.month, arrays.count
+    if mask is not None:
+        day, month, count = day[mask], month[mask], count[mask]
+    np.add.at(counts, (day.astype(np.intp) - 1, month.astype(np.intp) - 1), count)
+    return counts
+
+
+def activity_grids(
+    arrays: ActivityArrays, by_user: bool = True, by_year: bool = True
+) -> Iterator[tuple[Optional[int], Optional[int], np.ndarray]]:
+    """
+    Sum cells into a 31 x 12 (day x month) grid per user and year, in that order.
+
+    Without ``by_user`` every user is merged into one grid per year, and
+    without ``by_year`` each grid covers a whole history; the merged axis
+    is yielded as None. Only groups with cells get a grid, so memory grows
+    with the cells rather than with users times years.
+
+    Yields:
+        (user index, year, grid) for every group
+    """
+    user = arrays.user.astype(np.int64) if by_user else np.zeros(len(arrays), dtype=np.int64)
+    year = arrays.year.astype(np.int64) if by_year else np.zeros(len(arrays), dtype=np.int64)
+    order = np.lexsort((year, user))
+    changes = (np.diff(user[order]) != 0) | (np.diff(year[order]) != 0)
+    for group in np.split(order, np.flatnonzero(changes) + 1):
+        if not len(group):
+            continue
+        grid = np.zeros((31, 12), dtype=np.int32)
+        np.add.at(
+            grid,
+            (arrays.day[group].astype(np.intp) - 1, arrays.month[group].astype(np.intp) - 1),
+            arrays.count[group].astype(np.int32),
+        )
+        first = group[0]
+        yield int(user[first]) if by_user else None, int(year[first]) if by_year else None, grid
@@ -0,0 +1,201 @@
+"""Calendar and weekday analytics computed from the parsed activity arrays."""
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from kamaji.activities import ActivityArrays
+from kamaji.rendering import WEEKDAY_LABELS, HeatmapRenderer
+
+# Weeks a Monday-first calendar year can touch (366 days starting on a Sunday)
+CALENDAR_WEEKS = 54
+
+
+@dataclass
+class Streak:
+    length: int
+    start: Optional[str]
+    end: Optional[str]
+
+
+@dataclass
+class CalendarAnalytics:
+    """
+    Every metric of the calendar subcommand.
+
+    ``yearly`` lists each year's total with its change from the previous year
+    that has events.
+    ``calendars`` maps a year to its 7 x 54 (weekday x week-of-year) grid,
+    Monday first. ``invalid_events`` counts events stored under day keys that
+    do not exist in their year, e.g. 2-30 or 2-29 outside leap years.
+    """
+
+    total_events: int
+    invalid_events: int
+    weekday_counts: np.ndarray
+    yearly: list[dict]
+    busiest_dates: list[tuple[str, int]]
+    longest_streak: Streak
+    calendars: dict[int, np.ndarray]
+
+
+def compute_calendar_analytics(
+    arrays: ActivityArrays,
+    mask: Optional[np.ndarray] = None,
+    top: int = 10,
+) -> CalendarAnalytics:
+    """
+    Derive all calendar metrics from one pass over the integer columns.
+
+    Each cell is converted once to a ``datetime64[D]``; weekdays, week
+    numbers, per-date totals and streaks are all derived from that array.
+    """
+    year, month, day, count = arrays.year, arrays.month, arrays.day, arrays.count
+    if mask is not None:
+        year, month, day, count = year[mask], month[mask], day[mask], count[mask]
+
+    months = ((year.astype(np.int64) - 1970) * 12 + month.astype(np.int64) - 1).astype("datetime64[M]")
+    dates = months.astype("datetime64[D]") + (day.astype(np.int64) - 1)
+    # Days past the end of the month roll into the next one
+    valid = (dates.astype("datetime64[M]") == months) & (day >= 1) & (month >= 1) & (month <= 12)
+    invalid_events = int(count[~valid].sum())
+    dates, count = dates[valid], count[valid]
+
+    # Per-date totals, sorted by date
+    unique_dates, date_idx = np.unique(dates, return_inverse=True)
+    date_totals = np.bincount(date_idx, weights=count, minlength=len(unique_dates)).astype(np.int64)
+
+    day_numbers = unique_dates.astype(np.int64)
+    # 1970-01-01 was a Thursday
+    weekdays = (day_numbers + 3) % 7
+    weekday_counts = np.bincount(weekdays, weights=date_totals, minlength=7).astype(np.int64)
+
+    date_years = unique_dates.astype("datetime64[Y]")
+    year_starts = date_years.astype("datetime64[D]").astype(np.int64)
+    day_of_year = day_numbers - year_starts
+    weeks = (day_of_year + (year_starts + 3) % 7) // 7
+
+    calendar_years = date_years.astype(np.int64) + 1970
+    years, year_idx = np.unique(calendar_years, return_inverse=True)
+    grids = np.zeros((len(years), 7, CALENDAR_WEEKS), dtype=np.int64)
+    np.add.at(grids, (year_idx, weekdays, weeks), date_totals)
+
+    yearly_totals = np.bincount(year_idx, weights=date_totals, minlength=len(years)).astype(np.int64)
+
+    return CalendarAnalytics(
+        total_events=int(date_totals.sum()),
+        invalid_events=invalid_events,
+        weekday_counts=weekday_counts,
+        yearly=_year_over_year(years, yearly_totals),
+        busiest_dates=_busiest_dates(unique_dates, date_totals, top),
+        longest_streak=_longest_streak(unique_dates),
+        calendars={int(y): grids[i] for i, y in enumerate(years)},
+    )
+
+
+def _year_over_year(years: np.ndarray, totals: np.ndarray) -> list[dict]:
+    previous = np.concatenate(([0], totals[:-1]))
+    deltas = totals - previous
+    pct = np.divide(
+        deltas * 100.0, previous, out=np.full(len(deltas), np.nan), where=previous != 0
+    )
+    rows = [
+        {
+            "year": int(y),
+            "events": int(t),
+            "delta": int(d),
+            "delta_pct": None if np.isnan(p) else round(float(p), 1),
+        }
+        for y, t, d, p in zip(years, totals, deltas, pct)
+    ]
+    if rows:
+        rows[0]["delta"] = None
+    return rows
+
+
+def _busiest_dates(dates: np.ndarray, totals: np.ndarray, top: int) -> list[tuple[str, int]]:
+    if len(totals) == 0 or top <= 0:
+        return []
+    top = min(top, len(totals))
+    candidates = np.argpartition(-totals, top - 1)[:top]
+    # Highest first, earliest date first on ties
+    order = candidates[np.lexsort((dates[candidates], -totals[candidates]))]
+    return [(str(dates[i]), int(totals[i])) for i in order]
+
+
+def _longest_streak(dates: np.ndarray) -> Streak:
+    if len(dates) == 0:
+        return Streak(0, None, None)
+    breaks = np.flatnonzero(np.diff(dates.astype(np.int64)) != 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(dates) - 1]))
+    longest = int(np.argmax(ends - starts))
+    return Streak(
+        length=int(ends[longest] - starts[longest] + 1),
+        start=str(dates[starts[longest]]),
+        end=str(dates[ends[longest]]),
+    )
+
+
+def analytics_to_dict(analytics: CalendarAnalytics) -> dict:
+    return {
+        "total_events": analytics.total_events,
+        "invalid_events": analytics.invalid_events,
+        "weekdays": dict(zip(WEEKDAY_LABELS, analytics.weekday_counts.tolist())),
+        "yearly": analytics.yearly,
+        "busiest_dates": [{"date": d, "events": n} for d, n in analytics.busiest_dates],
+        "longest_streak": asdict(analytics.longest_streak),
+        "calendars": {year: grid.tolist() for year, grid in analytics.calendars.items()},
+    }
+
+
+def write_json(analytics: CalendarAnalytics, output_dir: Path) -> list[Path]:
+    path = output_dir / "calendar.json"
+    with open(path, "w") as f:
+        json.dump(analytics_to_dict(analytics), f, indent=2)
+    return [path]
+
+
+def write_csv(analytics: CalendarAnalytics, output_dir: Path) -> list[Path]:
+    tables = {
+        "weekdays.csv": pd.DataFrame(
+            {"weekday": WEEKDAY_LABELS, "events": analytics.weekday_counts}
+        ),
+        "yearly.csv": pd.DataFrame(analytics.yearly, columns=["year", "events", "delta", "delta_pct"]),
+        "busiest_dates.csv": pd.DataFrame(analytics.busiest_dates, columns=["date", "events"]),
+        "summary.csv": pd.DataFrame([{
+            "total_events": analytics.total_events,
+            "invalid_events": analytics.invalid_events,
+            "longest_streak": analytics.longest_streak.length,
+            "longest_streak_start": analytics.longest_streak.start,
+            "longest_streak_end": analytics.longest_streak.end,
+        }]),
+    }
+    for year, grid in analytics.calendars.items():
+        tables[f"calendar_{year}.csv"] = pd.DataFrame(grid, index=WEEKDAY_LABELS)
+
+    paths = []
+    for name, table in tables.items():
+        path = output_dir / name
+        table.to_csv(path, index=name.startswith("calendar_"))
+        paths.append(path)
+    return paths
+
+
+def plot_calendars(
+    analytics: CalendarAnalytics,
+    output_dir: Path,
+    fmt: str = "png",
+    dpi: int = 200,
+) -> list[Path]:
+    renderer = HeatmapRenderer(figsize=(12, 2.8))
+    paths = []
+    for year, grid in analytics.calendars.items():
+        path = output_dir / f"calendar_{year}.{fmt}"
+        renderer.render_calendar(grid, path, title=str(year), fmt=fmt, dpi=dpi)
+        paths.append(path)
+    return paths
@@ -0,0 +1,241 @@
+"""Rollover of every user's old years into the compressed archive items the skill reads on demand."""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from kamaji.activities import YearActivities
+from kamaji.dynamo import (
+    ARCHIVE_ATTRIBUTE,
+    ATTRIBUTES_KEY,
+    PARTITION_KEY,
+    CapacityLimiter,
+    dynamodb_client,
+    is_user_item,
+    scan_segment,
+)
+from persistence.archive import ARCHIVE_PARTITION_SUFFIX, archive_years, decode_archive, encode_archive, merge_days
+from persistence.codec import deserialize_map, serialize_map
+from persistence.journal import JOURNAL_PARTITION_SUFFIX, JOURNAL_SEQ_KEY
+from persistence.schema import migrate_attributes
+from persistence.tags import rebuild_tag_index
+from persistence.versioning import VERSION_KEY, item_version
+
+logger = logging.getLogger(__name__)
+
+# How many failed users are kept, with their error, for the final report
+MAX_ERROR_SAMPLES = 20
+
+
+def archived_activities(item: dict) -> dict[str, YearActivities]:
+    """Typed "M-D" -> year -> list map of a scanned archive item."""
+    days = decode_archive(item[ARCHIVE_ATTRIBUTE]["B"])
+    return serialize_map(days)["M"]
+
+
+@dataclass
+class ArchiveStats:
+    """
+    Running totals across segments. ``deferred`` counts users whose journal
+    holds changes not yet folded into their item, left for the next run.
+    """
+
+    scanned: int = 0
+    archived_users: int = 0
+    archived_years: int = 0
+    deferred: int = 0
+    conflicts: int = 0
+    errors: int = 0
+    error_samples: list[tuple[str, str]] = field(default_factory=list)
+
+    def add(self, other: "ArchiveStats") -> None:
+        self.scanned += other.scanned
+        self.archived_users += other.archived_users
+        self.archived_years += other.archived_years
+        self.deferred += other.deferred
+        self.conflicts += other.conflicts
+        self.errors += other.errors
+        self.error_samples.extend(other.error_samples[:MAX_ERROR_SAMPLES - len(self.error_samples)])
+
+
+class _ConditionFailed(Exception):
+    pass
+
+
+class ItemArchiver:
+    """
+    Moves the old years of single users into their archive item.
+
+    The archive is written first and the user's item is then updated
+    conditioned on the version that was read, so a concurrent save by the
+    skill is never overwritten and an interruption at worst leaves events
+    in both items, which the next run or hydration merges back.
+    """
+
+    def __init__(
+        self,
+        client,
+        table_name: str,
+        horizon_year: int,
+        read_limiter: CapacityLimiter,
+        write_limiter: CapacityLimiter,
+        dry_run: bool = False,
+        max_attempts: int = 3,
+    ) -> None:
+        self.client = client
+        self.table_name = table_name
+        self.horizon_year = horizon_year
+        self.read_limiter = read_limiter
+        self.write_limiter = write_limiter
+        self.dry_run = dry_run
+        self.max_attempts = max_attempts
+
+    def _get(self, key: str) -> Optional[dict]:
+        self.read_limiter.wait()
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={PARTITION_KEY: {"S": key}},
+            ConsistentRead=True,
+            ReturnConsumedCapacity="TOTAL",
+        )
+        self.read_limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0))
+        return response.get("Item")
+
+    def _journal_pending(self, user: str, attributes: dict) -> bool:
+        # Journal entries may target the years about to move: wait for compaction
+        if JOURNAL_SEQ_KEY not in attributes:
+            return False
+        journal = self._get(user + JOURNAL_PARTITION_SUFFIX) or {}
+        end = int(journal.get("base", {"N": "0"})["N"]) + len(journal.get("entries", {"L": []})["L"])
+        return end > int(attributes[JOURNAL_SEQ_KEY])
+
+    def _write_archive(self, user: str, moved: dict) -> None:
+        item = self._get(user + ARCHIVE_PARTITION_SUFFIX)
+        days = decode_archive(item[ARCHIVE_ATTRIBUTE]["B"]) if item else {}
+        merge_days(days, moved)
+        self.write_limiter.wait()
+        response = self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                PARTITION_KEY: {"S": user + ARCHIVE_PARTITION_SUFFIX},
+                ARCHIVE_ATTRIBUTE: {"B": encode_archive(days)},
+            },
+            ReturnConsumedCapacity="TOTAL",
+        )
+        self.write_limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0))
+
+    def _write_item(self, user: str, attributes: dict, read_item_version: int) -> None:
+        values = {":new": serialize_map({**attributes, VERSION_KEY: read_item_version + 1})}
+        if read_item_version:
+            condition = "#a.#v = :v"
+            values[":v"] = {"N": str(read_item_version)}
+        else:
+            condition = "attribute_not_exists(#a.#v)"
+        self.write_limiter.wait()
+        try:
+            response = self.client.update_item(
+                TableName=self.table_name,
+                Key={PARTITION_KEY: {"S": user}},
+                UpdateExpression="SET #a = :new",
+                ConditionExpression=condition,
+                ExpressionAttributeNames={"#a": ATTRIBUTES_KEY, "#v": VERSION_KEY},
+                ExpressionAttributeValues=values,
+                ReturnConsumedCapacity="TOTAL",
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            raise _ConditionFailed()
+        self.write_limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0))
+
+    def archive(self, item: dict, stats: ArchiveStats) -> None:
+        """Roll over one scanned user, re-reading their item after conflicting writes."""
+        user = item[PARTITION_KEY]["S"]
+        stats.scanned += 1
+        try:
+            for _ in range(self.max_attempts):
+                attributes = deserialize_map(item.get(ATTRIBUTES_KEY, {"M": {}}))
+                read_item_version = item_version(attributes)
+                # Archives hold current-schema days only
+                migrate_attributes(attributes)
+                moved = archive_years(attributes, self.horizon_year)
+                if not moved:
+                    return
+                # Archived years are not indexed by category
+                rebuild_tag_index(attributes)
+                if self._journal_pending(user, attributes):
+                    stats.deferred += 1
+                    return
+                years = sum(len(years) for years in moved.values())
+                if not self.dry_run:
+                    try:
+                        self._write_archive(user, moved)
+                        self._write_item(user, attributes, read_item_version)
+                    except _ConditionFailed:
+                        stats.conflicts += 1
+                        item = self._get(user)
+                        if item is None:
+                            return
+                        continue
+                stats.archived_users += 1
+                stats.archived_years += years
+                return
+            raise RuntimeError(f"still conflicting after {self.max_attempts} attempts")
+        except Exception as e:
+            logger.warning(f"Could not archive {user}: {e}")
+            stats.errors += 1
+            if len(stats.error_samples) < MAX_ERROR_SAMPLES:
+                stats.error_samples.append((user, str(e)))
+
+
+def archive_table(
+    table_name: str,
+    horizon_year: int,
+    client=None,
+    segments: int = 4,
+    read_capacity: Optional[float] = None,
+    write_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> ArchiveStats:
+    """
+    Move every user's years before ``horizon_year`` into their archive item.
+
+    Meant to run periodically, e.g. once a year. Scan segments run in their
+    own threads under shared read and write capacity budgets. A rollover
+    only moves what is still old enough, so an interrupted run is resumed
+    by simply running it again.
+    """
+    client = client or dynamodb_client()
+    read_limiter = CapacityLimiter(read_capacity)
+    # Item re-reads share the scan's read budget
+    archiver = ItemArchiver(client, table_name, horizon_year, read_limiter, CapacityLimiter(write_capacity), dry_run)
+
+    segment_stats = [ArchiveStats() for _ in range(segments)]
+    errors: list[BaseException] = []
+
+    def worker(segment: int) -> None:
+        try:
+            pages = scan_segment(
+                client, table_name, segment, segments, read_limiter,
+                projection=[PARTITION_KEY, ATTRIBUTES_KEY],
+                page_size=page_size,
+            )
+            for items, _ in pages:
+                for item in items:
+                    if is_user_item(item):
+                        archiver.archive(item, segment_stats[segment])
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(segment,)) for segment in range(segments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    stats = ArchiveStats()
+    for s in segment_stats:
+        stats.add(s)
+    return stats
@@ -0,0 +1,128 @@
+"""Parallel rendering of one heatmap per user and/or per year."""
+
+import json
+import os
+import string
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from kamaji.activities import ActivityArrays, activity_grids
+from kamaji.rendering import HeatmapRenderer
+
+TEMPLATE_FIELDS = {"user", "year"}
+
+# Each worker process keeps a single figure alive for all of its renders
+_renderer: Optional[HeatmapRenderer] = None
+
+
+@dataclass
+class RenderJob:
+    counts: np.ndarray
+    output_file_path: Path
+    fmt: Optional[str]
+    dpi: int
+    mode: str
+
+
+@dataclass
+class ManifestEntry:
+    user: Optional[str]
+    year: Optional[int]
+    path: str
+    events: int
+
+
+def template_fields(output_template: str) -> set[str]:
+    """Return the placeholders used by an output template, validating them."""
+    fields = {
+        field for _, field, _, _ in string.Formatter().parse(output_template) if field is not None
+    }
+    unknown = fields - TEMPLATE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown template fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def default_manifest_path(output_template: str) -> Path:
+    """Place the manifest in the deepest directory that has no placeholder."""
+    prefix = output_template.split("{", 1)[0]
+    if prefix.endswith(("/", os.sep)):
+        return Path(prefix) / "manifest.json"
+    return Path(prefix).parent / "manifest.json"
+
+
+def _safe_path_part(value: str) -> str:
+    return value.replace(os.sep, "_").replace("/", "_")
+
+
+def plan_jobs(
+    arrays: ActivityArrays,
+    output_template: str,
+    fmt: Optional[str],
+    dpi: int,
+    mode: str,
+) -> Iterator[tuple[RenderJob, ManifestEntry]]:
+    """
+    Split the aggregated grids along the axes named in the template.
+
+    A template without ``{year}`` renders each user's whole history and one
+    without ``{user}`` merges every user into a single grid per year.
+    """
+    fields = template_fields(output_template)
+    for user_idx, year, counts in activity_grids(arrays, by_user="user" in fields, by_year="year" in fields):
+        user = arrays.users[user_idx] if user_idx is not None else None
+        events = int(counts.sum())
+        if events == 0:
+            continue
+        path = Path(output_template.format(
+            user=_safe_path_part(user) if user is not None else "",
+            year=year if year is not None else "",
+        ))
+        yield (
+            RenderJob(counts, path, fmt, dpi, mode),
+            ManifestEntry(user=user, year=year, path=str(path), events=events),
+        )
+
+
+def _init_worker() -> None:
+    global _renderer
+    _renderer = HeatmapRenderer()
+
+
+def _render(job: RenderJob) -> None:
+    job.output_file_path.parent.mkdir(parents=True, exist_ok=True)
+    _renderer.render(job.counts, job.output_file_path, fmt=job.fmt, dpi=job.dpi, mode=job.mode)
+
+
+def render_batch(
+    arrays: ActivityArrays,
+    output_template: str,
+    manifest_path: Path,
+    fmt: Optional[str] = None,
+    dpi: int = 400,
+    mode: str = "annotated",
+    workers: Optional[int] = None,
+) -> list[ManifestEntry]:
+    """Render every planned heatmap across worker processes and write the manifest."""
+    planned = list(plan_jobs(arrays, output_template, fmt, dpi, mode))
+    jobs = [job for job, _ in planned]
+    entries = [entry for _, entry in planned]
+
+    if workers == 1:
+        _init_worker()
+        for job in jobs:
+            _render(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+            # Consume the iterator so worker exceptions are raised here
+            list(executor.map(_render, jobs, chunksize=chunksize))
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump([asdict(entry) for entry in entries], f, indent=2)
+    return entries
@@ -0,0 +1,273 @@
+"""Capacity planning over the persistence table: item sizes, growth and the cost of each intent."""
+
+import math
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from typing import Iterable, Optional
+
+import numpy as np
+
+from kamaji.dynamo import (
+    ATTRIBUTES_KEY,
+    PARTITION_KEY,
+    is_archive_item,
+    is_journal_item,
+    parallel_scan,
+)
+from constants import intents
+from persistence.archive import ARCHIVE_PARTITION_SUFFIX
+from persistence.faults import MAX_ITEM_SIZE, attribute_value_size, item_size
+from persistence.journal import JOURNAL_PARTITION_SUFFIX
+from persistence.schema import is_reserved_key
+
+# DynamoDB bills strongly consistent reads, which the skill always makes, per
+# 4 KB of the whole item (projections included) and writes per 1 KB
+READ_UNIT_SIZE = 4096
+WRITE_UNIT_SIZE = 1024
+# Approximate size of one journal entry appended by a change
+JOURNAL_ENTRY_SIZE = 120
+
+# Persistence calls of each intent's handler, as lambda/utils/attributes.py
+# makes them: "read" gets the user's item, and their journal when they have
+# one; "write" puts the whole item back, or appends to the journal; "hydrate"
+# reads and rewrites the archive and the item when old years are asked for
+INTENT_CALLS: dict[str, tuple[str, ...]] = {
+    intents.RETRIEVE_EVENTS: ("read",),
+    intents.RETRIEVE_FULL_HISTORY: ("read", "hydrate"),
+    intents.MODIFY_EVENTS_REQUEST: ("read",),
+    intents.NEXT_EVENT: ("read",),
+    intents.PREVIOUS_EVENT: ("read",),
+    intents.DELETE_EVENT: ("read",),
+    intents.EDIT_EVENT: ("read",),
+    intents.ADD_EVENT_TYPE: ("read", "write"),
+    intents.ADD_EVENT_COMPLETE: ("read", "write"),
+    intents.ADD_RECURRING_EVENT: ("read", "write"),
+    intents.EDIT_EVENT_DESCRIPTION: ("read", "write"),
+    intents.AMAZON_YES: ("read", "write"),
+    intents.UNDO_LAST_CHANGE: ("read", "write"),
+}
+
+
+@dataclass
+class UserCapacity:
+    """
+    Size and growth of one user's items.
+
+    ``archivable_size`` is what ``kamaji archive --keep-years`` would move
+    out of the item; ``years_to_limit`` extrapolates ``growth`` (events per
+    year over the last complete years) at the item's bytes per event.
+    """
+
+    user: str
+    item_size: int = 0
+    journal_size: int = 0
+    archive_size: int = 0
+    archivable_size: int = 0
+    events: int = 0
+    days: int = 0
+    max_events_per_day: int = 0
+    events_per_year: dict[str, int] = field(default_factory=dict)
+    growth: float = 0.0
+    years_to_limit: Optional[float] = None
+    flags: list[str] = field(default_factory=list)
+
+    @property
+    def bytes_per_event(self) -> float:
+        return self.item_size / self.events if self.events else 0.0
+
+
+@dataclass
+class CapacityReport:
+    users: list[UserCapacity]
+    item_sizes: dict[str, float]
+    years_per_day: dict[int, int]
+    intents: dict[str, dict[str, float]]
+
+    @property
+    def flagged(self) -> list[UserCapacity]:
+        return [user for user in self.users if user.flags]
+
+
+def _read_units(size: int) -> int:
+    return max(1, math.ceil(size / READ_UNIT_SIZE))
+
+
+def _write_units(size: int) -> int:
+    return max(1, math.ceil(size / WRITE_UNIT_SIZE))
+
+
+def intent_cost(user: UserCapacity, calls: Iterable[str]) -> tuple[int, int]:
+    """Read and write capacity units one request of an intent consumes for a user."""
+    rcu = wcu = 0
+    for call in calls:
+        if call == "read":
+            rcu += _read_units(user.item_size) + (_read_units(user.journal_size) if user.journal_size else 0)
+        elif call == "write" and user.journal_size:
+            wcu += _write_units(user.journal_size + JOURNAL_ENTRY_SIZE)
+        elif call == "write":
+            wcu += _write_units(user.item_size)
+        elif call == "hydrate" and user.archive_size:
+            rcu += _read_units(user.archive_size)
+            wcu += _write_units(user.archive_size) + _write_units(user.item_size)
+    return rcu, wcu
+
+
+def _measure_days(user: UserCapacity, attributes: dict, horizon_year: int, years_per_day: Counter) -> None:
+    for key, years in attributes.items():
+        if is_reserved_key(key):
+            continue
+        user.days += 1
+        years_per_day[len(years["M"])] += 1
+        day_events = 0
+        for year, events in years["M"].items():
+            count = len(events["L"])
+            day_events += count
+            user.events_per_year[year] = user.events_per_year.get(year, 0) + count
+            if int(year) < horizon_year:
+                user.archivable_size += 1 + len(year.encode("utf-8")) + attribute_value_size(events)
+        user.events += day_events
+        user.max_events_per_day = max(user.max_events_per_day, day_events)
+
+
+def _assess(user: UserCapacity, current_year: int, growth_window: int, warn_size: int, horizon: float) -> None:
+    recent = [user.events_per_year.get(str(year), 0) for year in range(current_year - growth_window, current_year)]
+    user.growth = sum(recent) / growth_window
+    total_size = user.item_size + user.journal_size
+    if user.growth and user.bytes_per_event:
+        user.years_to_limit = max(0.0, (MAX_ITEM_SIZE - total_size) / (user.growth * user.bytes_per_event))
+
+    if total_size < warn_size and (user.years_to_limit is None or user.years_to_limit > horizon):
+        return
+    if user.archivable_size:
+        user.flags.append("archive")
+    # Archiving keeps the recent years, whose growth it cannot slow down
+    if total_size - user.archivable_size >= warn_size or (
+        user.years_to_limit is not None and user.years_to_limit <= horizon
+    ):
+        user.flags.append("shard")
+
+
+def measure_capacity(
+    items: Iterable[dict],
+    current_year: Optional[int] = None,
+    keep_years: int = 5,
+    growth_window: int = 3,
+    warn_fraction: float = 0.5,
+    horizon: float = 2.0,
+) -> CapacityReport:
+    """
+    Build the capacity report from raw scanned items.
+
+    Users are flagged once their items exceed ``warn_fraction`` of DynamoDB's
+    item limit, or are projected to reach it within ``horizon`` years:
+    "archive" if they have years older than ``keep_years`` to move out,
+    "shard" if what is left would still be too large or keeps growing
+    too fast.
+    """
+    current_year = current_year or date.today().year
+    horizon_year = current_year - keep_years + 1
+    users: dict[str, UserCapacity] = {}
+    years_per_day: Counter = Counter()
+
+    for item in items:
+        key = item[PARTITION_KEY]["S"]
+        if is_journal_item(item):
+            user_id = key[:-len(JOURNAL_PARTITION_SUFFIX)]
+            users.setdefault(user_id, UserCapacity(user_id)).journal_size = item_size(item)
+        elif is_archive_item(item):
+            user_id = key[:-len(ARCHIVE_PARTITION_SUFFIX)]
+            users.setdefault(user_id, UserCapacity(user_id)).archive_size = item_size(item)
+        else:
+            user = users.setdefault(key, UserCapacity(key))
+            user.item_size = item_size(item)
+            _measure_days(user, item.get(ATTRIBUTES_KEY, {"M": {}})["M"], horizon_year, years_per_day)
+
+    warn_size = int(MAX_ITEM_SIZE * warn_fraction)
+    for user in users.values():
+        _assess(user, current_year, growth_window, warn_size, horizon)
+
+    ranked = sorted(users.values(), key=lambda user: user.item_size + user.journal_size, reverse=True)
+    sizes = np.array([user.item_size for user in ranked] or [0])
+    item_sizes = {
+        "p50": float(np.percentile(sizes, 50)),
+        "p90": float(np.percentile(sizes, 90)),
+        "p99": float(np.percentile(sizes, 99)),
+        "max": float(sizes.max()),
+        "total": float(sizes.sum()),
+    }
+
+    intent_costs = {}
+    for intent, calls in INTENT_CALLS.items():
+        costs = np.array([intent_cost(user, calls) for user in ranked] or [(0, 0)])
+        intent_costs[intent] = {
+            "rcu_mean": float(costs[:, 0].mean()),
+            "rcu_p99": float(np.percentile(costs[:, 0], 99)),
+            "wcu_mean": float(costs[:, 1].mean()),
+            "wcu_p99": float(np.percentile(costs[:, 1], 99)),
+        }
+    return CapacityReport(ranked, item_sizes, dict(sorted(years_per_day.items())), intent_costs)
+
+
+def capacity_table(
+    table_name: str,
+    client=None,
+    segments: int = 4,
+    read_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+    **options,
+) -> CapacityReport:
+    """
+    Scan the whole table, journal and archive items included, into a capacity report.
+
+    Users are measured with their journal replayed, as their item will be
+    once compacted.
+    """
+    items = parallel_scan(
+        table_name, client=client, segments=segments, read_capacity=read_capacity, page_size=page_size,
+        journals=True,
+    )
+    return measure_capacity(items, **options)
+
+
+def report_json(report: CapacityReport) -> dict:
+    users = []
+    for user in report.users:
+        users.append({**asdict(user), "bytes_per_event": round(user.bytes_per_event, 1)})
+    return {
+        "max_item_size": MAX_ITEM_SIZE,
+        "item_sizes": report.item_sizes,
+        "years_per_day": report.years_per_day,
+        "intents": report.intents,
+        "users": users,
+    }
+
+
+def report_summary(report: CapacityReport, top: int = 10) -> str:
+    sizes = report.item_sizes
+    lines = [
+        f"{len(report.users)} users, {sizes['total'] / 1024:.1f} KB in user items",
+        f"Item sizes: p50 {sizes['p50'] / 1024:.1f} KB, p90 {sizes['p90'] / 1024:.1f} KB, "
+        f"p99 {sizes['p99'] / 1024:.1f} KB, max {sizes['max'] / 1024:.1f} KB of {MAX_ITEM_SIZE // 1024} KB",
+        "",
+        f"{'largest users':<40} {'KB':>8} {'limit':>6} {'events':>7} {'ev/year':>8} {'years left':>10}  flags",
+    ]
+    for user in report.users[:top]:
+        years_left = f"{user.years_to_limit:.1f}" if user.years_to_limit is not None else "-"
+        lines.append(
+            f"{user.user:<40} {(user.item_size + user.journal_size) / 1024:>8.1f} "
+            f"{(user.item_size + user.journal_size) / MAX_ITEM_SIZE:>6.0%} {user.events:>7} "
+            f"{user.growth:>8.1f} {years_left:>10}  {','.join(user.flags)}"
+        )
+    lines += ["", f"{'intent':<24} {'RCU mean':>9} {'RCU p99':>8} {'WCU mean':>9} {'WCU p99':>8}"]
+    for intent, cost in report.intents.items():
+        lines.append(
+            f"{intent:<24} {cost['rcu_mean']:>9.1f} {cost['rcu_p99']:>8.1f} {cost['wcu_mean']:>9.1f} {cost['wcu_p99']:>8.1f}"
+        )
+    years = ", ".join(f"{n}: {days}" for n, days in report.years_per_day.items())
+    lines += ["", f"Days by number of years: {years}"]
+    flagged = report.flagged
+    archive = sum("archive" in user.flags for user in flagged)
+    shard = sum("shard" in user.flags for user in flagged)
+    lines.append(f"Flagged {len(flagged)} users: {archive} to archive, {shard} to shard")
+    return "\n".join(lines)
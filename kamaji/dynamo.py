@@ -0,0 +1,312 @@
+"""Parallel, rate-limited access to the skill's DynamoDB persistence table."""
+
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import boto3
+
+from kamaji.activities import UserActivities
+from persistence.archive import ARCHIVE_PARTITION_SUFFIX
+from persistence.codec import deserialize_map, serialize_map
+from persistence.faults import parse_fault_spec
+from persistence.journal import JOURNAL_PARTITION_SUFFIX, JOURNAL_SEQ_KEY, apply_mutation
+
+DEFAULT_REGION = "eu-west-1"
+PARTITION_KEY = "id"
+ATTRIBUTES_KEY = "attributes"
+
+# Attribute of the skill's archive items holding the compressed years
+ARCHIVE_ATTRIBUTE = "archive"
+# BatchGetItem reads at most 100 keys per call
+GET_BATCH_SIZE = 100
+
+
+def is_journal_item(item: dict) -> bool:
+    return item[PARTITION_KEY]["S"].endswith(JOURNAL_PARTITION_SUFFIX)
+
+
+def is_archive_item(item: dict) -> bool:
+    return item[PARTITION_KEY]["S"].endswith(ARCHIVE_PARTITION_SUFFIX)
+
+
+def is_user_item(item: dict) -> bool:
+    """Whether a scanned item holds a user's attributes rather than their journal or archive."""
+    return not (is_journal_item(item) or is_archive_item(item))
+
+
+def dynamodb_client(region: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """
+    Create a low-level client, so items come back in the typed ``{"M": ...}``
+    shape the CSV export also uses.
+
+    With $KAMAJI_DYNAMODB_FAULTS set (see persistence.faults.parse_fault_spec)
+    the client gets injected latency and throttling.
+    """
+    client = boto3.client(
+        "dynamodb",
+        region_name=region or os.environ.get("DYNAMODB_PERSISTENCE_REGION", DEFAULT_REGION),
+        endpoint_url=endpoint_url,
+    )
+    faults = os.environ.get("KAMAJI_DYNAMODB_FAULTS")
+    if faults:
+        parse_fault_spec(faults).attach(client)
+    return client
+
+
+class CapacityLimiter:
+    """
+    Token bucket over consumed capacity units per second, shared by threads.
+
+    Consumed capacity is only known after a call returns, so callers wait
+    for a non-negative balance and then pay the actual cost, possibly
+    going into debt that delays the next call.
+    """
+
+    def __init__(self, units_per_second: Optional[float]) -> None:
+        self.units_per_second = units_per_second
+        self._tokens = units_per_second or 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.units_per_second,
+            self._tokens + (now - self._updated) * self.units_per_second,
+        )
+        self._updated = now
+
+    def wait(self) -> None:
+        if not self.units_per_second:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 0:
+                    return
+                delay = -self._tokens / self.units_per_second
+            time.sleep(delay)
+
+    def consume(self, units: float) -> None:
+        if not self.units_per_second:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= units
+
+
+def scan_segment(
+    client,
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    limiter: CapacityLimiter,
+    projection: Optional[list[str]] = None,
+    page_size: Optional[int] = None,
+    exclusive_start_key: Optional[dict] = None,
+) -> Iterator[tuple[list[dict], Optional[dict]]]:
+    """
+    Yield (items, last evaluated key) for each page of one scan segment.
+
+    The key is None on the last page; passing a previously yielded key as
+    ``exclusive_start_key`` resumes the segment after that page.
+    """
+    request: dict[str, Any] = {
+        "TableName": table_name,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ReturnConsumedCapacity": "TOTAL",
+    }
+    if projection:
+        names = {f"#p{i}": name for i, name in enumerate(projection)}
+        request["ProjectionExpression"] = ", ".join(names)
+        request["ExpressionAttributeNames"] = names
+    if page_size:
+        request["Limit"] = page_size
+    if exclusive_start_key:
+        request["ExclusiveStartKey"] = exclusive_start_key
+
+    while True:
+        limiter.wait()
+        response = client.scan(**request)
+        limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0))
+        last_key = response.get("LastEvaluatedKey")
+        yield response.get("Items", []), last_key
+        if not last_key:
+            return
+        request["ExclusiveStartKey"] = last_key
+
+
+def get_journals(
+    client, table_name: str, users: list[str], limiter: CapacityLimiter, max_attempts: int = 8
+) -> dict[str, dict]:
+    """Journal items of those ``users`` that have one, by user id, retrying unprocessed keys."""
+    journals: dict[str, dict] = {}
+    for start in range(0, len(users), GET_BATCH_SIZE):
+        request = {table_name: {
+            "Keys": [{PARTITION_KEY: {"S": user + JOURNAL_PARTITION_SUFFIX}} for user in users[start:start + GET_BATCH_SIZE]],
+            "ConsistentRead": True,
+        }}
+        for attempt in range(max_attempts):
+            limiter.wait()
+            response = client.batch_get_item(RequestItems=request, ReturnConsumedCapacity="TOTAL")
+            limiter.consume(sum(used.get("CapacityUnits", 0.0) for used in response.get("ConsumedCapacity", [])))
+            for item in response.get("Responses", {}).get(table_name, []):
+                journals[item[PARTITION_KEY]["S"][:-len(JOURNAL_PARTITION_SUFFIX)]] = item
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            # Exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(5.0, 0.05 * 2 ** attempt)))
+        else:
+            raise RuntimeError(f"Could not read {len(request[table_name]['Keys'])} journals after {max_attempts} attempts")
+    return journals
+
+
+def replay_journal(attributes: dict, journal: Optional[dict]) -> dict:
+    """
+    Typed attributes of a user with the entries of their journal item not
+    folded into them yet applied, as the skill's JournalingPersistenceAdapter
+    does on read.
+    """
+    if not journal:
+        return attributes
+    base = int(journal.get("base", {"N": "0"})["N"])
+    entries = journal.get("entries", {"L": []})["L"]
+    replayed = deserialize_map({"M": attributes})
+    folded = int(replayed.get(JOURNAL_SEQ_KEY, 0))
+    changed = False
+    for seq, entry in enumerate(entries, base):
+        if seq >= folded:
+            changed |= apply_mutation(replayed, deserialize_map(entry))
+    if not changed:
+        return attributes
+    replayed[JOURNAL_SEQ_KEY] = base + len(entries)
+    return serialize_map(replayed)["M"]
+
+
+def replay_journals(client, table_name: str, items: list[dict], limiter: CapacityLimiter) -> list[dict]:
+    """
+    A scanned page with each user item's journal replayed into its attributes.
+
+    Scan segments split a user's item and journal item unpredictably, so the
+    journals of the page's users are read with BatchGetItem, charged to
+    ``limiter``; journal and archive items are passed through unchanged.
+    """
+    users = [item[PARTITION_KEY]["S"] for item in items if is_user_item(item)]
+    journals = get_journals(client, table_name, users, limiter) if users else {}
+    replayed = []
+    for item in items:
+        user = item[PARTITION_KEY]["S"]
+        if user in journals:
+            attributes = replay_journal(item.get(ATTRIBUTES_KEY, {"M": {}})["M"], journals[user])
+            item = {**item, ATTRIBUTES_KEY: {"M": attributes}}
+        replayed.append(item)
+    return replayed
+
+
+def write_checkpoint(path: Path, checkpoint) -> None:
+    """Atomically replace a JSON checkpoint with the fields of a dataclass."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(asdict(checkpoint), f)
+    os.replace(tmp_path, path)
+
+
+_DONE = object()
+
+
+def parallel_scan(
+    table_name: str,
+    client=None,
+    segments: int = 4,
+    read_capacity: Optional[float] = None,
+    projection: Optional[list[str]] = None,
+    page_size: Optional[int] = None,
+    buffer_pages: int = 16,
+    journals: bool = False,
+) -> Iterator[dict]:
+    """
+    Yield raw items from all scan segments, each segment read by its own thread.
+
+    Pages go through a bounded queue, so memory stays proportional to
+    ``buffer_pages`` whatever the table size. ``read_capacity`` caps the
+    consumed RCU per second across all threads, journal reads included:
+    with ``journals`` set, user items come with their journal replayed
+    (see replay_journals).
+    """
+    client = client or dynamodb_client()
+    limiter = CapacityLimiter(read_capacity)
+    pages: queue.Queue = queue.Queue(maxsize=buffer_pages)
+    stop = threading.Event()
+
+    def worker(segment: int) -> None:
+        try:
+            for items, _ in scan_segment(
+                client, table_name, segment, segments, limiter, projection, page_size
+            ):
+                if stop.is_set():
+                    return
+                if journals:
+                    items = replay_journals(client, table_name, items, limiter)
+                pages.put(items)
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(_DONE)
+
+    threads = [
+        threading.Thread(target=worker, args=(segment,), daemon=True)
+        for segment in range(segments)
+    ]
+    for thread in threads:
+        thread.start()
+
+    running = segments
+    try:
+        while running:
+            page = pages.get()
+            if page is _DONE:
+                running -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        stop.set()
+        # Unblock workers waiting on a full queue so they can exit
+        while any(thread.is_alive() for thread in threads):
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                time.sleep(0.01)
+
+
+def scan_activities(
+    table_name: str,
+    client=None,
+    segments: int = 4,
+    read_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+) -> Iterator[UserActivities]:
+    """Yield (user id, attributes) for every user of the persistence table, journal replayed."""
+    for item in parallel_scan(
+        table_name,
+        client=client,
+        segments=segments,
+        read_capacity=read_capacity,
+        projection=[PARTITION_KEY, ATTRIBUTES_KEY],
+        page_size=page_size,
+        journals=True,
+    ):
+        # Archived years are left out: analytics cover the years users still read
+        if is_user_item(item):
+            yield item[PARTITION_KEY]["S"], item.get(ATTRIBUTES_KEY, {}).get("M", {})
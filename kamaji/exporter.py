@@ -0,0 +1,308 @@
+"""Streaming, resumable export of every user's events from the persistence table."""
+
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+from urllib.parse import quote
+
+from kamaji.activities import YearActivities
+from kamaji.archiver import archived_activities
+from kamaji.dynamo import (
+    ARCHIVE_ATTRIBUTE,
+    ATTRIBUTES_KEY,
+    PARTITION_KEY,
+    CapacityLimiter,
+    dynamodb_client,
+    is_archive_item,
+    is_journal_item,
+    replay_journals,
+    scan_segment,
+    write_checkpoint,
+)
+from persistence.archive import ARCHIVE_PARTITION_SUFFIX
+from persistence.recurring import RECURRING_KEY
+from persistence.schema import is_reserved_key
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS: tuple[str, ...] = ("ndjson", "csv", "ics")
+EXPORT_FIELDS = ["user", "date", "year", "index", "text", "start", "end"]
+# Year of the records of events repeating every year, whose date is "--MM-DD"
+RECURRING_YEAR = "recurring"
+# Calendars need a first occurrence: a leap year, so recurring 2-29 events have one
+RECURRING_SINCE = 2000
+
+
+@dataclass
+class EventRecord:
+    """
+    One stored event: ``index`` is its position in that day's list for ``year``.
+
+    Recurring events have RECURRING_YEAR instead of a year, the index among
+    the day's recurring events, and the years they ``start`` and ``end``, if any.
+    """
+
+    user: str
+    date: str
+    year: Union[int, str]
+    index: int
+    text: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+
+def _recurring_records(user_id: str, recurring: dict) -> Iterator[EventRecord]:
+    for event_day, recurrences in recurring["M"].items():
+        month, day = (int(part) for part in event_day.split("-"))
+        for index, recurrence in enumerate(recurrences["L"]):
+            fields = recurrence["M"]
+            yield EventRecord(
+                user_id, f"--{month:02d}-{day:02d}", RECURRING_YEAR, index, fields["text"]["S"],
+                int(fields["start"]["N"]) if "start" in fields else None,
+                int(fields["end"]["N"]) if "end" in fields else None,
+            )
+
+
+def flatten_events(user_id: str, activities: dict[str, YearActivities]) -> Iterator[EventRecord]:
+    """Yield one record per event of a user's typed "M-D" -> year -> list map, recurring ones last."""
+    for event_day, years in activities.items():
+        if is_reserved_key(event_day):
+            continue
+        month, day = (int(part) for part in event_day.split("-"))
+        for year, events in years["M"].items():
+            event_date = f"{int(year):04d}-{month:02d}-{day:02d}"
+            for index, event in enumerate(events["L"]):
+                yield EventRecord(user_id, event_date, int(year), index, event["S"])
+    if RECURRING_KEY in activities:
+        yield from _recurring_records(user_id, activities[RECURRING_KEY])
+
+
+def item_events(item: dict) -> Iterator[EventRecord]:
+    """Records of a scanned user item, or of the years archived in an archive item."""
+    if is_archive_item(item):
+        user_id = item[PARTITION_KEY]["S"][:-len(ARCHIVE_PARTITION_SUFFIX)]
+        return flatten_events(user_id, archived_activities(item))
+    return flatten_events(item[PARTITION_KEY]["S"], item.get(ATTRIBUTES_KEY, {}).get("M", {}))
+
+
+def _ics_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> str:
+    # RFC 5545 lines are at most 75 octets, continued with a leading space
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _encode_ndjson(records: Iterable[EventRecord]) -> str:
+    lines = []
+    for record in records:
+        fields = {key: value for key, value in asdict(record).items() if value is not None}
+        lines.append(json.dumps(fields, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+
+def _encode_csv(records: Iterable[EventRecord]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+    writer.writerows((r.user, r.date, r.year, r.index, r.text, r.start, r.end) for r in records)
+    return buffer.getvalue()
+
+
+def _encode_ics(records: Iterable[EventRecord]) -> str:
+    lines = []
+    for record in records:
+        recurring = record.year == RECURRING_YEAR
+        try:
+            if recurring:
+                month, day = (int(part) for part in record.date[2:].split("-"))
+                start = date(record.start or RECURRING_SINCE, month, day)
+            else:
+                start = date.fromisoformat(record.date)
+        except ValueError:
+            # e.g. 2-29 stored for a non-leap year: not representable in a calendar
+            logger.warning(f"Skipping {record.user} event on invalid date {record.date}")
+            continue
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{record.date}-{record.index}-{quote(record.user, safe='')}@kamaji",
+            f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+        ]
+        if recurring:
+            until = f";UNTIL={record.end:04d}{start:%m%d}" if record.end is not None else ""
+            lines.append(f"RRULE:FREQ=YEARLY{until}")
+        lines += [
+            f"SUMMARY:{_ics_escape(record.text)}",
+            "END:VEVENT",
+        ]
+    return "".join(_ics_fold(line) for line in lines)
+
+
+# Per format: file header, records encoder and footer
+_FORMATS: dict[str, tuple[str, Callable[[Iterable[EventRecord]], str], str]] = {
+    "ndjson": ("", _encode_ndjson, ""),
+    "csv": (",".join(EXPORT_FIELDS) + "\r\n", _encode_csv, ""),
+    "ics": ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//kamaji//export//EN\r\n", _encode_ics, "END:VCALENDAR\r\n"),
+}
+
+
+@dataclass
+class SegmentCheckpoint:
+    """
+    Progress of one scan segment: the part file holds exactly ``offset``
+    bytes of records read up to ``last_key``.
+    """
+
+    segment: int
+    total_segments: int
+    export_format: str
+    offset: int = 0
+    last_key: Optional[dict] = None
+    done: bool = False
+    users: int = 0
+    events: int = 0
+
+
+def _load_checkpoint(path: Path, segment: int, total_segments: int, export_format: str) -> SegmentCheckpoint:
+    if not path.exists():
+        return SegmentCheckpoint(segment, total_segments, export_format)
+    checkpoint = SegmentCheckpoint(**json.loads(path.read_text(encoding="utf-8")))
+    if (checkpoint.total_segments, checkpoint.export_format) != (total_segments, export_format):
+        raise ValueError(
+            f"Checkpoint {path} was written for {checkpoint.total_segments} {checkpoint.export_format} "
+            f"segments, not {total_segments} {export_format} ones"
+        )
+    return checkpoint
+
+
+def _export_segment(
+    client,
+    table_name: str,
+    checkpoint_dir: Path,
+    segment: int,
+    total_segments: int,
+    export_format: str,
+    limiter: CapacityLimiter,
+    page_size: Optional[int],
+) -> SegmentCheckpoint:
+    checkpoint_path = checkpoint_dir / f"segment-{segment:04d}.json"
+    part_path = checkpoint_dir / f"segment-{segment:04d}.part"
+    checkpoint = _load_checkpoint(checkpoint_path, segment, total_segments, export_format)
+    if checkpoint.done:
+        return checkpoint
+    if checkpoint.offset or checkpoint.last_key:
+        logger.info(f"Resuming segment {segment} at {checkpoint.offset} bytes")
+
+    encode = _FORMATS[export_format][1]
+    with open(part_path, "ab") as part:
+        # Drop whatever was written after the last checkpoint
+        part.truncate(checkpoint.offset)
+        part.seek(checkpoint.offset)
+        pages = scan_segment(
+            client, table_name, segment, total_segments, limiter,
+            projection=[PARTITION_KEY, ATTRIBUTES_KEY, ARCHIVE_ATTRIBUTE],
+            page_size=page_size,
+            exclusive_start_key=checkpoint.last_key,
+        )
+        for items, last_key in pages:
+            events = 0
+            items = [item for item in replay_journals(client, table_name, items, limiter) if not is_journal_item(item)]
+            for item in items:
+                records = list(item_events(item))
+                part.write(encode(records).encode("utf-8"))
+                events += len(records)
+            part.flush()
+            os.fsync(part.fileno())
+
+            checkpoint.offset = part.tell()
+            checkpoint.last_key = last_key
+            checkpoint.done = last_key is None
+            checkpoint.users += sum(not is_archive_item(item) for item in items)
+            checkpoint.events += events
+            write_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def default_checkpoint_dir(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".parts")
+
+
+def export_table(
+    table_name: str,
+    output_path: Path,
+    export_format: str,
+    client=None,
+    segments: int = 4,
+    read_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+    checkpoint_dir: Optional[Path] = None,
+) -> tuple[int, int]:
+    """
+    Export every event of the table to ``output_path``, one record per event.
+
+    Each scan segment streams into its own part file in ``checkpoint_dir``
+    and records, after every page, the part file length and the page's last
+    evaluated key. Running the export again after an interruption truncates
+    each part back to its checkpoint and continues the scan from there. Once
+    all segments are done the parts are concatenated and removed. Users'
+    journal entries not yet compacted are replayed into their events.
+
+    Returns:
+        Tuple of (users, events) exported
+    """
+    client = client or dynamodb_client()
+    checkpoint_dir = checkpoint_dir or default_checkpoint_dir(output_path)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    limiter = CapacityLimiter(read_capacity)
+
+    checkpoints: list[Optional[SegmentCheckpoint]] = [None] * segments
+    errors: list[BaseException] = []
+
+    def worker(segment: int) -> None:
+        try:
+            checkpoints[segment] = _export_segment(
+                client, table_name, checkpoint_dir, segment, segments, export_format, limiter, page_size
+            )
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(segment,)) for segment in range(segments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    header, _, footer = _FORMATS[export_format]
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as output:
+        output.write(header.encode("utf-8"))
+        for segment in range(segments):
+            with open(checkpoint_dir / f"segment-{segment:04d}.part", "rb") as part:
+                shutil.copyfileobj(part, output)
+        output.write(footer.encode("utf-8"))
+    shutil.rmtree(checkpoint_dir)
+
+    return sum(c.users for c in checkpoints), sum(c.events for c in checkpoints)
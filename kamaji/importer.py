@@ -0,0 +1,299 @@
+"""Bulk import of (date, description) entries into users' persistent attributes."""
+
+import copy
+import csv
+import logging
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from kamaji.dynamo import ATTRIBUTES_KEY, PARTITION_KEY
+from persistence.codec import deserialize_map, loads, serialize_map
+from persistence.faults import MAX_ITEM_SIZE, item_size
+from persistence.schema import migrate_attributes
+from persistence.tags import rebuild_tag_index
+from persistence.versioning import VERSION_KEY, ConcurrentModificationError, item_version
+
+logger = logging.getLogger(__name__)
+
+INPUT_FORMATS: tuple[str, ...] = ("csv", "ics", "jsonl")
+IMPORT_SUFFIXES = {".csv": "csv", ".ics": "ics", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+# Users read with one BatchGetItem, its request limit
+GET_BATCH_SIZE = 100
+
+Attributes = dict[str, dict[str, list[str]]]
+
+
+@dataclass
+class ImportEntry:
+    user: str
+    date: date
+    description: str
+
+
+@dataclass
+class ImportResult:
+    user: str
+    imported: int
+    skipped_duplicates: int
+    item_size: int
+    written: bool
+    error: Optional[str] = None
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value.strip()[:10], "%Y-%m-%d").date()
+
+
+def read_csv_entries(path: Path, default_user: Optional[str]) -> Iterator[ImportEntry]:
+    """CSV with ``date`` (YYYY-MM-DD) and ``description`` columns, plus an optional ``user``."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield ImportEntry(
+                user=row.get("user") or default_user,
+                date=_parse_date(row["date"]),
+                description=row["description"],
+            )
+
+
+def read_jsonl_entries(path: Path, default_user: Optional[str]) -> Iterator[ImportEntry]:
+    """JSON lines of {"date", "description"} objects, plus an optional "user"."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = loads(line)
+            yield ImportEntry(
+                user=row.get("user") or default_user,
+                date=_parse_date(row["date"]),
+                description=row["description"],
+            )
+
+
+_ICS_ESCAPES = re.compile(r"\\([\\;,nN])")
+
+
+def _ics_unescape(value: str) -> str:
+    return _ICS_ESCAPES.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def read_ics_entries(path: Path, default_user: Optional[str]) -> Iterator[ImportEntry]:
+    """VEVENTs of an iCalendar file: DTSTART gives the date and SUMMARY the description."""
+    with open(path, encoding="utf-8") as f:
+        # Undo RFC 5545 line folding
+        content = re.sub(r"\r?\n[ \t]", "", f.read())
+
+    event: Optional[dict[str, str]] = None
+    for line in content.splitlines():
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            if "DTSTART" in event and "SUMMARY" in event:
+                start = event["DTSTART"]
+                yield ImportEntry(
+                    user=default_user,
+                    date=date(int(start[0:4]), int(start[4:6]), int(start[6:8])),
+                    description=_ics_unescape(event["SUMMARY"]),
+                )
+            event = None
+        elif event is not None:
+            event[name] = value
+
+
+def read_entries(path: Path, input_format: str, default_user: Optional[str]) -> Iterator[ImportEntry]:
+    readers = {"csv": read_csv_entries, "ics": read_ics_entries, "jsonl": read_jsonl_entries}
+    for entry in readers[input_format](path, default_user):
+        if not entry.user:
+            raise ValueError(f"Entry for {entry.date} has no user and no default user was given")
+        yield entry
+
+
+def group_by_user(entries: Iterable[ImportEntry]) -> dict[str, list[ImportEntry]]:
+    grouped: dict[str, list[ImportEntry]] = {}
+    for entry in entries:
+        grouped.setdefault(entry.user, []).append(entry)
+    return grouped
+
+
+def merge_entries(attributes: Attributes, entries: Iterable[ImportEntry]) -> tuple[int, int]:
+    """
+    Append entries to the "M-D" -> year -> events map, as add_event_to_persistence does.
+
+    Events already stored for the same day and year are skipped, so an
+    import can safely be run again.
+
+    Returns:
+        Tuple of (imported, skipped duplicates)
+    """
+    imported = skipped = 0
+    for entry in entries:
+        event_day = f"{entry.date.month}-{entry.date.day}"
+        year_events = attributes.setdefault(event_day, {}).setdefault(str(entry.date.year), [])
+        if entry.description in year_events:
+            skipped += 1
+            continue
+        year_events.append(entry.description)
+        imported += 1
+    return imported, skipped
+
+
+def to_item(user: str, attributes: Attributes) -> dict:
+    """Typed DynamoDB item in the layout written by the skill's DynamoDbAdapter."""
+    return {
+        PARTITION_KEY: {"S": user},
+        ATTRIBUTES_KEY: serialize_map(attributes),
+    }
+
+
+def _backoff(attempt: int, base: float, cap: float = 5.0) -> None:
+    # Exponential backoff with full jitter
+    time.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+
+
+def batch_get_attributes(
+    client, table_name: str, users: list[str], max_attempts: int = 8, backoff_base: float = 0.05
+) -> dict[str, Attributes]:
+    """Fetch the current attributes of up to 100 users, retrying unprocessed keys."""
+    found: dict[str, Attributes] = {}
+    request = {table_name: {
+        "Keys": [{PARTITION_KEY: {"S": user}} for user in users],
+        "ProjectionExpression": "#k, #a",
+        "ExpressionAttributeNames": {"#k": PARTITION_KEY, "#a": ATTRIBUTES_KEY},
+    }}
+    for attempt in range(max_attempts):
+        response = client.batch_get_item(RequestItems=request)
+        for item in response.get("Responses", {}).get(table_name, []):
+            found[item[PARTITION_KEY]["S"]] = deserialize_map(item.get(ATTRIBUTES_KEY, {"M": {}}))
+        request = response.get("UnprocessedKeys") or {}
+        if not request:
+            return found
+        _backoff(attempt, backoff_base)
+    raise RuntimeError(f"Could not read {len(request[table_name]['Keys'])} items after {max_attempts} attempts")
+
+
+def put_attributes(client, table_name: str, user: str, attributes: Attributes) -> None:
+    """
+    Save a user's attributes as the skill's VersionedDynamoDbAdapter does.
+
+    The item is only written if its ``_version`` is still the one in
+    ``attributes``, which is then incremented.
+
+    Raises:
+        ConcurrentModificationError: if the item changed since it was read,
+            holding its current attributes
+    """
+    expected = item_version(attributes)
+    request = {
+        "TableName": table_name,
+        "Item": to_item(user, {**attributes, VERSION_KEY: expected + 1}),
+        "ExpressionAttributeNames": {"#a": ATTRIBUTES_KEY, "#v": VERSION_KEY},
+        "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+    }
+    if expected:
+        request["ConditionExpression"] = "#a.#v = :expected"
+        request["ExpressionAttributeValues"] = {":expected": {"N": str(expected)}}
+    else:
+        request["ConditionExpression"] = "attribute_not_exists(#a.#v)"
+    try:
+        client.put_item(**request)
+    except client.exceptions.ConditionalCheckFailedException as e:
+        item = e.response.get("Item")
+        if item is None:
+            # Not every endpoint (e.g. older DynamoDB Local) returns the item
+            item = client.get_item(TableName=table_name, Key={PARTITION_KEY: {"S": user}}, ConsistentRead=True).get("Item", {})
+        raise ConcurrentModificationError(deserialize_map(item.get(ATTRIBUTES_KEY, {"M": {}})))
+    attributes[VERSION_KEY] = expected + 1
+
+
+def import_user(
+    client,
+    table_name: Optional[str],
+    user: str,
+    entries: list[ImportEntry],
+    attributes: Attributes,
+    dry_run: bool = False,
+    max_attempts: int = 8,
+    backoff_base: float = 0.05,
+) -> ImportResult:
+    """
+    Merge a user's entries into their attributes and save them.
+
+    The item is upgraded to the current schema first and the imported
+    events are indexed by category, as the skill's write helpers do. When
+    the skill or another import saves the item in between, the entries are
+    merged again into the item as now stored, like save_with_retry does.
+    """
+    for attempt in range(max_attempts):
+        merged = copy.deepcopy(attributes)
+        migrate_attributes(merged)
+        imported, skipped = merge_entries(merged, entries)
+        if imported:
+            rebuild_tag_index(merged)
+        size = item_size(to_item(user, {**merged, VERSION_KEY: item_version(merged) + 1}))
+        result = ImportResult(user, imported, skipped, size, written=False)
+        if size > MAX_ITEM_SIZE:
+            result.error = f"item would be {size} bytes, over the {MAX_ITEM_SIZE} bytes limit"
+            return result
+        if not imported or dry_run:
+            return result
+        try:
+            put_attributes(client, table_name, user, merged)
+        except ConcurrentModificationError as e:
+            logger.info(f"{user} changed while importing, merging again")
+            attributes = e.current_attributes
+            _backoff(attempt, backoff_base)
+            continue
+        result.written = True
+        return result
+    result.error = f"item still changing after {max_attempts} attempts"
+    return result
+
+
+def _import_batch(
+    client,
+    table_name: Optional[str],
+    batch: list[tuple[str, list[ImportEntry]]],
+    dry_run: bool,
+) -> list[ImportResult]:
+    users = [user for user, _ in batch]
+    existing = batch_get_attributes(client, table_name, users) if table_name else {}
+    return [
+        import_user(client, table_name, user, entries, existing.get(user, {}), dry_run)
+        for user, entries in batch
+    ]
+
+
+def import_entries(
+    grouped: dict[str, list[ImportEntry]],
+    client=None,
+    table_name: Optional[str] = None,
+    dry_run: bool = False,
+    workers: int = 8,
+) -> list[ImportResult]:
+    """
+    Merge each user's entries into their item, in batches of 100 across threads.
+
+    Existing items are read with BatchGetItem first, so imported events are
+    appended to, never replace, what users already recorded by voice. Each
+    user is then written with a conditional PutItem on their item's version,
+    merging again on conflicts with the skill. Without a table (dry run
+    only) entries are merged into empty items.
+    """
+    if table_name is None and not dry_run:
+        raise ValueError("A table name is required unless running dry")
+    users = list(grouped.items())
+    batches = [users[i:i + GET_BATCH_SIZE] for i in range(0, len(users), GET_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_import_batch, client, table_name, batch, dry_run)
+            for batch in batches
+        ]
+        return [result for future in futures for result in future.result()]
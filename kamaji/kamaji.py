@@ -1,49 +1,478 @@
 import click
-from pathlib import Path
-import pandas as pd
-import csv
 import json
-import seaborn as sn
-import calendar
-from typing import TypedDict
+from datetime import date
+from itertools import islice
+from pathlib import Path
+from typing import Optional
+
+from kamaji.activities import month_day_counts, parse_activities, read_activities
+from kamaji.analytics import compute_calendar_analytics, plot_calendars, write_csv, write_json
+from kamaji.archiver import archive_table
+from kamaji.batch import default_manifest_path, render_batch, template_fields
+from kamaji.capacity import capacity_table, report_json, report_summary
+from kamaji.dynamo import dynamodb_client, scan_activities
+from kamaji.exporter import EXPORT_FORMATS, default_checkpoint_dir, export_table
+from kamaji.importer import IMPORT_SUFFIXES, INPUT_FORMATS, group_by_user, import_entries, read_entries
+from kamaji.migrator import CURRENT_SCHEMA_VERSION, MigrationStats, migrate_table, rebuild_tag_indexes
+from kamaji.rendering import RENDER_MODES, HeatmapRenderer
+from kamaji.synthetic import OUTPUT_FORMATS, GeneratorConfig, write_dataset
 
-class Activity(TypedDict):
-    S: str
 
-class ActivityList(TypedDict):
-    L: list[Activity]
+def __render_options(command):
+    command = click.option("--mode", type=click.Choice(RENDER_MODES), default="annotated", show_default=True,
+                           help="annotated: seaborn with per-cell counts; fast: plain color grid; raw: direct PNG encode.")(command)
+    command = click.option("--dpi", type=int, default=400, show_default=True)(command)
+    command = click.option("--format", "output_format", type=click.Choice(["png", "svg"]), default=None,
+                           help="Output format, inferred from the output file extension when omitted.")(command)
+    return command
 
-class YearActivities(TypedDict):
-    M: dict[str, list[ActivityList]]
 
-def __generate_pd(activities: dict[str, YearActivities]) -> pd.DataFrame:
-    data = [[0] * 12 for i in range(1, 32)]
-    for activities_date in activities:
-        activity_month, activity_day = activities_date.split("-")
-        activities_year = activities[activities_date]["M"]
-        for activity_year in activities_year:
-            data[int(activity_day) - 1][int(activity_month) - 1] += len(
-                activities_year[activity_year]["L"]
-            )
-    return pd.DataFrame(data, index=[i for i in range(1, 32)], columns=[calendar.month_name[i][0:3] for i in range(1, 13)])
+def __check_render_options(output_format: Optional[str], mode: str) -> None:
+    if mode == "raw" and output_format == "svg":
+        raise click.BadParameter("raw mode only produces PNG files", param_hint="--format")
 
 
-def __retrieve_activities(activities_file_path: Path) -> dict[str, YearActivities]:
-    str_activities = {}
-    with open(activities_file_path) as csvfile:
-        reader = csv.DictReader(csvfile)
-        str_activities = [row for row in reader][0]["attributes"]
-    return json.loads(str_activities)
+@click.group()
+def cli():
+    pass
 
 
-@click.command()
+@cli.command("heatmap")
 @click.option("--activities-file-path", type=Path, required=True)
 @click.option("--output-file-path", type=Path, required=True)
-def activities_heat_map(activities_file_path: Path, output_file_path: Path):
-    activities = __retrieve_activities(activities_file_path)
-    pd_activities = __generate_pd(activities)
-    svm = sn.heatmap(
-        pd_activities, annot=True, cmap="coolwarm", linecolor="white", linewidths=1
+@__render_options
+def activities_heat_map(
+    activities_file_path: Path,
+    output_file_path: Path,
+    output_format: Optional[str],
+    dpi: int,
+    mode: str,
+):
+    __check_render_options(output_format, mode)
+    arrays = parse_activities(islice(read_activities(activities_file_path), 1))
+    counts = month_day_counts(arrays)
+    HeatmapRenderer().render(counts, output_file_path, fmt=output_format, dpi=dpi, mode=mode)
+
+
+@cli.command("scan")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page.")
+@click.option("--output-file-path", type=Path, required=True)
+@__render_options
+def activities_heat_map_scan(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    segments: int,
+    read_capacity: Optional[float],
+    page_size: Optional[int],
+    output_file_path: Path,
+    output_format: Optional[str],
+    dpi: int,
+    mode: str,
+):
+    __check_render_options(output_format, mode)
+    client = dynamodb_client(region, endpoint_url)
+    arrays = parse_activities(scan_activities(
+        table_name, client=client, segments=segments, read_capacity=read_capacity, page_size=page_size,
+    ))
+    counts = month_day_counts(arrays)
+    HeatmapRenderer().render(counts, output_file_path, fmt=output_format, dpi=dpi, mode=mode)
+    click.echo(f"Scanned {len(arrays.users)} users")
+
+
+@cli.command("export")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page, i.e. between checkpoints.")
+@click.option("--output-file-path", type=Path, required=True)
+@click.option("--format", "export_format", type=click.Choice(EXPORT_FORMATS), default="ndjson", show_default=True)
+@click.option("--checkpoint-dir", type=Path, default=None,
+              help="Where segment parts and checkpoints live, defaults to <output>.parts.")
+def export_events(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    segments: int,
+    read_capacity: Optional[float],
+    page_size: Optional[int],
+    output_file_path: Path,
+    export_format: str,
+    checkpoint_dir: Optional[Path],
+):
+    checkpoint_dir = checkpoint_dir or default_checkpoint_dir(output_file_path)
+    if checkpoint_dir.exists():
+        click.echo(f"Resuming from checkpoints in {checkpoint_dir}")
+    try:
+        users, events = export_table(
+            table_name,
+            output_file_path,
+            export_format,
+            client=dynamodb_client(region, endpoint_url),
+            segments=segments,
+            read_capacity=read_capacity,
+            page_size=page_size,
+            checkpoint_dir=checkpoint_dir,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Exported {events} events of {users} users to {output_file_path}")
+
+
+@cli.command("batch")
+@click.option("--activities-file-path", type=Path, required=True)
+@click.option("--output-template", type=str, default="out/{user}/{year}.png", show_default=True,
+              help="Output path with optional {user} and {year} placeholders; omitted ones are aggregated.")
+@click.option("--manifest-path", type=Path, default=None,
+              help="Where to write the JSON manifest, defaults to the template's base directory.")
+@click.option("--workers", type=int, default=None, help="Worker processes, defaults to the CPU count.")
+@__render_options
+def activities_heat_map_batch(
+    activities_file_path: Path,
+    output_template: str,
+    manifest_path: Optional[Path],
+    workers: Optional[int],
+    output_format: Optional[str],
+    dpi: int,
+    mode: str,
+):
+    __check_render_options(output_format, mode)
+    try:
+        template_fields(output_template)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--output-template")
+
+    arrays = parse_activities(read_activities(activities_file_path))
+    manifest_path = manifest_path or default_manifest_path(output_template)
+    entries = render_batch(
+        arrays, output_template, manifest_path,
+        fmt=output_format, dpi=dpi, mode=mode, workers=workers,
+    )
+    click.echo(f"Rendered {len(entries)} heatmaps, manifest written to {manifest_path}")
+
+
+@cli.command("calendar")
+@click.option("--activities-file-path", type=Path, required=True)
+@click.option("--output-dir", type=Path, required=True)
+@click.option("--user", "user_id", type=str, default=None, help="Only analyse this user id, defaults to all users.")
+@click.option("--table-format", type=click.Choice(["json", "csv"]), default="json", show_default=True)
+@click.option("--top", type=int, default=10, show_default=True, help="Number of busiest dates to report.")
+@click.option("--plot/--no-plot", default=False, help="Also render a weekday x week calendar per year.")
+@click.option("--format", "output_format", type=click.Choice(["png", "svg"]), default="png", show_default=True)
+@click.option("--dpi", type=int, default=200, show_default=True)
+def activities_calendar(
+    activities_file_path: Path,
+    output_dir: Path,
+    user_id: Optional[str],
+    table_format: str,
+    top: int,
+    plot: bool,
+    output_format: str,
+    dpi: int,
+):
+    arrays = parse_activities(read_activities(activities_file_path))
+    mask = None
+    if user_id is not None:
+        if user_id not in arrays.users:
+            raise click.BadParameter(f"user {user_id} not found in export", param_hint="--user")
+        mask = arrays.user == arrays.users.index(user_id)
+
+    analytics = compute_calendar_analytics(arrays, mask=mask, top=top)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = write_json(analytics, output_dir) if table_format == "json" else write_csv(analytics, output_dir)
+    if plot:
+        paths += plot_calendars(analytics, output_dir, fmt=output_format, dpi=dpi)
+    click.echo(f"Wrote {len(paths)} files to {output_dir}")
+
+
+@cli.command("generate")
+@click.option("--output-path", type=Path, required=True, help="Output file, or directory for the local format.")
+@click.option("--format", "output_format", type=click.Choice(OUTPUT_FORMATS), default="csv", show_default=True)
+@click.option("--users", type=int, default=10, show_default=True)
+@click.option("--events", type=int, default=1000, show_default=True, help="Events per user.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--start-year", type=int, default=2000, show_default=True)
+@click.option("--end-year", type=int, default=2024, show_default=True)
+@click.option("--recurring-share", type=float, default=0.2, show_default=True,
+              help="Share of events recurring every year, like birthdays.")
+@click.option("--holiday-share", type=float, default=0.3, show_default=True,
+              help="Share of events clustered around Christmas, August and Easter.")
+@click.option("--detail-clauses", type=float, default=2.0, show_default=True,
+              help="Mean number of extra clauses per description.")
+@click.option("--workers", type=int, default=None, help="Worker processes, defaults to the CPU count.")
+def generate_activities(
+    output_path: Path,
+    output_format: str,
+    users: int,
+    events: int,
+    seed: int,
+    start_year: int,
+    end_year: int,
+    recurring_share: float,
+    holiday_share: float,
+    detail_clauses: float,
+    workers: Optional[int],
+):
+    if recurring_share + holiday_share > 1:
+        raise click.BadParameter("recurring and holiday shares cannot exceed 1", param_hint="--holiday-share")
+    config = GeneratorConfig(
+        users=users, events=events, seed=seed, start_year=start_year, end_year=end_year,
+        recurring_share=recurring_share, holiday_share=holiday_share, detail_clauses=detail_clauses,
+    )
+    written = write_dataset(config, output_path, output_format, workers=workers)
+    click.echo(f"Generated {written} users into {output_path}")
+
+
+@cli.command("import")
+@click.option("--input-file-path", type=Path, required=True)
+@click.option("--input-format", type=click.Choice(INPUT_FORMATS), default=None,
+              help="Input format, inferred from the file extension when omitted.")
+@click.option("--user", "default_user", type=str, default=None,
+              help="User id for entries without one; required for ICS files.")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", default=None,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--workers", type=int, default=8, show_default=True, help="Threads issuing batch writes.")
+@click.option("--dry-run", is_flag=True, help="Merge and report item sizes without writing.")
+def import_events(
+    input_file_path: Path,
+    input_format: Optional[str],
+    default_user: Optional[str],
+    table_name: Optional[str],
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    workers: int,
+    dry_run: bool,
+):
+    input_format = input_format or IMPORT_SUFFIXES.get(input_file_path.suffix.lower())
+    if input_format is None:
+        raise click.BadParameter(f"cannot infer format from {input_file_path.name}", param_hint="--input-format")
+    if table_name is None and not dry_run:
+        raise click.BadParameter("required unless --dry-run is given", param_hint="--table-name")
+
+    try:
+        grouped = group_by_user(read_entries(input_file_path, input_format, default_user))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    client = dynamodb_client(region, endpoint_url) if table_name else None
+    results = import_entries(grouped, client=client, table_name=table_name, dry_run=dry_run, workers=workers)
+    for result in results:
+        status = "error" if result.error else ("written" if result.written else "not written")
+        click.echo(
+            f"{result.user}: {result.imported} imported, {result.skipped_duplicates} duplicates, "
+            f"{result.item_size} bytes, {status}" + (f" ({result.error})" if result.error else "")
+        )
+    if any(result.error for result in results):
+        raise click.ClickException("some users could not be imported")
+
+
+def __echo_migration_progress(stats: MigrationStats) -> None:
+    click.echo(
+        f"scanned {stats.scanned}, migrated {stats.migrated}, up to date {stats.current}, "
+        f"conflicts {stats.conflicts}, errors {stats.errors}"
+    )
+
+
+@cli.command("migrate")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--target-version", type=int, default=CURRENT_SCHEMA_VERSION, show_default=True)
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--write-capacity", type=float, default=None, help="Maximum write capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page, i.e. between checkpoints.")
+@click.option("--checkpoint-dir", type=Path, default=None,
+              help="Where segment checkpoints live, defaults to .kamaji-migrate-<table>-v<version>.")
+@click.option("--progress-interval", type=float, default=5.0, show_default=True, help="Seconds between progress lines.")
+@click.option("--dry-run", is_flag=True, help="Count the items to migrate without writing.")
+def migrate_schema(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    target_version: int,
+    segments: int,
+    read_capacity: Optional[float],
+    write_capacity: Optional[float],
+    page_size: Optional[int],
+    checkpoint_dir: Optional[Path],
+    progress_interval: float,
+    dry_run: bool,
+):
+    try:
+        stats = migrate_table(
+            table_name,
+            client=dynamodb_client(region, endpoint_url),
+            segments=segments,
+            target_version=target_version,
+            read_capacity=read_capacity,
+            write_capacity=write_capacity,
+            page_size=page_size,
+            checkpoint_dir=checkpoint_dir,
+            dry_run=dry_run,
+            progress=__echo_migration_progress,
+            progress_interval=progress_interval,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for user, error in stats.error_samples:
+        click.echo(f"{user}: {error}", err=True)
+    if stats.errors:
+        raise click.ClickException(f"{stats.errors} items could not be migrated")
+
+
+@cli.command("rebuild-tags")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--write-capacity", type=float, default=None, help="Maximum write capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page, i.e. between checkpoints.")
+@click.option("--checkpoint-dir", type=Path, default=None,
+              help="Where segment checkpoints live, defaults to .kamaji-rebuild-tags-<table>.")
+@click.option("--progress-interval", type=float, default=5.0, show_default=True, help="Seconds between progress lines.")
+@click.option("--dry-run", is_flag=True, help="Count the items whose index would change without writing.")
+def rebuild_tags(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    segments: int,
+    read_capacity: Optional[float],
+    write_capacity: Optional[float],
+    page_size: Optional[int],
+    checkpoint_dir: Optional[Path],
+    progress_interval: float,
+    dry_run: bool,
+):
+    try:
+        stats = rebuild_tag_indexes(
+            table_name,
+            client=dynamodb_client(region, endpoint_url),
+            segments=segments,
+            read_capacity=read_capacity,
+            write_capacity=write_capacity,
+            page_size=page_size,
+            checkpoint_dir=checkpoint_dir,
+            dry_run=dry_run,
+            progress=__echo_migration_progress,
+            progress_interval=progress_interval,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for user, error in stats.error_samples:
+        click.echo(f"{user}: {error}", err=True)
+    if stats.errors:
+        raise click.ClickException(f"{stats.errors} items could not be rebuilt")
+
+
+@cli.command("archive")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--keep-years", type=click.IntRange(min=1), default=5, show_default=True,
+              help="Years, the current one included, left in users' items; older ones are archived.")
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--write-capacity", type=float, default=None, help="Maximum write capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page.")
+@click.option("--dry-run", is_flag=True, help="Count the users and years to archive without writing.")
+def archive_old_years(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    keep_years: int,
+    segments: int,
+    read_capacity: Optional[float],
+    write_capacity: Optional[float],
+    page_size: Optional[int],
+    dry_run: bool,
+):
+    horizon_year = date.today().year - keep_years + 1
+    stats = archive_table(
+        table_name,
+        horizon_year,
+        client=dynamodb_client(region, endpoint_url),
+        segments=segments,
+        read_capacity=read_capacity,
+        write_capacity=write_capacity,
+        page_size=page_size,
+        dry_run=dry_run,
+    )
+    click.echo(
+        f"{'Would archive' if dry_run else 'Archived'} {stats.archived_years} years before {horizon_year} "
+        f"of {stats.archived_users}/{stats.scanned} users ({stats.deferred} deferred, {stats.conflicts} conflicts)"
+    )
+    for user, error in stats.error_samples:
+        click.echo(f"{user}: {error}", err=True)
+    if stats.errors:
+        raise click.ClickException(f"{stats.errors} users could not be archived")
+
+
+@cli.command("capacity")
+@click.option("--table-name", envvar="DYNAMODB_PERSISTENCE_TABLE_NAME", required=True,
+              help="Persistence table, defaults to $DYNAMODB_PERSISTENCE_TABLE_NAME.")
+@click.option("--region", envvar="DYNAMODB_PERSISTENCE_REGION", default=None,
+              help="AWS region, defaults to $DYNAMODB_PERSISTENCE_REGION or eu-west-1.")
+@click.option("--endpoint-url", default=None, help="Alternative endpoint, e.g. http://localhost:8000 for DynamoDB Local.")
+@click.option("--segments", type=int, default=4, show_default=True, help="Parallel scan segments, one thread each.")
+@click.option("--read-capacity", type=float, default=None, help="Maximum read capacity units consumed per second.")
+@click.option("--page-size", type=int, default=None, help="Items per Scan page.")
+@click.option("--output-file-path", type=Path, required=True, help="JSON report, with every user.")
+@click.option("--keep-years", type=click.IntRange(min=1), default=5, show_default=True,
+              help="Years kept in users' items by `kamaji archive`; older ones count as archivable.")
+@click.option("--growth-window", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Complete years over which growth is averaged.")
+@click.option("--warn-fraction", type=click.FloatRange(0, 1), default=0.5, show_default=True,
+              help="Share of the 400 KB item limit past which users are flagged.")
+@click.option("--horizon", type=float, default=2.0, show_default=True,
+              help="Years within which reaching the item limit flags users.")
+@click.option("--top", type=int, default=10, show_default=True, help="Largest users listed in the summary.")
+def capacity_report(
+    table_name: str,
+    region: Optional[str],
+    endpoint_url: Optional[str],
+    segments: int,
+    read_capacity: Optional[float],
+    page_size: Optional[int],
+    output_file_path: Path,
+    keep_years: int,
+    growth_window: int,
+    warn_fraction: float,
+    horizon: float,
+    top: int,
+):
+    report = capacity_table(
+        table_name,
+        client=dynamodb_client(region, endpoint_url),
+        segments=segments,
+        read_capacity=read_capacity,
+        page_size=page_size,
+        keep_years=keep_years,
+        growth_window=growth_window,
+        warn_fraction=warn_fraction,
+        horizon=horizon,
     )
-    figure = svm.get_figure()
-    figure.savefig(output_file_path, dpi=400)
+    output_file_path.parent.mkdir(parents=True, exist_ok=True)
+    output_file_path.write_text(json.dumps(report_json(report), indent=2))
+    click.echo(report_summary(report, top=top))
@@ -0,0 +1,289 @@
+"""Offline migration of every item of the persistence table to the current schema version, or rewrite of derived data."""
+
+import json
+import logging
+import shutil
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from kamaji.dynamo import (
+    ATTRIBUTES_KEY,
+    PARTITION_KEY,
+    CapacityLimiter,
+    dynamodb_client,
+    is_user_item,
+    scan_segment,
+    write_checkpoint,
+)
+from persistence.codec import deserialize_map, serialize_map
+from persistence.schema import (
+    CURRENT_SCHEMA_VERSION,
+    SCHEMA_VERSION_KEY,
+    migrate_attributes,
+    schema_version,
+)
+from persistence.tags import rebuild_tag_index
+from persistence.versioning import VERSION_KEY, item_version
+
+logger = logging.getLogger(__name__)
+
+# How many failed items are kept, with their error, for the final report
+MAX_ERROR_SAMPLES = 20
+
+# Rewrites attributes in place, returning True if they changed
+Transform = Callable[[dict], bool]
+
+
+@dataclass
+class MigrationStats:
+    """Running totals across segments; ``current`` counts items already up to date."""
+
+    scanned: int = 0
+    migrated: int = 0
+    current: int = 0
+    conflicts: int = 0
+    errors: int = 0
+    error_samples: list[tuple[str, str]] = field(default_factory=list)
+
+    def add(self, other: "MigrationStats") -> None:
+        self.scanned += other.scanned
+        self.migrated += other.migrated
+        self.current += other.current
+        self.conflicts += other.conflicts
+        self.errors += other.errors
+        self.error_samples.extend(other.error_samples[:MAX_ERROR_SAMPLES - len(self.error_samples)])
+
+
+@dataclass
+class MigrationCheckpoint:
+    segment: int
+    total_segments: int
+    target_version: int
+    last_key: Optional[dict] = None
+    done: bool = False
+    scanned: int = 0
+    migrated: int = 0
+    current: int = 0
+    conflicts: int = 0
+    errors: int = 0
+
+
+class _ConditionFailed(Exception):
+    pass
+
+
+class ItemMigrator:
+    """
+    Migrates single items with writes conditioned on the schema and item
+    versions that were read, so concurrent saves by the skill are never
+    overwritten. Successful writes bump the item version like the skill does.
+    A ``transform``, such as rebuilding an index, runs after the migration.
+    """
+
+    def __init__(
+        self,
+        client,
+        table_name: str,
+        target_version: int,
+        limiter: CapacityLimiter,
+        dry_run: bool = False,
+        max_attempts: int = 3,
+        transform: Optional[Transform] = None,
+    ) -> None:
+        self.client = client
+        self.table_name = table_name
+        self.target_version = target_version
+        self.limiter = limiter
+        self.dry_run = dry_run
+        self.max_attempts = max_attempts
+        self.transform = transform
+
+    def _write(self, user: str, attributes: dict, read_schema_version: int, read_item_version: int) -> None:
+        names = {"#a": ATTRIBUTES_KEY, "#s": SCHEMA_VERSION_KEY, "#v": VERSION_KEY}
+        values = {":new": serialize_map({**attributes, VERSION_KEY: read_item_version + 1})}
+        conditions = []
+        for placeholder, version in (("#s", read_schema_version), ("#v", read_item_version)):
+            if version:
+                conditions.append(f"#a.{placeholder} = :{placeholder[1]}")
+                values[f":{placeholder[1]}"] = {"N": str(version)}
+            else:
+                conditions.append(f"attribute_not_exists(#a.{placeholder})")
+        condition = " AND ".join(conditions)
+        self.limiter.wait()
+        try:
+            response = self.client.update_item(
+                TableName=self.table_name,
+                Key={PARTITION_KEY: {"S": user}},
+                UpdateExpression="SET #a = :new",
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnConsumedCapacity="TOTAL",
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            raise _ConditionFailed()
+        self.limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0))
+
+    def _reread(self, user: str) -> Optional[dict]:
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={PARTITION_KEY: {"S": user}},
+            ConsistentRead=True,
+        )
+        return response.get("Item")
+
+    def migrate(self, item: dict, stats: MigrationStats) -> None:
+        """Upgrade one scanned item, re-reading it after conflicting writes."""
+        user = item[PARTITION_KEY]["S"]
+        stats.scanned += 1
+        try:
+            for _ in range(self.max_attempts):
+                attributes = deserialize_map(item.get(ATTRIBUTES_KEY, {"M": {}}))
+                read_versions = schema_version(attributes), item_version(attributes)
+                changed = migrate_attributes(attributes, self.target_version)
+                if self.transform is not None:
+                    changed = self.transform(attributes) or changed
+                if not changed:
+                    stats.current += 1
+                    return
+                if self.dry_run:
+                    stats.migrated += 1
+                    return
+                try:
+                    self._write(user, attributes, *read_versions)
+                    stats.migrated += 1
+                    return
+                except _ConditionFailed:
+                    stats.conflicts += 1
+                    item = self._reread(user)
+                    if item is None:
+                        # Deleted in the meantime: nothing left to migrate
+                        stats.current += 1
+                        return
+            raise RuntimeError(f"still conflicting after {self.max_attempts} attempts")
+        except Exception as e:
+            logger.warning(f"Could not migrate {user}: {e}")
+            stats.errors += 1
+            if len(stats.error_samples) < MAX_ERROR_SAMPLES:
+                stats.error_samples.append((user, str(e)))
+
+
+def _load_checkpoint(path: Path, segment: int, total_segments: int, target_version: int) -> MigrationCheckpoint:
+    if not path.exists():
+        return MigrationCheckpoint(segment, total_segments, target_version)
+    checkpoint = MigrationCheckpoint(**json.loads(path.read_text(encoding="utf-8")))
+    if (checkpoint.total_segments, checkpoint.target_version) != (total_segments, target_version):
+        raise ValueError(
+            f"Checkpoint {path} was written for {checkpoint.total_segments} segments to version "
+            f"{checkpoint.target_version}, not {total_segments} to {target_version}"
+        )
+    return checkpoint
+
+
+def migrate_table(
+    table_name: str,
+    client=None,
+    segments: int = 4,
+    target_version: int = CURRENT_SCHEMA_VERSION,
+    read_capacity: Optional[float] = None,
+    write_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+    checkpoint_dir: Optional[Path] = None,
+    dry_run: bool = False,
+    progress: Optional[Callable[[MigrationStats], None]] = None,
+    progress_interval: float = 5.0,
+    transform: Optional[Transform] = None,
+) -> MigrationStats:
+    """
+    Upgrade every item of the table to ``target_version``, then apply ``transform`` if given.
+
+    Scan segments run in their own threads under shared read and write
+    capacity budgets. Each segment checkpoints its last evaluated key and
+    counters after every page, so running the migration again after an
+    interruption resumes where it stopped. ``progress`` is called with the
+    running totals every ``progress_interval`` seconds and once at the end.
+    Per-item failures are counted and sampled rather than aborting the run.
+    """
+    client = client or dynamodb_client()
+    checkpoint_dir = checkpoint_dir or Path(f".kamaji-migrate-{table_name}-v{target_version}")
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    read_limiter = CapacityLimiter(read_capacity)
+    migrator = ItemMigrator(
+        client, table_name, target_version, CapacityLimiter(write_capacity), dry_run, transform=transform
+    )
+
+    segment_stats = [MigrationStats() for _ in range(segments)]
+    errors: list[BaseException] = []
+    finished = threading.Event()
+
+    def totals() -> MigrationStats:
+        stats = MigrationStats()
+        for s in segment_stats:
+            stats.add(s)
+        return stats
+
+    def worker(segment: int) -> None:
+        stats = segment_stats[segment]
+        checkpoint_path = checkpoint_dir / f"segment-{segment:04d}.json"
+        try:
+            checkpoint = _load_checkpoint(checkpoint_path, segment, segments, target_version)
+            stats.add(MigrationStats(
+                checkpoint.scanned, checkpoint.migrated, checkpoint.current,
+                checkpoint.conflicts, checkpoint.errors,
+            ))
+            if checkpoint.done:
+                return
+            pages = scan_segment(
+                client, table_name, segment, segments, read_limiter,
+                projection=[PARTITION_KEY, ATTRIBUTES_KEY],
+                page_size=page_size,
+                exclusive_start_key=checkpoint.last_key,
+            )
+            for items, last_key in pages:
+                for item in items:
+                    if is_user_item(item):
+                        migrator.migrate(item, stats)
+                checkpoint.last_key = last_key
+                checkpoint.done = last_key is None
+                checkpoint.scanned, checkpoint.migrated, checkpoint.current = (
+                    stats.scanned, stats.migrated, stats.current
+                )
+                checkpoint.conflicts, checkpoint.errors = stats.conflicts, stats.errors
+                write_checkpoint(checkpoint_path, checkpoint)
+        except BaseException as e:
+            errors.append(e)
+
+    def reporter() -> None:
+        while not finished.wait(progress_interval):
+            progress(totals())
+
+    threads = [threading.Thread(target=worker, args=(segment,)) for segment in range(segments)]
+    if progress:
+        threading.Thread(target=reporter, daemon=True).start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    finished.set()
+    if errors:
+        raise errors[0]
+
+    stats = totals()
+    if progress:
+        progress(stats)
+    shutil.rmtree(checkpoint_dir)
+    return stats
+
+
+def rebuild_tag_indexes(table_name: str, checkpoint_dir: Optional[Path] = None, **kwargs) -> MigrationStats:
+    """
+    Rebuild every item's index of categories (see persistence.tags), e.g.
+    after a change to the inferred categories' keywords.
+
+    Accepts the options of migrate_table; items are brought to the current
+    schema version along the way.
+    """
+    checkpoint_dir = checkpoint_dir or Path(f".kamaji-rebuild-tags-{table_name}")
+    return migrate_table(table_name, checkpoint_dir=checkpoint_dir, transform=rebuild_tag_index, **kwargs)
@@ -0,0 +1,113 @@
+"""Headless heatmap rendering for the month x day activity grid."""
+
+import calendar
+from pathlib import Path
+from typing import Literal, Optional
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.image as mpimg  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import seaborn as sn  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+RenderMode = Literal["annotated", "fast", "raw"]
+RENDER_MODES: tuple[str, ...] = ("annotated", "fast", "raw")
+
+CMAP = "coolwarm"
+DAY_LABELS = [i for i in range(1, 32)]
+MONTH_LABELS = [calendar.month_name[i][0:3] for i in range(1, 13)]
+WEEKDAY_LABELS = [calendar.day_abbr[i] for i in range(7)]
+
+# Size in pixels of a single grid cell in "raw" mode
+RAW_CELL_SIZE = 16
+
+
+class HeatmapRenderer:
+    """
+    Render 31 x 12 activity grids onto a single reusable Agg figure.
+
+    The figure is owned by the renderer rather than pyplot's global state,
+    so consecutive renders never leak axes or colorbars into each other.
+
+    Modes:
+    - annotated: seaborn heatmap with per-cell counts (the historical output)
+    - fast: a single pcolormesh drawn straight from the count array
+    - raw: the grid encoded directly as a PNG, one colored block per cell
+    """
+
+    def __init__(self, figsize: tuple[float, float] = (6.4, 4.8)) -> None:
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+
+    def render(
+        self,
+        counts: np.ndarray,
+        output_file_path: Path,
+        fmt: Optional[str] = None,
+        dpi: int = 400,
+        mode: RenderMode = "annotated",
+    ) -> None:
+        if mode == "raw":
+            if fmt not in (None, "png"):
+                raise ValueError("Raw mode can only encode PNG output")
+            self._encode_raw(counts, output_file_path)
+            return
+
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        if mode == "annotated":
+            self._draw_annotated(ax, counts)
+        elif mode == "fast":
+            self._draw_fast(ax, counts)
+        else:
+            raise ValueError(f"Unknown render mode: {mode}")
+        self.figure.savefig(output_file_path, format=fmt, dpi=dpi)
+
+    def render_calendar(
+        self,
+        grid: np.ndarray,
+        output_file_path: Path,
+        title: str = "",
+        fmt: Optional[str] = None,
+        dpi: int = 200,
+    ) -> None:
+        """Render a weekday x week-of-year grid, GitHub contribution style."""
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        mesh = ax.pcolormesh(grid, cmap="Greens", edgecolors="white", linewidth=1)
+        ax.set_yticks(np.arange(len(WEEKDAY_LABELS)) + 0.5, WEEKDAY_LABELS)
+        ax.set_xticks([])
+        ax.set_aspect("equal")
+        ax.invert_yaxis()
+        ax.tick_params(length=0)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        ax.set_title(title)
+        self.figure.colorbar(mesh, ax=ax, orientation="horizontal", shrink=0.5)
+        self.figure.savefig(output_file_path, format=fmt, dpi=dpi, bbox_inches="tight")
+
+    def _draw_annotated(self, ax, counts: np.ndarray) -> None:
+        frame = pd.DataFrame(counts, index=DAY_LABELS, columns=MONTH_LABELS)
+        sn.heatmap(
+            frame, ax=ax, annot=True, cmap=CMAP, linecolor="white", linewidths=1
+        )
+
+    def _draw_fast(self, ax, counts: np.ndarray) -> None:
+        mesh = ax.pcolormesh(counts, cmap=CMAP, edgecolors="white", linewidth=1)
+        ax.set_xticks(np.arange(len(MONTH_LABELS)) + 0.5, MONTH_LABELS)
+        ax.set_yticks(np.arange(len(DAY_LABELS)) + 0.5, DAY_LABELS)
+        ax.tick_params(length=0)
+        ax.invert_yaxis()
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        self.figure.colorbar(mesh, ax=ax)
+
+    def _encode_raw(self, counts: np.ndarray, output_file_path: Path) -> None:
+        cells = np.ones((RAW_CELL_SIZE, RAW_CELL_SIZE))
+        pixels = np.kron(counts, cells)
+        mpimg.imsave(output_file_path, pixels, cmap=CMAP, format="png")
@@ -0,0 +1,251 @@
+"""Deterministic synthetic event histories for benchmarks."""
+
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from persistence.local import local_item_path
+
+OUTPUT_FORMATS: tuple[str, ...] = ("attributes", "csv", "dynamodb-json", "local")
+
+NAMES = [
+    "Luca", "Giulia", "Marco", "Sofia", "Matteo", "Aurora", "Leonardo", "Alice",
+    "Francesco", "Ginevra", "Alessandro", "Emma", "Lorenzo", "Beatrice", "Tommaso",
+    "nonna Pina", "nonno Gino", "zia Carla", "zio Beppe", "Pamela",
+]
+RECURRING = [
+    "compleanno di {name}", "onomastico di {name}", "anniversario di matrimonio di {name}",
+    "festa di {name}", "ricorrenza del battesimo di {name}",
+]
+ACTIONS = [
+    "siamo andati", "abbiamo passato la giornata", "abbiamo fatto una gita",
+    "abbiamo pranzato", "siamo stati", "abbiamo dormito", "abbiamo fatto un picnic",
+]
+PLACES = [
+    "al mare", "in montagna", "al lago di Garda", "dai nonni", "a Venezia", "a Roma",
+    "in campeggio", "al parco", "in Val di Fassa", "a Firenze", "allo zoo", "al museo",
+]
+HOLIDAYS = [
+    ("Natale", 353, 17),       # 20 December into early January
+    ("Ferragosto", 212, 31),   # August
+    ("Pasqua", 90, 25),        # April
+]
+HOLIDAY_ACTIONS = [
+    "abbiamo festeggiato {holiday}", "vacanze di {holiday}", "pranzo di {holiday}",
+]
+COMPANY = [
+    "con i nonni", "con gli zii", "con la classe", "con i cugini", "con gli amici",
+    "con {name}", "con {name} e {other}", "da soli",
+]
+DETAILS = [
+    "e abbiamo mangiato la pizza", "e ha piovuto tutto il giorno", "e siamo tornati tardi",
+    "e {name} ha perso un dente", "e abbiamo visto i delfini", "e abbiamo preso il gelato",
+    "e la macchina si è rotta sulla strada del ritorno", "e abbiamo fatto tantissime foto",
+    "e {name} si è addormentato in macchina", "e abbiamo conosciuto una famiglia simpatica",
+]
+
+
+@dataclass
+class GeneratorConfig:
+    """
+    Shape of the generated histories.
+
+    ``recurring_share`` of each user's events are yearly recurrences (birthdays,
+    anniversaries) and ``holiday_share`` cluster around Christmas, August and
+    Easter; the rest fall on uniformly random dates. ``detail_clauses`` is the
+    mean number of extra clauses appended to each description.
+    """
+
+    users: int = 10
+    events: int = 1000
+    seed: int = 0
+    start_year: int = 2000
+    end_year: int = 2024
+    recurring_share: float = 0.2
+    holiday_share: float = 0.3
+    detail_clauses: float = 2.0
+
+
+def _month_day(dates: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    return (
+        years.astype(np.int64) + 1970,
+        (months - years.astype("datetime64[M]")).astype(np.int64) + 1,
+        (dates - months.astype("datetime64[D]")).astype(np.int64) + 1,
+    )
+
+
+def _year_starts(years: np.ndarray) -> np.ndarray:
+    return (years - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+
+
+def _descriptions(rng: np.random.Generator, bases: list[str], config: GeneratorConfig) -> list[str]:
+    """Extend each base sentence with company and detail clauses, drawing all indexes in bulk."""
+    n = len(bases)
+    company = rng.integers(len(COMPANY), size=n).tolist()
+    names = rng.integers(len(NAMES), size=n).tolist()
+    # Offset in 1..len-1 so the second name always differs from the first
+    others = ((rng.integers(1, len(NAMES), size=n) + names) % len(NAMES)).tolist()
+    clauses = rng.poisson(config.detail_clauses, size=n)
+    details = iter(rng.integers(len(DETAILS), size=int(clauses.sum())).tolist())
+
+    descriptions = []
+    for base, c, name, other, n_details in zip(bases, company, names, others, clauses.tolist()):
+        parts = [base, COMPANY[c]]
+        parts.extend(DETAILS[next(details)] for _ in range(n_details))
+        descriptions.append(" ".join(parts).format(name=NAMES[name], other=NAMES[other]))
+    return descriptions
+
+
+def generate_user(user_idx: int, config: GeneratorConfig) -> tuple[str, dict[str, dict[str, list[str]]]]:
+    """
+    Generate one user's persistent attributes ("M-D" -> year -> events).
+
+    Each user draws from its own generator seeded by (seed, user index), so
+    output is identical whatever the order or process users are built in.
+    """
+    rng = np.random.default_rng([config.seed, user_idx])
+    user_id = f"amzn1.ask.account.SYNTHETIC{config.seed:04d}{user_idx:08d}"
+    attributes: dict[str, dict[str, list[str]]] = {}
+
+    def add(years: np.ndarray, dates: np.ndarray, descriptions: list[str]) -> int:
+        _, months, days = _month_day(dates)
+        for year, month, day, text in zip(years.tolist(), months.tolist(), days.tolist(), descriptions):
+            attributes.setdefault(f"{month}-{day}", {}).setdefault(str(year), []).append(text)
+        return len(descriptions)
+
+    n_recurring = int(config.events * config.recurring_share)
+    n_holiday = int(config.events * config.holiday_share)
+    generated = 0
+
+    # Yearly recurrences, on non-leap days so every year has them
+    while generated < n_recurring:
+        # 2023 is not a leap year: draw the month/day there
+        _, month, day = _month_day(np.datetime64("2023-01-01") + rng.integers(365, size=1))
+        first_year = int(rng.integers(config.start_year, config.end_year + 1))
+        years = np.arange(first_year, config.end_year + 1)[:n_recurring - generated]
+        months = ((years - 1970) * 12 + month[0] - 1).astype("datetime64[M]")
+        dates = months.astype("datetime64[D]") + (day[0] - 1)
+        text = RECURRING[rng.integers(len(RECURRING))].format(name=NAMES[rng.integers(len(NAMES))])
+        generated += add(years, dates, [text] * len(years))
+
+    # Holiday clusters, possibly running into the following year
+    if n_holiday:
+        holiday_idx = rng.integers(len(HOLIDAYS), size=n_holiday)
+        starts = np.array([HOLIDAYS[i][1] for i in holiday_idx])
+        lengths = np.array([HOLIDAYS[i][2] for i in holiday_idx])
+        years = rng.integers(config.start_year, max(config.start_year, config.end_year - 1) + 1, size=n_holiday)
+        dates = _year_starts(years) + starts + (rng.random(n_holiday) * lengths).astype(np.int64)
+        actual_years, _, _ = _month_day(dates)
+        actions = rng.integers(len(HOLIDAY_ACTIONS), size=n_holiday).tolist()
+        bases = [
+            HOLIDAY_ACTIONS[a].format(holiday=HOLIDAYS[h][0])
+            for a, h in zip(actions, holiday_idx.tolist())
+        ]
+        generated += add(actual_years, dates, _descriptions(rng, bases, config))
+
+    # Uniformly random days, leap days included
+    n_random = config.events - generated
+    if n_random > 0:
+        years = rng.integers(config.start_year, config.end_year + 1, size=n_random)
+        leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+        dates = _year_starts(years) + (rng.random(n_random) * (365 + leap)).astype(np.int64)
+        actions = rng.integers(len(ACTIONS), size=n_random).tolist()
+        places = rng.integers(len(PLACES), size=n_random).tolist()
+        bases = [f"{ACTIONS[a]} {PLACES[p]}" for a, p in zip(actions, places)]
+        add(years, dates, _descriptions(rng, bases, config))
+
+    return user_id, attributes
+
+
+def to_typed(attributes: dict[str, dict[str, list[str]]]) -> dict:
+    """Convert plain attributes to the DynamoDB JSON shape of the exports."""
+    return {
+        event_day: {"M": {
+            year: {"L": [{"S": event} for event in events]}
+            for year, events in years.items()
+        }}
+        for event_day, years in attributes.items()
+    }
+
+
+def _serialize(user_idx: int, config: GeneratorConfig, output_format: str) -> tuple[str, str]:
+    user_id, attributes = generate_user(user_idx, config)
+    if output_format == "attributes":
+        return user_id, json.dumps({"id": user_id, "attributes": attributes}, ensure_ascii=False)
+    if output_format == "dynamodb-json":
+        item = {"id": {"S": user_id}, "attributes": {"M": to_typed(attributes)}}
+        return user_id, json.dumps({"Item": item}, ensure_ascii=False)
+    if output_format == "csv":
+        return user_id, json.dumps(to_typed(attributes), ensure_ascii=False)
+    return user_id, json.dumps(attributes, ensure_ascii=False)
+
+
+def _serialize_chunk(args: tuple[range, GeneratorConfig, str]) -> list[tuple[str, str]]:
+    users, config, output_format = args
+    return [_serialize(user_idx, config, output_format) for user_idx in users]
+
+
+def _serialized_users(
+    config: GeneratorConfig, output_format: str, workers: Optional[int], chunk: int = 16
+) -> Iterator[tuple[str, str]]:
+    chunks = [
+        (range(start, min(start + chunk, config.users)), config, output_format)
+        for start in range(0, config.users, chunk)
+    ]
+    if workers == 1:
+        for args in chunks:
+            yield from _serialize_chunk(args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() keeps chunk order, so output stays deterministic
+        for serialized in executor.map(_serialize_chunk, chunks):
+            yield from serialized
+
+
+def write_dataset(
+    config: GeneratorConfig,
+    output_path: Path,
+    output_format: str,
+    workers: Optional[int] = None,
+) -> int:
+    """
+    Stream the generated users to ``output_path`` in the requested shape.
+
+    - attributes: JSON lines of {"id", "attributes"} with plain attributes
+    - csv: the console's "id","attributes" CSV export
+    - dynamodb-json: JSON lines of {"Item": ...}, as DynamoDB exports to S3
+    - local: a directory in the LocalPersistenceAdapter layout
+
+    Returns:
+        Number of users written
+    """
+    users = _serialized_users(config, output_format, workers)
+    written = 0
+    if output_format == "local":
+        output_path.mkdir(parents=True, exist_ok=True)
+        for user_id, serialized in users:
+            local_item_path(output_path, user_id).write_text(serialized, encoding="utf-8")
+            written += 1
+        return written
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        if output_format == "csv":
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            writer.writerow(["id", "attributes"])
+            for user_id, serialized in users:
+                writer.writerow([user_id, serialized])
+                written += 1
+        else:
+            for _, serialized in users:
+                f.write(serialized)
+                f.write("\n")
+                written += 1
+    return written
@@ -6,13 +6,17 @@ from typing import Final
 ADD_EVENT_REQUEST: Final[str] = "AddEventRequest"
 ADD_EVENT_TYPE: Final[str] = "AddEventType"
 ADD_EVENT_COMPLETE: Final[str] = "AddEventComplete"
+ADD_RECURRING_EVENT: Final[str] = "AddRecurringEvent"
 RETRIEVE_EVENTS: Final[str] = "RetrieveEvents"
+RETRIEVE_FULL_HISTORY: Final[str] = "RetrieveFullHistory"
+RETRIEVE_BY_CATEGORY: Final[str] = "RetrieveByCategory"
 MODIFY_EVENTS_REQUEST: Final[str] = "ModifyEventsRequest"
 NEXT_EVENT: Final[str] = "NextEvent"
 PREVIOUS_EVENT: Final[str] = "PreviousEvent"
 DELETE_EVENT: Final[str] = "DeleteEvent"
 EDIT_EVENT: Final[str] = "EditEvent"
 EDIT_EVENT_DESCRIPTION: Final[str] = "EditEventDescription"
+UNDO_LAST_CHANGE: Final[str] = "UndoLastChange"
 
 # Amazon built-in intents
 AMAZON_HELP: Final[str] = "AMAZON.HelpIntent"
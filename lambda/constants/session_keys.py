@@ -7,6 +7,10 @@ CURR_EVENT_DATE: Final[str] = "curr_event_date"
 EVENT_DAY: Final[str] = "event_day"
 CURR_YEAR_IDX: Final[str] = "curr_year_idx"
 CURR_EVENT_IDX: Final[str] = "curr_event_idx"
+# Whether navigation includes the day's archived years
+INCLUDE_ARCHIVED: Final[str] = "include_archived"
+# Index of the first year already heard when Next stepped into the archived years
+ARCHIVED_YEARS_END: Final[str] = "archived_years_end"
 
 # Delete confirmation
 PENDING_DELETE: Final[str] = "pending_delete"
@@ -1,6 +1,16 @@
 """Slot name constants matching interaction model."""
 
-from typing import Final
+from typing import Final, FrozenSet
 
 DATE: Final[str] = "date"
 EVENT: Final[str] = "event"
+START_YEAR: Final[str] = "startYear"
+END_YEAR: Final[str] = "endYear"
+HOUSEHOLD: Final[str] = "household"
+CATEGORY: Final[str] = "category"
+YEAR: Final[str] = "year"
+
+# Values of the HOUSEHOLD slot type, synonyms included
+HOUSEHOLD_VALUES: Final[FrozenSet[str]] = frozenset({
+    "tutti", "tutta la famiglia", "la famiglia", "noi tutti", "tutti quanti",
+})
@@ -1,2 +1,2 @@
 # Exceptions package
-from .handlers import CatchAllExceptionHandler
+from .handlers import CatchAllExceptionHandler, DeadlineExceededHandler
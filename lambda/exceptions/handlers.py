@@ -7,12 +7,39 @@ from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_model import Response
 
 import prompts
+from persistence import DeadlineExceededError
 
 logger = logging.getLogger(__name__)
 
 # Fallback messages in case localization fails
 FALLBACK_ERROR_MESSAGE = "Mi dispiace, si è verificato un errore."
 FALLBACK_HELP_REPROMPT = "Come posso aiutarti?"
+FALLBACK_TRY_AGAIN_SHORTLY = "Scusa, ci sto mettendo troppo. Riprova tra poco."
+
+
+class DeadlineExceededHandler(AbstractExceptionHandler):
+    """
+    Handler for persistence calls that ran out of the request's time.
+
+    Answers before Alexa gives up on the skill, asking to try again shortly.
+    """
+
+    def can_handle(self, handler_input: HandlerInput, exception: Exception) -> bool:
+        return isinstance(exception, DeadlineExceededError)
+
+    def handle(self, handler_input: HandlerInput, exception: Exception) -> Response:
+        logger.warning(
+            f"Persistence deadline exceeded: {exception}",
+            extra={'request_id': handler_input.request_envelope.request.request_id},
+        )
+
+        try:
+            data = handler_input.attributes_manager.request_attributes.get("_", {})
+            message = data.get(prompts.TRY_AGAIN_SHORTLY, FALLBACK_TRY_AGAIN_SHORTLY)
+        except Exception:
+            message = FALLBACK_TRY_AGAIN_SHORTLY
+
+        return handler_input.response_builder.speak(message).response
 
 
 class CatchAllExceptionHandler(AbstractExceptionHandler):
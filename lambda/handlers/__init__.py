@@ -1,11 +1,15 @@
 # Handlers package
 from .base import BaseHandler
+from .idempotency import ReplayedRequestHandler
+from .static import StaticResponseHandler, StaticResponses
 from .launch import LaunchRequestHandler
 from .events import (
     AddEventRequestHandler,
     AddEventTypeHandler,
     AddEventCompleteHandler,
+    AddRecurringEventHandler,
     RetrieveEventHandler,
+    RetrieveByCategoryHandler,
     ModifyEventsRequestHandler,
     NextEventHandler,
     PreviousEventHandler,
@@ -14,6 +18,7 @@ from .events import (
     CancelDeleteHandler,
     EditEventHandler,
     EditEventDescriptionHandler,
+    UndoLastChangeHandler,
 )
 from .amazon_intents import (
     HelpIntentHandler,
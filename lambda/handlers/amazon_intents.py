@@ -3,32 +3,32 @@
 import logging
 
 from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.response_helper import ResponseFactory
 from ask_sdk_core.utils import is_intent_name, is_request_type
 from ask_sdk_model import Response
 from ask_sdk_model.ui import SimpleCard
 
 from .base import BaseHandler
+from .static import StaticResponseHandler
 from constants import intents
 import prompts
 
 logger = logging.getLogger(__name__)
 
 
-class HelpIntentHandler(BaseHandler):
+class HelpIntentHandler(StaticResponseHandler):
     """Handler for Help Intent."""
 
     def can_handle(self, handler_input: HandlerInput) -> bool:
         return is_intent_name(intents.AMAZON_HELP)(handler_input)
 
-    def handle(self, handler_input: HandlerInput) -> Response:
-        self.log_handler_entry(handler_input)
-
-        speech = self.get_string(handler_input, prompts.HELP_MESSAGE)
-        reprompt = self.get_string(handler_input, prompts.HELP_REPROMPT)
-        skill_name = self.get_string(handler_input, prompts.SKILL_NAME)
+    def build(self, strings: dict, response_builder: ResponseFactory) -> Response:
+        speech = strings.get(prompts.HELP_MESSAGE, prompts.HELP_MESSAGE)
+        reprompt = strings.get(prompts.HELP_REPROMPT, prompts.HELP_REPROMPT)
+        skill_name = strings.get(prompts.SKILL_NAME, prompts.SKILL_NAME)
 
         return (
-            handler_input.response_builder
+            response_builder
             .speak(speech)
             .ask(reprompt)
             .set_card(SimpleCard(skill_name, speech))
@@ -36,7 +36,7 @@ class HelpIntentHandler(BaseHandler):
         )
 
 
-class CancelOrStopIntentHandler(BaseHandler):
+class CancelOrStopIntentHandler(StaticResponseHandler):
     """Single handler for Cancel and Stop Intent."""
 
     def can_handle(self, handler_input: HandlerInput) -> bool:
@@ -45,26 +45,21 @@ class CancelOrStopIntentHandler(BaseHandler):
             is_intent_name(intents.AMAZON_STOP)(handler_input)
         )
 
-    def handle(self, handler_input: HandlerInput) -> Response:
-        self.log_handler_entry(handler_input)
-
-        speech = self.get_string(handler_input, prompts.STOP_MESSAGE)
-        return self.build_response(handler_input, speech, end_session=True)
+    def build(self, strings: dict, response_builder: ResponseFactory) -> Response:
+        speech = strings.get(prompts.STOP_MESSAGE, prompts.STOP_MESSAGE)
+        return response_builder.speak(speech).response
 
 
-class FallbackIntentHandler(BaseHandler):
+class FallbackIntentHandler(StaticResponseHandler):
     """Handler for Fallback Intent."""
 
     def can_handle(self, handler_input: HandlerInput) -> bool:
         return is_intent_name(intents.AMAZON_FALLBACK)(handler_input)
 
-    def handle(self, handler_input: HandlerInput) -> Response:
-        self.log_handler_entry(handler_input)
-
-        speech = self.get_string(handler_input, prompts.FALLBACK_MESSAGE)
-        reprompt = self.get_string(handler_input, prompts.FALLBACK_REPROMPT)
-
-        return self.build_response(handler_input, speech, reprompt=reprompt)
+    def build(self, strings: dict, response_builder: ResponseFactory) -> Response:
+        speech = strings.get(prompts.FALLBACK_MESSAGE, prompts.FALLBACK_MESSAGE)
+        reprompt = strings.get(prompts.FALLBACK_REPROMPT, prompts.FALLBACK_REPROMPT)
+        return response_builder.speak(speech).ask(reprompt).response
 
 
 class SessionEndedRequestHandler(BaseHandler):
@@ -1,6 +1,7 @@
 """Handlers for event management (add, retrieve, modify, delete)."""
 
 import logging
+from datetime import date
 from typing import Dict, List, Optional, Tuple
 
 from ask_sdk_core.handler_input import HandlerInput
@@ -9,21 +10,58 @@ from ask_sdk_model import Response
 
 from .base import BaseHandler
 from constants import intents, slots, session_keys
+from persistence import RECURRING_YEAR, canonical_tag, recurring_events, with_recurring_events
 from utils import (
     parse_date_slot,
     format_event_day,
     format_event_year,
     DateParseError,
+    get_day_attributes,
+    get_events_by_tag,
+    get_household_day_attributes,
+    get_household_events_by_tag,
     get_events_for_day,
+    get_persistent_attr,
+    get_recurring_events_for_day,
+    has_archived_years,
     add_event_to_persistence,
+    add_recurring_event_to_persistence,
     delete_event_from_persistence,
     update_event_in_persistence,
+    undo_last_change,
 )
 import prompts
 
 logger = logging.getLogger(__name__)
 
 
+def _event_prompt(handler: BaseHandler, handler_input: HandlerInput, year: str, event: str) -> str:
+    """Prompt presenting one event, or a recurring one under RECURRING_YEAR."""
+    if year == RECURRING_YEAR:
+        return handler.get_string(handler_input, prompts.RECURRING_EVENT_PROMPT, event=event)
+    return handler.get_string(handler_input, prompts.EVENT_PROMPT, year=year, event=event)
+
+
+def _parse_year_slot(handler_input: HandlerInput, slot_name: str) -> Optional[int]:
+    """Value of an optional year slot, None if missing or not a number."""
+    value = get_slot_value(handler_input=handler_input, slot_name=slot_name)
+    try:
+        return int(value) if value else None
+    except ValueError:
+        logger.warning(f"Ignoring invalid year in slot {slot_name}: {value}")
+        return None
+
+
+def _describe_recurrence(recurrence: Dict[str, object]) -> str:
+    """A recurring event's description, with the years it is bounded by."""
+    text = str(recurrence["text"])
+    if "start" in recurrence:
+        text += f", dal {int(recurrence['start'])}"
+    if "end" in recurrence:
+        text += f" fino al {int(recurrence['end'])}"
+    return text
+
+
 class AddEventRequestHandler(BaseHandler):
     """Handler for initiating event addition flow."""
 
@@ -107,8 +145,11 @@ class AddEventCompleteHandler(BaseHandler):
 
         event_day = format_event_day(event_date)
         event_year = format_event_year(event_date)
+        # Optional: categories are otherwise inferred from the description
+        category = get_slot_value(handler_input=handler_input, slot_name=slots.CATEGORY)
+        tags = [canonical_tag(category)] if category else []
 
-        add_event_to_persistence(handler_input, event_day, event_year, event)
+        add_event_to_persistence(handler_input, event_day, event_year, event, tags)
 
         speech = self.get_string(handler_input, prompts.EVENT_ADDED)
         reprompt = self.get_string(handler_input, prompts.ADD_ANOTHER_PROMPT)
@@ -116,11 +157,60 @@ class AddEventCompleteHandler(BaseHandler):
         return self.build_response(handler_input, speech, reprompt=reprompt)
 
 
+class AddRecurringEventHandler(BaseHandler):
+    """Handler for adding an event repeating every year, optionally between two years."""
+
+    def can_handle(self, handler_input: HandlerInput) -> bool:
+        return is_intent_name(intents.ADD_RECURRING_EVENT)(handler_input)
+
+    def handle(self, handler_input: HandlerInput) -> Response:
+        self.log_handler_entry(handler_input)
+
+        date_str = get_slot_value(handler_input=handler_input, slot_name=slots.DATE)
+        event = get_slot_value(handler_input=handler_input, slot_name=slots.EVENT)
+
+        if date_str is None or event is None:
+            logger.warning("Missing date or event slot in AddRecurringEvent")
+            speech = self.get_string(handler_input, prompts.ERROR_MESSAGE)
+            return self.build_response(handler_input, speech)
+
+        try:
+            event_date = parse_date_slot(date_str)
+        except DateParseError as e:
+            logger.warning(f"Invalid date in AddRecurringEvent: {e}")
+            speech = self.get_string(handler_input, prompts.ERROR_MESSAGE)
+            return self.build_response(handler_input, speech)
+
+        # The date's own year is meaningless: Alexa fills in the next occurrence
+        event_day = format_event_day(event_date)
+        start_year = _parse_year_slot(handler_input, slots.START_YEAR)
+        end_year = _parse_year_slot(handler_input, slots.END_YEAR)
+
+        added = add_recurring_event_to_persistence(
+            handler_input, event_day, event, start_year, end_year
+        )
+
+        prompt = prompts.RECURRING_EVENT_ADDED if added else prompts.RECURRING_EVENT_EXISTS
+        speech = self.get_string(handler_input, prompt)
+        reprompt = self.get_string(handler_input, prompts.ADD_ANOTHER_PROMPT)
+
+        return self.build_response(handler_input, speech, reprompt=reprompt)
+
+
 class RetrieveEventHandler(BaseHandler):
-    """Handler for querying events by date."""
+    """
+    Handler for querying events by date, archived years included on request.
+
+    Recurring events are told once, before the events of single years.
+    Asked for "tutti", the events of every household member are told,
+    without their archived years.
+    """
 
     def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name(intents.RETRIEVE_EVENTS)(handler_input)
+        return (
+            is_intent_name(intents.RETRIEVE_EVENTS)(handler_input) or
+            is_intent_name(intents.RETRIEVE_FULL_HISTORY)(handler_input)
+        )
 
     def handle(self, handler_input: HandlerInput) -> Response:
         self.log_handler_entry(handler_input)
@@ -135,22 +225,93 @@ class RetrieveEventHandler(BaseHandler):
             return self.build_response(handler_input, speech)
 
         event_day = format_event_day(event_date)
-        events = get_events_for_day(handler_input, event_day)
+        household_slot = get_slot_value(handler_input=handler_input, slot_name=slots.HOUSEHOLD)
+        household = (household_slot or "").lower() in slots.HOUSEHOLD_VALUES
+        full_history = is_intent_name(intents.RETRIEVE_FULL_HISTORY)(handler_input)
+        if household:
+            day_attributes = get_household_day_attributes(handler_input, event_day)
+            events = day_attributes.get(event_day, {})
+            recurring = recurring_events(day_attributes, event_day)
+        else:
+            events = get_events_for_day(handler_input, event_day, include_archived=full_history)
+            recurring = get_recurring_events_for_day(handler_input, event_day)
 
         reprompt = self.get_string(handler_input, prompts.ANYTHING_ELSE)
 
-        if not events:
+        if not events and not recurring:
             formatted_date = event_date.strftime('%d %B')
             speech = self.get_string(
                 handler_input, prompts.NO_EVENTS_FOUND, date=formatted_date
             )
             return self.build_response(handler_input, speech, reprompt=reprompt)
 
-        # Build speech listing all events by year
+        # Build speech listing recurring events, then all events by year
         parts = []
+        if recurring:
+            parts.append(self.get_string(
+                handler_input, prompts.RECURRING_EVENTS,
+                events="; ".join(_describe_recurrence(r) for r in recurring)
+            ))
         for year in sorted(events.keys()):
             year_events = "; ".join(events[year])
             parts.append(f"Nel {year} {year_events}.")
+        if not household and not full_history and has_archived_years(handler_input, event_day):
+            parts.append(self.get_string(
+                handler_input, prompts.OLDER_EVENTS_AVAILABLE,
+                date=event_date.strftime('%d %B')
+            ))
+        speech = " ".join(parts)
+
+        return self.build_response(handler_input, speech, reprompt=reprompt)
+
+
+class RetrieveByCategoryHandler(BaseHandler):
+    """
+    Handler for querying the events of a category, such as trips, optionally in one year.
+
+    Events are found through the categories index, without reading every
+    day; archived years and recurring events are not part of it. Asked for
+    "tutti", the events of every household member are told.
+    """
+
+    def can_handle(self, handler_input: HandlerInput) -> bool:
+        return is_intent_name(intents.RETRIEVE_BY_CATEGORY)(handler_input)
+
+    def handle(self, handler_input: HandlerInput) -> Response:
+        self.log_handler_entry(handler_input)
+
+        category = get_slot_value(handler_input=handler_input, slot_name=slots.CATEGORY)
+        if category is None:
+            logger.warning("Category slot is missing in RetrieveByCategory")
+            speech = self.get_string(handler_input, prompts.ERROR_MESSAGE)
+            return self.build_response(handler_input, speech)
+
+        tag = canonical_tag(category)
+        year = _parse_year_slot(handler_input, slots.YEAR)
+        household_slot = get_slot_value(handler_input=handler_input, slot_name=slots.HOUSEHOLD)
+        if (household_slot or "").lower() in slots.HOUSEHOLD_VALUES:
+            events = get_household_events_by_tag(handler_input, tag, str(year) if year else None)
+        else:
+            events = get_events_by_tag(handler_input, tag, str(year) if year else None)
+
+        reprompt = self.get_string(handler_input, prompts.ANYTHING_ELSE)
+
+        if not events:
+            if year:
+                speech = self.get_string(handler_input, prompts.NO_CATEGORY_EVENTS_IN_YEAR, category=tag, year=year)
+            else:
+                speech = self.get_string(handler_input, prompts.NO_CATEGORY_EVENTS, category=tag)
+            return self.build_response(handler_input, speech, reprompt=reprompt)
+
+        # Events come in date order: tell them year by year
+        by_year: Dict[str, List[str]] = {}
+        for event_day, event_year, event in events:
+            month, day_of_month = (int(part) for part in event_day.split("-"))
+            formatted_date = date(int(event_year), month, day_of_month).strftime('%d %B')
+            by_year.setdefault(event_year, []).append(f"il {formatted_date} {event}")
+        parts = [self.get_string(handler_input, prompts.CATEGORY_EVENTS, category=tag)]
+        for event_year, year_events in by_year.items():
+            parts.append(f"Nel {event_year} {'; '.join(year_events)}.")
         speech = " ".join(parts)
 
         return self.build_response(handler_input, speech, reprompt=reprompt)
@@ -175,7 +336,7 @@ class ModifyEventsRequestHandler(BaseHandler):
             return self.build_response(handler_input, speech)
 
         event_day = format_event_day(event_date)
-        events = get_events_for_day(handler_input, event_day)
+        events = get_events_for_day(handler_input, event_day, include_recurring=True)
 
         if not events:
             speech = self.get_string(
@@ -187,6 +348,11 @@ class ModifyEventsRequestHandler(BaseHandler):
         self.set_session_attr(handler_input, session_keys.EVENT_DAY, event_day)
         self.set_session_attr(handler_input, session_keys.CURR_YEAR_IDX, 0)
         self.set_session_attr(handler_input, session_keys.CURR_EVENT_IDX, 0)
+        # A day with archived years only was read from them
+        self.set_session_attr(
+            handler_input, session_keys.INCLUDE_ARCHIVED, not get_day_attributes(handler_input, event_day).get(event_day)
+        )
+        self.set_session_attr(handler_input, session_keys.ARCHIVED_YEARS_END, None)
 
         years = sorted(events.keys())
         curr_year = years[0]
@@ -197,9 +363,8 @@ class ModifyEventsRequestHandler(BaseHandler):
             reprompt = self.get_string(handler_input, prompts.ANYTHING_ELSE)
             return self.build_response(handler_input, speech, reprompt=reprompt)
 
-        speech = self.get_string(
-            handler_input, prompts.EVENT_PROMPT,
-            year=curr_year, event=curr_events[0]
+        speech = _event_prompt(
+            self, handler_input, curr_year, curr_events[0]
         )
         return self.build_response(handler_input, speech, reprompt=speech)
 
@@ -220,8 +385,8 @@ def _get_event_navigation_context(
     if event_day is None:
         return None
 
-    persistence_attr = handler_input.attributes_manager.persistent_attributes
-    events = persistence_attr.get(event_day, {})
+    include_archived = session_attr.get(session_keys.INCLUDE_ARCHIVED, False)
+    events = get_events_for_day(handler_input, event_day, include_archived=include_archived, include_recurring=True)
 
     if not events:
         return None
@@ -233,6 +398,21 @@ def _get_event_navigation_context(
     return event_day, events, years, year_idx, event_idx
 
 
+def _step_into_archived_years(handler: BaseHandler, handler_input: HandlerInput, event_day: str) -> bool:
+    """
+    Include the day's archived years in the navigation, if it does not yet.
+
+    They are only read: deleting or editing one of their events brings
+    its day back from the archive.
+    """
+    if handler.get_session_attr(handler_input, session_keys.INCLUDE_ARCHIVED):
+        return False
+    if not has_archived_years(handler_input, event_day):
+        return False
+    handler.set_session_attr(handler_input, session_keys.INCLUDE_ARCHIVED, True)
+    return True
+
+
 class NextEventHandler(BaseHandler):
     """Handler for navigating to next event."""
 
@@ -257,14 +437,15 @@ class NextEventHandler(BaseHandler):
             self.set_session_attr(
                 handler_input, session_keys.CURR_EVENT_IDX, new_event_idx
             )
-            speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=curr_year, event=curr_events[new_event_idx]
+            speech = _event_prompt(
+                self, handler_input, curr_year, curr_events[new_event_idx]
             )
             return self.build_response(handler_input, speech, reprompt=speech)
 
-        # Try to move to next year
-        if len(years) > year_idx + 1:
+        # Try to move to next year; after stepping into the archived years,
+        # stop before the recent ones already heard
+        years_end = self.get_session_attr(handler_input, session_keys.ARCHIVED_YEARS_END)
+        if (len(years) if years_end is None else years_end) > year_idx + 1:
             new_year_idx = year_idx + 1
             new_year = years[new_year_idx]
             new_events = events[new_year]
@@ -274,12 +455,29 @@ class NextEventHandler(BaseHandler):
             )
             self.set_session_attr(handler_input, session_keys.CURR_EVENT_IDX, 0)
 
-            speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=new_year, event=new_events[0]
+            speech = _event_prompt(
+                self, handler_input, new_year, new_events[0]
             )
             return self.build_response(handler_input, speech, reprompt=speech)
 
+        # Past the last year: continue with the archived ones, which are older
+        if _step_into_archived_years(self, handler_input, event_day):
+            events = get_events_for_day(handler_input, event_day, include_archived=True, include_recurring=True)
+            all_years = sorted(events.keys())
+            first_year = all_years[0]
+
+            self.set_session_attr(handler_input, session_keys.CURR_YEAR_IDX, 0)
+            self.set_session_attr(handler_input, session_keys.CURR_EVENT_IDX, 0)
+            self.set_session_attr(handler_input, session_keys.ARCHIVED_YEARS_END, all_years.index(years[0]))
+
+            intro = self.get_string(handler_input, prompts.OLDER_EVENTS_INTRO)
+            event_speech = _event_prompt(
+                self, handler_input, first_year, events[first_year][0]
+            )
+            return self.build_response(
+                handler_input, f"{intro} {event_speech}", reprompt=event_speech
+            )
+
         # No more events
         speech = self.get_string(handler_input, prompts.NO_MORE_EVENTS)
         reprompt = self.get_string(handler_input, prompts.ANYTHING_ELSE)
@@ -309,9 +507,8 @@ class PreviousEventHandler(BaseHandler):
             self.set_session_attr(
                 handler_input, session_keys.CURR_EVENT_IDX, new_event_idx
             )
-            speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=curr_year, event=events[curr_year][new_event_idx]
+            speech = _event_prompt(
+                self, handler_input, curr_year, events[curr_year][new_event_idx]
             )
             return self.build_response(handler_input, speech, reprompt=speech)
 
@@ -329,9 +526,28 @@ class PreviousEventHandler(BaseHandler):
                 handler_input, session_keys.CURR_EVENT_IDX, new_event_idx
             )
 
-            speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=new_year, event=new_events[new_event_idx]
+            speech = _event_prompt(
+                self, handler_input, new_year, new_events[new_event_idx]
+            )
+            return self.build_response(handler_input, speech, reprompt=speech)
+
+        # Before the first year: step into the archived ones, which are older
+        if _step_into_archived_years(self, handler_input, event_day):
+            events = get_events_for_day(handler_input, event_day, include_archived=True, include_recurring=True)
+            years = sorted(events.keys())
+            new_year_idx = max(years.index(curr_year) - 1, 0)
+            new_year = years[new_year_idx]
+            new_event_idx = len(events[new_year]) - 1
+
+            self.set_session_attr(
+                handler_input, session_keys.CURR_YEAR_IDX, new_year_idx
+            )
+            self.set_session_attr(
+                handler_input, session_keys.CURR_EVENT_IDX, new_event_idx
+            )
+
+            speech = _event_prompt(
+                self, handler_input, new_year, events[new_year][new_event_idx]
             )
             return self.build_response(handler_input, speech, reprompt=speech)
 
@@ -398,9 +614,8 @@ class ConfirmDeleteHandler(BaseHandler):
 
         # Try to show next event in same year
         if remaining_events and len(remaining_events) > event_idx:
-            next_event_speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=curr_year, event=remaining_events[event_idx]
+            next_event_speech = _event_prompt(
+                self, handler_input, curr_year, remaining_events[event_idx]
             )
             speech = f"{deleted_speech} {next_event_speech}"
             return self.build_response(handler_input, speech, reprompt=next_event_speech)
@@ -408,21 +623,22 @@ class ConfirmDeleteHandler(BaseHandler):
         # Try to show first event in same year (if we deleted the last one)
         if remaining_events:
             self.set_session_attr(handler_input, session_keys.CURR_EVENT_IDX, 0)
-            next_event_speech = self.get_string(
-                handler_input, prompts.EVENT_PROMPT,
-                year=curr_year, event=remaining_events[0]
+            next_event_speech = _event_prompt(
+                self, handler_input, curr_year, remaining_events[0]
             )
             speech = f"{deleted_speech} {next_event_speech}"
             return self.build_response(handler_input, speech, reprompt=next_event_speech)
 
-        # Try to move to next year
-        if len(years) > year_idx + 1:
+        # Try to move to next year; after stepping into the archived years,
+        # stop before the recent ones already heard
+        years_end = self.get_session_attr(handler_input, session_keys.ARCHIVED_YEARS_END)
+        if (len(years) if years_end is None else years_end) > year_idx + 1:
             new_year_idx = year_idx + 1
             new_year = years[new_year_idx]
 
             # Re-fetch events after deletion
-            persistence_attr = handler_input.attributes_manager.persistent_attributes
-            updated_events = persistence_attr.get(event_day, {})
+            persistence_attr = get_persistent_attr(handler_input)
+            updated_events = with_recurring_events(persistence_attr, event_day)
             new_events = updated_events.get(new_year, [])
 
             if new_events:
@@ -431,9 +647,8 @@ class ConfirmDeleteHandler(BaseHandler):
                 )
                 self.set_session_attr(handler_input, session_keys.CURR_EVENT_IDX, 0)
 
-                next_event_speech = self.get_string(
-                    handler_input, prompts.EVENT_PROMPT,
-                    year=new_year, event=new_events[0]
+                next_event_speech = _event_prompt(
+                    self, handler_input, new_year, new_events[0]
                 )
                 speech = f"{deleted_speech} {next_event_speech}"
                 return self.build_response(handler_input, speech, reprompt=next_event_speech)
@@ -519,10 +734,38 @@ class EditEventDescriptionHandler(BaseHandler):
             return self.build_response(handler_input, speech)
 
         edited_speech = self.get_string(handler_input, prompts.EVENT_EDITED)
-        next_event_speech = self.get_string(
-            handler_input, prompts.EVENT_PROMPT,
-            year=curr_year, event=new_event
+        next_event_speech = _event_prompt(
+            self, handler_input, curr_year, new_event
         )
         speech = f"{edited_speech} {next_event_speech}"
 
         return self.build_response(handler_input, speech, reprompt=next_event_speech)
+
+
+class UndoLastChangeHandler(BaseHandler):
+    """Handler for undoing the most recent add, edit or delete."""
+
+    UNDO_PROMPTS = {
+        "add": prompts.UNDO_ADD,
+        "delete": prompts.UNDO_DELETE,
+        "edit": prompts.UNDO_EDIT,
+    }
+
+    def can_handle(self, handler_input: HandlerInput) -> bool:
+        return is_intent_name(intents.UNDO_LAST_CHANGE)(handler_input)
+
+    def handle(self, handler_input: HandlerInput) -> Response:
+        self.log_handler_entry(handler_input)
+
+        undone = undo_last_change(handler_input)
+        if undone is None:
+            speech = self.get_string(handler_input, prompts.NOTHING_TO_UNDO)
+        else:
+            # An edit is reverted to its previous text, which is what is left
+            event = undone["previous"] if undone["op"] == "edit" else undone["text"]
+            speech = self.get_string(handler_input, self.UNDO_PROMPTS[undone["op"]], event=event)
+            # Indexes may have shifted: leave any navigation in progress
+            self.set_session_attr(handler_input, session_keys.EVENT_DAY, None)
+
+        reprompt = self.get_string(handler_input, prompts.ANYTHING_ELSE)
+        return self.build_response(handler_input, f"{speech} {reprompt}", reprompt=reprompt)
@@ -0,0 +1,49 @@
+"""Handler answering retried requests without handling them again."""
+
+import logging
+
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Response
+
+from .base import BaseHandler
+from persistence import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Request attribute holding the cached (response, session attributes) to replay
+REPLAY_ATTR = "replayed_response"
+
+
+class ReplayedRequestHandler(BaseHandler):
+    """
+    Handler for requests already answered by this container.
+
+    Alexa retries a request, with the same request id, when the response
+    did not reach it in time. The response produced the first time (kept by
+    interceptors.ResponseCacheInterceptor) is returned again, together with
+    the session attributes it left, without touching persistence. Retries
+    reaching another container are recognized by the helpers in
+    utils.attributes instead, from the marker saved with the change.
+    Register this handler first.
+    """
+
+    def __init__(self, cache: ResponseCache) -> None:
+        self.cache = cache
+
+    def can_handle(self, handler_input: HandlerInput) -> bool:
+        request_id = handler_input.request_envelope.request.request_id
+        cached = self.cache.get(request_id) if request_id else None
+        if cached is None:
+            return False
+        # Kept for handle(): the entry could expire in between
+        handler_input.attributes_manager.request_attributes[REPLAY_ATTR] = cached
+        return True
+
+    def handle(self, handler_input: HandlerInput) -> Response:
+        self.log_handler_entry(handler_input)
+
+        response, session_attributes = handler_input.attributes_manager.request_attributes.pop(REPLAY_ATTR)
+        logger.info(f"Replaying response to request {handler_input.request_envelope.request.request_id}")
+        if session_attributes is not None and handler_input.request_envelope.session is not None:
+            handler_input.attributes_manager.session_attributes = session_attributes
+        return response
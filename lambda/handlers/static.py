@@ -0,0 +1,77 @@
+"""Responses that depend only on the request's locale, built once per locale."""
+
+import logging
+import threading
+from abc import abstractmethod
+from typing import Callable, Dict, Iterable, Optional, Tuple, Type
+
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.response_helper import ResponseFactory
+from ask_sdk_model import Response
+
+from .base import BaseHandler
+
+logger = logging.getLogger(__name__)
+
+StringsForLocale = Callable[[Optional[str]], dict]
+
+
+class StaticResponses:
+    """
+    Per-locale cache of the responses of StaticResponseHandler subclasses.
+
+    Responses are built by the handlers' ``build`` from the strings
+    ``strings_for`` returns for a locale, the first time that locale is
+    asked for unless ``preload`` built them already. The same Response
+    object is returned to every request: it must not be modified.
+    """
+
+    def __init__(self, strings_for: StringsForLocale) -> None:
+        self.strings_for = strings_for
+        self._responses: Dict[Tuple[Type["StaticResponseHandler"], Optional[str]], Response] = {}
+        self._lock = threading.Lock()
+
+    def response(self, handler: "StaticResponseHandler", locale: Optional[str]) -> Response:
+        key = (type(handler), locale)
+        response = self._responses.get(key)
+        if response is None:
+            with self._lock:
+                response = self._responses.get(key)
+                if response is None:
+                    response = handler.build(self.strings_for(locale), ResponseFactory())
+                    self._responses[key] = response
+        return response
+
+    def preload(self, handlers: Iterable["StaticResponseHandler"], locales: Iterable[str]) -> None:
+        """Build the responses of ``handlers`` for each of ``locales``."""
+        locales = list(locales)
+        for handler in handlers:
+            for locale in locales:
+                self.response(handler, locale)
+        logger.info(f"Prebuilt {len(self._responses)} static responses")
+
+
+class StaticResponseHandler(BaseHandler):
+    """
+    Handler whose response depends only on the locale.
+
+    With a StaticResponses cache the response built for the request's
+    locale is returned as is, without formatting strings or touching
+    persistence; without one it is built on each request from the
+    strings of the LocalizationInterceptor.
+    """
+
+    def __init__(self, responses: Optional[StaticResponses] = None) -> None:
+        self.responses = responses
+
+    @abstractmethod
+    def build(self, strings: dict, response_builder: ResponseFactory) -> Response:
+        """Build the response from a locale's strings; strings missing from it read as their key."""
+
+    def handle(self, handler_input: HandlerInput) -> Response:
+        self.log_handler_entry(handler_input)
+
+        if self.responses is not None:
+            return self.responses.response(self, handler_input.request_envelope.request.locale)
+        strings = handler_input.attributes_manager.request_attributes.get("_", {})
+        return self.build(strings, handler_input.response_builder)
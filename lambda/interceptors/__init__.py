@@ -1,3 +1,12 @@
 # Interceptors package
+from .day_reads import DayReaderInterceptor
+from .deadline import DeadlineInterceptor
+from .household import HouseholdViewInterceptor
+from .idempotency import ResponseCacheInterceptor
 from .localization import LocalizationInterceptor
 from .logging import RequestLogger, ResponseLogger
+from .profiling import (
+    ProfilingRequestInterceptor,
+    ProfilingResponseInterceptor,
+    ProfilingSettings,
+)
@@ -0,0 +1,18 @@
+"""Interceptor letting read-only handlers fetch single days of the user's item."""
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
+from ask_sdk_core.handler_input import HandlerInput
+
+from persistence import DAY_READER_ATTR, DayReader
+
+
+class DayReaderInterceptor(AbstractRequestInterceptor):
+    """Give each request a DayReader over the skill's persistence adapter (see utils.get_events_for_day)."""
+
+    def __init__(self, adapter: AbstractPersistenceAdapter) -> None:
+        self.adapter = adapter
+
+    def process(self, handler_input: HandlerInput) -> None:
+        reader = DayReader(self.adapter, handler_input.request_envelope)
+        handler_input.attributes_manager.request_attributes[DAY_READER_ATTR] = reader
@@ -0,0 +1,24 @@
+"""Interceptor bounding persistence calls by the Lambda's remaining time."""
+
+import logging
+
+from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
+from ask_sdk_core.handler_input import HandlerInput
+
+from persistence import Deadline, set_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineInterceptor(AbstractRequestInterceptor):
+    """Set the request's persistence deadline from the Lambda context, if any."""
+
+    def process(self, handler_input: HandlerInput) -> None:
+        context = handler_input.context
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            # Local runs and tests have no Lambda context: no time limit
+            set_deadline(None)
+            return
+        deadline = Deadline.from_context(context)
+        logger.debug(f"Persistence deadline in {deadline.remaining():.3f}s")
+        set_deadline(deadline)
@@ -0,0 +1,18 @@
+"""Interceptor letting handlers read days across the household's members."""
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
+from ask_sdk_core.handler_input import HandlerInput
+
+from persistence import HOUSEHOLD_VIEW_ATTR, HouseholdView
+
+
+class HouseholdViewInterceptor(AbstractRequestInterceptor):
+    """Give each request a HouseholdView over the skill's persistence adapter (see utils.get_household_day_attributes)."""
+
+    def __init__(self, adapter: AbstractPersistenceAdapter) -> None:
+        self.adapter = adapter
+
+    def process(self, handler_input: HandlerInput) -> None:
+        view = HouseholdView(self.adapter, handler_input.request_envelope)
+        handler_input.attributes_manager.request_attributes[HOUSEHOLD_VIEW_ATTR] = view
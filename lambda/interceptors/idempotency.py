@@ -0,0 +1,32 @@
+"""Interceptor keeping responses so that retried requests can be answered again."""
+
+import logging
+
+from ask_sdk_core.dispatch_components import AbstractResponseInterceptor
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Response
+
+from persistence import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCacheInterceptor(AbstractResponseInterceptor):
+    """
+    Remember each response by request id, for handlers.ReplayedRequestHandler.
+
+    Responses of failed requests are not kept, since exception handlers
+    skip response interceptors: their retries are handled afresh.
+    """
+
+    def __init__(self, cache: ResponseCache) -> None:
+        self.cache = cache
+
+    def process(self, handler_input: HandlerInput, response: Response) -> None:
+        request_id = handler_input.request_envelope.request.request_id
+        if response is None or not request_id:
+            return
+        session_attributes = None
+        if handler_input.request_envelope.session is not None:
+            session_attributes = handler_input.attributes_manager.session_attributes
+        self.cache.put(request_id, response, session_attributes)
@@ -3,6 +3,7 @@
 import json
 import logging
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
 from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
 from ask_sdk_core.handler_input import HandlerInput
@@ -23,6 +24,8 @@ class LocalizationInterceptor(AbstractRequestInterceptor):
 
     def __init__(self) -> None:
         self._language_data: dict = {}
+        # Merged strings of each locale seen so far
+        self._locale_data: Dict[Optional[str], dict] = {}
         self._load_language_data()
 
     def _load_language_data(self) -> None:
@@ -35,9 +38,10 @@ class LocalizationInterceptor(AbstractRequestInterceptor):
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON in language strings file: {e}")
 
-    def process(self, handler_input: HandlerInput) -> None:
-        locale = handler_input.request_envelope.request.locale
-        logger.info(f"Locale is {locale}")
+    def strings_for(self, locale: Optional[str]) -> dict:
+        """Strings of a locale: its base language overridden by the locale's own, else English."""
+        if locale in self._locale_data:
+            return self._locale_data[locale]
 
         # Get base language (e.g., "it" from "it-IT")
         base_locale = locale[:2] if locale else "en"
@@ -56,4 +60,19 @@ class LocalizationInterceptor(AbstractRequestInterceptor):
             data = self._language_data["en"].copy()
             logger.warning(f"No translation for locale {locale}, falling back to English")
 
-        handler_input.attributes_manager.request_attributes["_"] = data
+        self._locale_data[locale] = data
+        return data
+
+    def locales(self) -> List[str]:
+        """Locales with their own strings in the strings file, e.g. "it-IT" but not "it"."""
+        return [key for key in self._language_data if "-" in key]
+
+    def preload(self, locales: Optional[Iterable[str]] = None) -> None:
+        """Merge the strings of ``locales``, by default of every locale in the strings file."""
+        for locale in locales or self.locales():
+            self.strings_for(locale)
+
+    def process(self, handler_input: HandlerInput) -> None:
+        locale = handler_input.request_envelope.request.locale
+        logger.info(f"Locale is {locale}")
+        handler_input.attributes_manager.request_attributes["_"] = self.strings_for(locale).copy()
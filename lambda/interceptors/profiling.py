@@ -0,0 +1,174 @@
+"""Opt-in cProfile and tracemalloc profiling of single requests."""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import FrozenSet, Mapping, Optional
+
+from ask_sdk_core.dispatch_components import (
+    AbstractRequestInterceptor,
+    AbstractResponseInterceptor,
+)
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Response
+
+from persistence import ITEM_LOADED_ATTR, serialize_attributes
+from persistence.faults import item_size
+
+logger = logging.getLogger(__name__)
+
+# Request attribute holding the request's running ProfilingSession
+PROFILING_SESSION_ATTR = "profiling_session"
+
+# Frames of the profiling machinery, left out of the allocation sites
+_TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+# Profiles of requests that failed: exception handlers skip response interceptors
+_running = threading.local()
+
+
+@dataclass(frozen=True)
+class ProfilingSettings:
+    """
+    Which requests to profile, and how.
+
+    A request is profiled if ``always`` is set, if its user is in
+    ``user_ids``, or else with probability ``sample_rate``.
+    """
+
+    always: bool = False
+    sample_rate: float = 0.0
+    user_ids: FrozenSet[str] = field(default_factory=frozenset)
+    memory: bool = False
+    top: int = 20
+    directory: str = "/tmp"
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "ProfilingSettings":
+        """
+        Settings from the KAMAJI_PROFILE* environment variables.
+
+        KAMAJI_PROFILE=1 profiles every request, KAMAJI_PROFILE_SAMPLE_RATE a
+        fraction of them and KAMAJI_PROFILE_USER_IDS (comma separated) those
+        of some users. KAMAJI_PROFILE_MEMORY=1 adds tracemalloc,
+        KAMAJI_PROFILE_TOP sets how many functions and allocation sites are
+        logged and KAMAJI_PROFILE_DIR where profiles are written.
+        """
+        user_ids = environ.get("KAMAJI_PROFILE_USER_IDS", "")
+        return cls(
+            always=environ.get("KAMAJI_PROFILE") == "1",
+            sample_rate=float(environ.get("KAMAJI_PROFILE_SAMPLE_RATE", 0)),
+            user_ids=frozenset(filter(None, (user_id.strip() for user_id in user_ids.split(",")))),
+            memory=environ.get("KAMAJI_PROFILE_MEMORY") == "1",
+            top=int(environ.get("KAMAJI_PROFILE_TOP", 20)),
+            directory=environ.get("KAMAJI_PROFILE_DIR", "/tmp"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any request can be profiled; when not, no interceptor should be registered."""
+        return self.always or self.sample_rate > 0 or bool(self.user_ids)
+
+    def selects(self, user_id: Optional[str]) -> bool:
+        return self.always or user_id in self.user_ids or random.random() < self.sample_rate
+
+
+class ProfilingSession:
+    """cProfile, and optionally tracemalloc, running over one request."""
+
+    def __init__(self, name: str, memory: bool) -> None:
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        # Someone else may be tracing already, e.g. with PYTHONTRACEMALLOC
+        self._owns_tracemalloc = memory and not tracemalloc.is_tracing()
+        self._memory = memory
+
+    def start(self) -> None:
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        if self._memory:
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+
+def _stop_abandoned_session() -> None:
+    session = getattr(_running, "session", None)
+    if session is not None:
+        logger.warning(f"Discarding profile {session.name}: its request did not complete")
+        session.stop()
+        _running.session = None
+
+
+class ProfilingRequestInterceptor(AbstractRequestInterceptor):
+    """Start profiling the requests the settings select; registered last, right before the handler runs."""
+
+    def __init__(self, settings: ProfilingSettings) -> None:
+        self.settings = settings
+
+    def process(self, handler_input: HandlerInput) -> None:
+        _stop_abandoned_session()
+        envelope = handler_input.request_envelope
+        user = envelope.context.system.user if envelope.context else None
+        if not self.settings.selects(user.user_id if user else None):
+            return
+        name = re.sub(r"[^\w.-]", "_", envelope.request.request_id or "request")
+        session = ProfilingSession(name, self.settings.memory)
+        handler_input.attributes_manager.request_attributes[PROFILING_SESSION_ATTR] = session
+        _running.session = session
+        session.start()
+
+
+class ProfilingResponseInterceptor(AbstractResponseInterceptor):
+    """
+    Stop the request's profiling, write it to the settings' directory and log its summary.
+
+    Writes ``<request id>.pstats``, merged across requests by
+    benchmarks/merge_pstats.py, and with memory profiling
+    ``<request id>.tracemalloc``, a tracemalloc.Snapshot dump.
+    """
+
+    def __init__(self, settings: ProfilingSettings) -> None:
+        self.settings = settings
+
+    def process(self, handler_input: HandlerInput, response: Response) -> None:
+        attributes_manager = handler_input.attributes_manager
+        session = attributes_manager.request_attributes.pop(PROFILING_SESSION_ATTR, None)
+        if session is None:
+            return
+        session.stop()
+        _running.session = None
+
+        path = os.path.join(self.settings.directory, session.name)
+        session.profile.dump_stats(f"{path}.pstats")
+        summary = io.StringIO()
+        pstats.Stats(session.profile, stream=summary).sort_stats("cumulative").print_stats(self.settings.top)
+        logger.info(f"Profile of {session.name} written to {path}.pstats:\n{summary.getvalue()}")
+
+        if session.snapshot is not None:
+            session.snapshot.dump(f"{path}.tracemalloc")
+            sites = "\n".join(str(stat) for stat in session.snapshot.statistics("lineno")[:self.settings.top])
+            logger.info(f"Top allocation sites of {session.name}:\n{sites}")
+
+        # Loading the item only to measure it would skew what is being profiled
+        if attributes_manager.request_attributes.get(ITEM_LOADED_ATTR):
+            size = item_size(serialize_attributes(attributes_manager.persistent_attributes))
+            logger.info(f"Persistent item of {session.name}: {size} bytes")
+        else:
+            logger.info(f"Persistent item of {session.name}: not loaded")
@@ -11,15 +11,19 @@ import os
 
 import boto3
 from ask_sdk_core.skill_builder import CustomSkillBuilder
-from ask_sdk_dynamodb.adapter import DynamoDbAdapter
+from ask_sdk_dynamodb.partition_keygen import user_id_partition_keygen
+from botocore.config import Config
 
 # Handler imports
 from handlers import (
+    ReplayedRequestHandler,
     LaunchRequestHandler,
     AddEventRequestHandler,
     AddEventTypeHandler,
     AddEventCompleteHandler,
+    AddRecurringEventHandler,
     RetrieveEventHandler,
+    RetrieveByCategoryHandler,
     ModifyEventsRequestHandler,
     NextEventHandler,
     PreviousEventHandler,
@@ -28,42 +32,174 @@ from handlers import (
     CancelDeleteHandler,
     EditEventHandler,
     EditEventDescriptionHandler,
+    UndoLastChangeHandler,
     HelpIntentHandler,
     CancelOrStopIntentHandler,
     FallbackIntentHandler,
     SessionEndedRequestHandler,
+    StaticResponses,
 )
 from interceptors import (
+    DayReaderInterceptor,
+    DeadlineInterceptor,
+    HouseholdViewInterceptor,
     LocalizationInterceptor,
+    ProfilingRequestInterceptor,
+    ProfilingResponseInterceptor,
+    ProfilingSettings,
     RequestLogger,
+    ResponseCacheInterceptor,
     ResponseLogger,
 )
-from exceptions import CatchAllExceptionHandler
+from exceptions import CatchAllExceptionHandler, DeadlineExceededHandler
+from warmup import WARMUP_PARTITION_KEY, Warmer, import_skill_modules, is_warmup_event
+from persistence import (
+    ArchivingPersistenceAdapter,
+    DeadlinePersistenceAdapter,
+    HouseholdPersistenceAdapter,
+    JournalingPersistenceAdapter,
+    LatencyInjectingAdapter,
+    LocalArchiveStore,
+    LocalJournalStore,
+    LocalPersistenceAdapter,
+    MigratingPersistenceAdapter,
+    ResponseCache,
+    bound_client_calls,
+    parse_fault_spec,
+    person_partition_keygen,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-# DynamoDB configuration
-ddb_region = os.environ.get('DYNAMODB_PERSISTENCE_REGION', 'eu-west-1')
-ddb_table_name = os.environ['DYNAMODB_PERSISTENCE_TABLE_NAME']
+# Optionally give each household member recognized by their voice profile items of
+# their own, so that a turn only reads the speaker's events (see persistence.household)
+person_partitions = os.environ.get('KAMAJI_PERSON_PARTITIONS') == '1'
+partition_keygen = person_partition_keygen if person_partitions else user_id_partition_keygen
 
-ddb_resource = boto3.resource('dynamodb', region_name=ddb_region)
-dynamodb_adapter = DynamoDbAdapter(
-    table_name=ddb_table_name,
-    create_table=False,
-    dynamodb_resource=ddb_resource
-)
+# Persistence configuration: a local directory for offline runs, DynamoDB otherwise
+local_persistence_path = os.environ.get('KAMAJI_LOCAL_PERSISTENCE_PATH')
+
+if local_persistence_path:
+    logger.info(f"Using local persistence in {local_persistence_path}")
+    persistence_adapter = LocalPersistenceAdapter(local_persistence_path, partition_keygen)
+    # Simulate a slow table to try out the time budget offline
+    local_latency_ms = os.environ.get('KAMAJI_LOCAL_PERSISTENCE_LATENCY_MS')
+    if local_latency_ms:
+        persistence_adapter = LatencyInjectingAdapter(persistence_adapter, int(local_latency_ms) / 1000)
+    journal_store = LocalJournalStore(local_persistence_path)
+    archive_store = LocalArchiveStore(local_persistence_path)
+    warmup_steps = {}
+else:
+    # Imported here: the adapter resolves a default boto3 resource, and thus
+    # an AWS region, as soon as its module is imported
+    from persistence.dynamodb import (
+        DynamoDbArchiveStore,
+        DynamoDbJournalStore,
+        VersionedDynamoDbAdapter,
+    )
+
+    ddb_region = os.environ.get('DYNAMODB_PERSISTENCE_REGION', 'eu-west-1')
+    ddb_table_name = os.environ['DYNAMODB_PERSISTENCE_TABLE_NAME']
+
+    # Upper bounds: bound_client_calls shortens timeouts and stops retries by each
+    # request's deadline, and DeadlinePersistenceAdapter retries reads within it
+    ddb_config = Config(
+        connect_timeout=1,
+        read_timeout=2,
+        retries={'max_attempts': 2, 'mode': 'standard'},
+    )
+    ddb_endpoint_url = os.environ.get('DYNAMODB_PERSISTENCE_ENDPOINT_URL')
+    ddb_resource = boto3.resource(
+        'dynamodb',
+        region_name=ddb_region,
+        endpoint_url=ddb_endpoint_url,
+        config=ddb_config,
+    )
+    # User items are read and written in DynamoDB's typed format, decoded lazily
+    ddb_client = boto3.client(
+        'dynamodb',
+        region_name=ddb_region,
+        endpoint_url=ddb_endpoint_url,
+        config=ddb_config,
+    )
+    # Optionally make the table slow and flaky on purpose, e.g. against DynamoDB Local
+    ddb_faults = os.environ.get('KAMAJI_DYNAMODB_FAULTS')
+    if ddb_faults:
+        fault_injector = parse_fault_spec(ddb_faults)
+        fault_injector.attach(ddb_resource.meta.client)
+        fault_injector.attach(ddb_client)
+    bound_client_calls(ddb_resource.meta.client)
+    bound_client_calls(ddb_client)
+    persistence_adapter = VersionedDynamoDbAdapter(
+        table_name=ddb_table_name,
+        create_table=False,
+        dynamodb_resource=ddb_resource,
+        dynamodb_client=ddb_client,
+        partition_keygen=partition_keygen,
+    )
+    journal_store = DynamoDbJournalStore(ddb_table_name, ddb_resource)
+    archive_store = DynamoDbArchiveStore(ddb_table_name, ddb_resource)
+
+    def warm_dynamodb_connections():
+        # Eventually consistent reads of a key no user has: half a read unit each
+        ddb_resource.Table(ddb_table_name).get_item(Key={'id': WARMUP_PARTITION_KEY})
+        ddb_client.get_item(TableName=ddb_table_name, Key={'id': {'S': WARMUP_PARTITION_KEY}})
+
+    warmup_steps = {'dynamodb': warm_dynamodb_connections}
+
+# Old years moved away by `kamaji archive` are only read back when a handler asks
+persistence_adapter = ArchivingPersistenceAdapter(persistence_adapter, archive_store, partition_keygen)
+
+# Optionally append changes to a per-user journal, compacted past this many entries
+journal_compaction_threshold = os.environ.get('KAMAJI_JOURNAL_COMPACTION_THRESHOLD')
+if journal_compaction_threshold:
+    persistence_adapter = JournalingPersistenceAdapter(
+        persistence_adapter,
+        journal_store,
+        partition_keygen,
+        compaction_threshold=int(journal_compaction_threshold),
+    )
+
+# Upgrade stored attributes to the current schema the first time they are read
+persistence_adapter = MigratingPersistenceAdapter(persistence_adapter)
+
+# List members in their household's item before their own item is first saved
+if person_partitions:
+    persistence_adapter = HouseholdPersistenceAdapter(persistence_adapter)
+
+# Bound every persistence call by the time the Lambda has left for the request
+persistence_adapter = DeadlinePersistenceAdapter(persistence_adapter, partition_keygen)
 
 # Build skill
-sb = CustomSkillBuilder(persistence_adapter=dynamodb_adapter)
+sb = CustomSkillBuilder(persistence_adapter=persistence_adapter)
+
+# Responses of this container, replayed when Alexa retries a request
+response_cache = ResponseCache()
+
+# Launch, help, stop and fallback only depend on the locale: their responses
+# are built once per locale here and then returned as they are
+localization_interceptor = LocalizationInterceptor()
+static_responses = StaticResponses(localization_interceptor.strings_for)
+launch_handler = LaunchRequestHandler(static_responses)
+help_handler = HelpIntentHandler(static_responses)
+cancel_or_stop_handler = CancelOrStopIntentHandler(static_responses)
+fallback_handler = FallbackIntentHandler(static_responses)
+static_responses.preload(
+    [launch_handler, help_handler, cancel_or_stop_handler, fallback_handler],
+    localization_interceptor.locales(),
+)
 
 # Register request handlers (order matters for can_handle evaluation)
-sb.add_request_handler(LaunchRequestHandler())
+sb.add_request_handler(ReplayedRequestHandler(response_cache))
+sb.add_request_handler(launch_handler)
 sb.add_request_handler(AddEventRequestHandler())
 sb.add_request_handler(AddEventTypeHandler())
 sb.add_request_handler(AddEventCompleteHandler())
+sb.add_request_handler(AddRecurringEventHandler())
 sb.add_request_handler(RetrieveEventHandler())
+sb.add_request_handler(RetrieveByCategoryHandler())
 sb.add_request_handler(ModifyEventsRequestHandler())
 sb.add_request_handler(NextEventHandler())
 sb.add_request_handler(PreviousEventHandler())
@@ -72,18 +208,46 @@ sb.add_request_handler(ConfirmDeleteHandler())
 sb.add_request_handler(CancelDeleteHandler())
 sb.add_request_handler(EditEventHandler())
 sb.add_request_handler(EditEventDescriptionHandler())
-sb.add_request_handler(HelpIntentHandler())
-sb.add_request_handler(CancelOrStopIntentHandler())
-sb.add_request_handler(FallbackIntentHandler())
+sb.add_request_handler(UndoLastChangeHandler())
+sb.add_request_handler(help_handler)
+sb.add_request_handler(cancel_or_stop_handler)
+sb.add_request_handler(fallback_handler)
 sb.add_request_handler(SessionEndedRequestHandler())
 
 # Register exception handlers
+sb.add_exception_handler(DeadlineExceededHandler())
 sb.add_exception_handler(CatchAllExceptionHandler())
 
 # Register interceptors
-sb.add_global_request_interceptor(LocalizationInterceptor())
+sb.add_global_request_interceptor(DayReaderInterceptor(persistence_adapter))
+if person_partitions:
+    sb.add_global_request_interceptor(HouseholdViewInterceptor(persistence_adapter))
+sb.add_global_request_interceptor(DeadlineInterceptor())
+sb.add_global_request_interceptor(localization_interceptor)
 sb.add_global_request_interceptor(RequestLogger())
+
+# Optionally profile some requests (see ProfilingSettings.from_env); nothing is
+# registered otherwise, so requests pay nothing for it
+profiling_settings = ProfilingSettings.from_env()
+if profiling_settings.enabled:
+    sb.add_global_request_interceptor(ProfilingRequestInterceptor(profiling_settings))
+    sb.add_global_response_interceptor(ProfilingResponseInterceptor(profiling_settings))
+
 sb.add_global_response_interceptor(ResponseLogger())
+sb.add_global_response_interceptor(ResponseCacheInterceptor(response_cache))
+
+# Warm-up pings are answered before the skill pipeline, which only takes Alexa requests
+warmer = Warmer({
+    **warmup_steps,
+    'locales': localization_interceptor.preload,
+    'handlers': import_skill_modules,
+})
+skill_handler = sb.lambda_handler()
+
 
 # Export Lambda handler
-lambda_handler = sb.lambda_handler()
+def lambda_handler(event, context):
+    cold = warmer.invoked()
+    if is_warmup_event(event):
+        return warmer.warm(event, cold)
+    return skill_handler(event, context)
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP endpoint for the skill, for end-to-end and load tests.
+
+Serves the skill built in lambda_function.py: POST an Alexa request envelope
+as JSON to any path and get the response envelope back. Connections are kept
+alive and handled by a fixed pool of threads, optionally in several forked
+processes; GET /metrics exposes per-intent latency histograms in the
+Prometheus text format. Persistence defaults to local files, so the server
+runs offline.
+
+Usage:
+    python lambda/local_server.py [--port 8080] [--threads 8] [--processes 1] [--persistence-path .kamaji-local]
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DEFAULT_KEEPALIVE_TIMEOUT = 15.0
+
+SkillHandler = Callable[[Dict[str, Any], Any], Dict[str, Any]]
+Verifier = Callable[[Dict[str, str], str], None]
+
+
+def request_label(event: Dict[str, Any]) -> str:
+    """Intent name of an IntentRequest envelope, request type of any other."""
+    request = event.get("request", {})
+    if request.get("type") == "IntentRequest":
+        return request.get("intent", {}).get("name", "IntentRequest")
+    return request.get("type", "unknown")
+
+
+class SkillMetrics:
+    """Per-intent latency histograms and error counts, safe to share between threads."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            # One count per bucket plus +Inf, cumulated when rendered
+            counts = self._counts.setdefault(label, [0] * (len(self.buckets) + 1))
+            counts[next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))] += 1
+            self._sums[label] = self._sums.get(label, 0.0) + seconds
+            if failed:
+                self._errors[label] = self._errors.get(label, 0) + 1
+
+    def render(self) -> str:
+        worker = os.getpid()
+        lines = [
+            "# HELP kamaji_request_duration_seconds Time to handle a skill request",
+            "# TYPE kamaji_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for label in sorted(self._counts):
+                labels = f'intent="{label}",worker="{worker}"'
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), self._counts[label]):
+                    cumulative += count
+                    lines.append(f'kamaji_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"kamaji_request_duration_seconds_sum{{{labels}}} {self._sums[label]:.6f}")
+                lines.append(f"kamaji_request_duration_seconds_count{{{labels}}} {cumulative}")
+            lines += [
+                "# HELP kamaji_request_errors_total Skill requests that failed with an HTTP error",
+                "# TYPE kamaji_request_errors_total counter",
+            ]
+            for label in sorted(self._errors):
+                lines.append(f'kamaji_request_errors_total{{intent="{label}",worker="{worker}"}} {self._errors[label]}')
+        return "\n".join(lines) + "\n"
+
+
+class SkillRequestHandler(BaseHTTPRequestHandler):
+    """Answers request envelopes and metrics scrapes on kept-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+    server: "SkillServer"
+
+    def setup(self) -> None:
+        # Idle kept-alive connections give their worker back after this long
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            self._send(200, self.server.metrics.render().encode("utf-8"), "text/plain; version=0.0.4")
+        elif self.path == "/health":
+            self._send(200, b"ok", "text/plain")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self) -> None:
+        start = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        label = "invalid"
+        try:
+            event = json.loads(body)
+            label = request_label(event)
+            if self.server.verifier is not None:
+                self.server.verifier(dict(self.headers), body)
+        except Exception as e:
+            logger.warning(f"Rejected request: {e}")
+            self.server.metrics.observe(label, time.perf_counter() - start, failed=True)
+            self._send(400, str(e).encode("utf-8"), "text/plain")
+            return
+
+        try:
+            response = self.server.skill_handler(event, None)
+        except Exception:
+            logger.exception(f"Skill failed on {label}")
+            self.server.metrics.observe(label, time.perf_counter() - start, failed=True)
+            self._send(500, b"skill error", "text/plain")
+            return
+        payload = json.dumps(response).encode("utf-8")
+        self.server.metrics.observe(label, time.perf_counter() - start)
+        self._send(200, payload, "application/json;charset=UTF-8")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class SkillServer(HTTPServer):
+    """
+    HTTPServer handing each connection to a fixed pool of worker threads.
+
+    A kept-alive connection holds its worker until it closes or stays idle
+    for ``keepalive_timeout`` seconds, so ``threads`` bounds the connections
+    served at once; further ones wait in the listen backlog.
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        skill_handler: SkillHandler,
+        threads: int = 8,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        verifier: Optional[Verifier] = None,
+    ) -> None:
+        super().__init__(address, SkillRequestHandler)
+        self.skill_handler = skill_handler
+        self.keepalive_timeout = keepalive_timeout
+        self.verifier = verifier
+        self.metrics = SkillMetrics()
+        # Threads are only started on the first connection, so forking after this is safe
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="skill")
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def signature_verifier() -> Verifier:
+    """
+    Verify requests like the Alexa service requires of skills hosted outside Lambda.
+
+    Needs ask-sdk-webservice-support, which the Lambda deployment does not.
+    """
+    try:
+        from ask_sdk_core.serialize import DefaultSerializer
+        from ask_sdk_model import RequestEnvelope
+        from ask_sdk_webservice_support.verifier import RequestVerifier, TimestampVerifier
+    except ImportError:
+        raise SystemExit("--verify-signatures needs ask-sdk-webservice-support: pip install ask-sdk-webservice-support")
+
+    serializer = DefaultSerializer()
+    verifiers = [RequestVerifier(), TimestampVerifier()]
+
+    def verify(headers: Dict[str, str], body: str) -> None:
+        request_envelope = serializer.deserialize(body, RequestEnvelope)
+        for verifier in verifiers:
+            verifier.verify(headers=headers, serialized_request_env=body, deserialized_request_env=request_envelope)
+
+    return verify
+
+
+def serve(server: SkillServer, processes: int = 1) -> None:
+    """Serve forever, from ``processes`` forked copies of the server when more than one."""
+    if processes <= 1:
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        return
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    # Stopping the parent, by Ctrl-C or a plain kill, stops its workers too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except (KeyboardInterrupt, SystemExit):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+    finally:
+        server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads per process, i.e. connections served at once")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Forked server processes sharing the port; each keeps its own /metrics")
+    parser.add_argument("--keepalive-timeout", type=float, default=DEFAULT_KEEPALIVE_TIMEOUT,
+                        help="Seconds an idle connection is kept open")
+    parser.add_argument("--persistence-path", default=".kamaji-local",
+                        help="Local persistence directory, unless KAMAJI_LOCAL_PERSISTENCE_PATH is set")
+    parser.add_argument("--verify-signatures", action="store_true",
+                        help="Check Alexa request signatures and timestamps; skipped by default for local use")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # Set before the skill is built: lambda_function picks its adapter on import
+    os.environ.setdefault("KAMAJI_LOCAL_PERSISTENCE_PATH", args.persistence_path)
+    from lambda_function import lambda_handler
+
+    # lambda_function logs every request at DEBUG, which would dominate a load test
+    logging.getLogger("lambda_function").setLevel(logging.INFO)
+    server = SkillServer(
+        (args.host, args.port),
+        lambda_handler,
+        threads=args.threads,
+        keepalive_timeout=args.keepalive_timeout,
+        verifier=signature_verifier() if args.verify_signatures else None,
+    )
+    logger.info(f"Serving the skill on http://{args.host}:{server.server_port} "
+                f"({args.processes} x {args.threads} workers, persistence in {os.environ['KAMAJI_LOCAL_PERSISTENCE_PATH']})")
+    serve(server, args.processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Persistence package
+# The dynamodb module is not re-exported: importing it needs an AWS region
+from .archive import (
+    ARCHIVE_KEY,
+    HYDRATE_KEY,
+    ArchivingPersistenceAdapter,
+    archive_years,
+    merge_days,
+)
+from .codec import (
+    JSON_BACKENDS,
+    JsonBackend,
+    deserialize_map,
+    json_backend,
+    load_json_backend,
+    serialize_map,
+)
+from .deadline import (
+    Deadline,
+    DeadlineExceededError,
+    DeadlinePersistenceAdapter,
+    bound_client_calls,
+    current_deadline,
+    set_deadline,
+)
+from .faults import FaultInjector, OperationCounters, parse_fault_spec
+from .household import (
+    PERSON_PARTITION_SEPARATOR,
+    PERSONS_KEY,
+    HouseholdPersistenceAdapter,
+    for_person,
+    person_id,
+    person_partition_keygen,
+)
+from .idempotency import (
+    REQUESTS_KEY,
+    ResponseCache,
+    is_request_applied,
+    mark_request,
+)
+from .journal import (
+    JOURNAL_KEY,
+    PENDING_KEY,
+    JournalingPersistenceAdapter,
+    apply_mutation,
+    inverse_mutation,
+    last_undoable,
+)
+from .lazy import LazyAttributes, serialize_attributes
+from .local import (
+    LatencyInjectingAdapter,
+    LocalArchiveStore,
+    LocalJournalStore,
+    LocalPersistenceAdapter,
+)
+from .migrating import MigratingPersistenceAdapter
+from .projection import (
+    DAY_READER_ATTR,
+    HOUSEHOLD_VIEW_ATTR,
+    ITEM_LOADED_ATTR,
+    DayReader,
+    HouseholdView,
+    project_day,
+)
+from .recurring import (
+    RECURRING_KEY,
+    RECURRING_YEAR,
+    occurs_in,
+    recurring_events,
+    with_recurring_events,
+)
+from .schema import (
+    CURRENT_SCHEMA_VERSION,
+    SCHEMA_VERSION_KEY,
+    is_reserved_key,
+    migrate_attributes,
+)
+from .tags import (
+    TAGS_KEY,
+    canonical_tag,
+    events_by_tag,
+    infer_tags,
+    rebuild_tag_index,
+    retag_event,
+    tag_event,
+    untag_event,
+)
+from .versioning import VERSION_KEY, ConcurrentModificationError, item_version
@@ -0,0 +1,157 @@
+"""Cold storage of old years, moved out of the user's item and brought back on demand."""
+
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_dynamodb.partition_keygen import user_id_partition_keygen
+from ask_sdk_model import RequestEnvelope
+
+from .codec import Days, dumps, loads_days
+from .schema import is_reserved_key
+from .tags import rebuild_tag_index
+
+logger = logging.getLogger(__name__)
+
+# Reserved attributes keys (see schema.RESERVED_PREFIX)
+ARCHIVE_KEY = "_archive"  # "M-D" -> years moved to the archive, kept in the user's item
+HYDRATE_KEY = "_hydrate"  # days to bring back from the archive on save, [] for all
+
+# Archives live in their own item, next to the user's item
+ARCHIVE_PARTITION_SUFFIX = "#archive"
+
+
+def encode_archive(days: Days) -> bytes:
+    """Compress archived "M-D" -> year -> events maps for storage."""
+    return zlib.compress(dumps(days))
+
+
+def decode_archive(data: bytes) -> Days:
+    return loads_days(zlib.decompress(data))
+
+
+def merge_days(target: Dict[str, object], source: Days) -> None:
+    """
+    Add the events of ``source`` to ``target``, in place.
+
+    Events already in ``target`` are not added twice, so merging again
+    after an interrupted move between the item and its archive is harmless.
+    """
+    for day, years in source.items():
+        for year, events in years.items():
+            year_events = target.setdefault(day, {}).setdefault(year, [])
+            present = list(year_events)
+            for event in events:
+                if event in present:
+                    present.remove(event)
+                else:
+                    year_events.append(event)
+
+
+def archive_years(attributes: Dict[str, object], horizon_year: int) -> Days:
+    """
+    Move the years before ``horizon_year`` out of the attributes, in place.
+
+    The moved days and years are recorded under ARCHIVE_KEY, so the skill
+    knows what it can bring back without reading the archive.
+
+    Returns:
+        The moved "M-D" -> year -> events, empty if nothing was old enough
+    """
+    moved: Days = {}
+    for day in [key for key in attributes if not is_reserved_key(key)]:
+        years = attributes[day]
+        for year in [year for year in years if int(year) < horizon_year]:
+            moved.setdefault(day, {})[year] = years.pop(year)
+        if not years:
+            del attributes[day]
+
+    index = attributes.setdefault(ARCHIVE_KEY, {})
+    for day, years in moved.items():
+        index[day] = sorted(set(index.get(day, [])) | set(years))
+    if not index:
+        del attributes[ARCHIVE_KEY]
+    return moved
+
+
+class ArchiveStore(ABC):
+    """Storage of users' archived years."""
+
+    @abstractmethod
+    def read(self, key: str) -> Days:
+        """Return the archived days of a user, {} if there are none."""
+
+    @abstractmethod
+    def write(self, key: str, days: Days) -> None:
+        """Replace the archived days of a user."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete an archive."""
+
+
+class ArchivingPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Keeps each user's old years in a separate, compressed archive.
+
+    Years are moved to the archive by ``kamaji archive``. Reads only load the
+    user's item, whose ARCHIVE_KEY lists what was archived, and
+    ``get_archived_days`` decodes the archive without changing either. A
+    save carrying HYDRATE_KEY (see utils.attributes.hydrate_archived_years)
+    first moves those days back into the item, and into the attributes
+    being saved, indexing their events by category. The item is saved
+    before the archive is rewritten, so an interruption leaves events in
+    both places rather than in neither.
+    """
+
+    def __init__(
+        self,
+        adapter: AbstractPersistenceAdapter,
+        archive: ArchiveStore,
+        partition_keygen: Callable[[RequestEnvelope], str] = user_id_partition_keygen,
+    ) -> None:
+        self.adapter = adapter
+        self.archive = archive
+        self.partition_keygen = partition_keygen
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        return self.adapter.get_attributes(request_envelope)
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        return self.adapter.get_day_attributes(request_envelope, day)
+
+    def get_archived_days(self, request_envelope: RequestEnvelope) -> Days:
+        """The user's archived days, for reading only: nothing moves back into the item."""
+        return self.archive.read(self.partition_keygen(request_envelope))
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        days = attributes.pop(HYDRATE_KEY, None)
+        if days is None:
+            self.adapter.save_attributes(request_envelope, attributes)
+            return
+
+        key = self.partition_keygen(request_envelope)
+        archived = self.archive.read(key)
+        index = attributes.get(ARCHIVE_KEY, {})
+        for day in days or set(index) | set(archived):
+            merge_days(attributes, {day: archived.pop(day, {})})
+            index.pop(day, None)
+        if not index:
+            attributes.pop(ARCHIVE_KEY, None)
+        # Archived years are not indexed by category: index them with the others
+        rebuild_tag_index(attributes)
+
+        self.adapter.save_attributes(request_envelope, attributes)
+        if archived:
+            self.archive.write(key, archived)
+        else:
+            self.archive.delete(key)
+        logger.info(f"Brought back {len(days) or 'all'} archived days of {key}")
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        self.adapter.delete_attributes(request_envelope)
+        self.archive.delete(self.partition_keygen(request_envelope))
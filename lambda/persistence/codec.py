@@ -0,0 +1,173 @@
+"""JSON and DynamoDB typed-value encoding, with fast paths for the "M-D" -> year -> events layout."""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+logger = logging.getLogger(__name__)
+
+# Fastest first; the first one installed is used unless $KAMAJI_JSON_BACKEND names one
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+Days = Dict[str, Dict[str, List[str]]]
+# A value in DynamoDB's typed format, e.g. {"M": {"2024": {"L": [{"S": "gita"}]}}}
+AttributeValue = Dict[str, Any]
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    """
+    A JSON library: ``dumps`` gives compact UTF-8 bytes, ``loads`` takes str or bytes.
+
+    ``loads_days`` decodes "M-D" -> year -> events maps; backends able to
+    decode into a type check the layout while decoding, the others trust it.
+    """
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[Any], Any]
+    loads_days: Callable[[Any], Days]
+
+
+def _number(value: Any) -> Any:
+    # TypeDeserializer gives Decimals for DynamoDB numbers
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_backend() -> JsonBackend:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_number).encode("utf-8")
+
+    return JsonBackend("json", dumps, json.loads, json.loads)
+
+
+def _orjson_backend() -> JsonBackend:
+    import orjson
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_number)
+
+    return JsonBackend("orjson", dumps, orjson.loads, orjson.loads)
+
+
+def _msgspec_backend() -> JsonBackend:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(decimal_format="number")
+    decoder = msgspec.json.Decoder()
+    days_decoder = msgspec.json.Decoder(Days)
+    return JsonBackend("msgspec", encoder.encode, decoder.decode, days_decoder.decode)
+
+
+_FACTORIES = {"orjson": _orjson_backend, "msgspec": _msgspec_backend, "json": _stdlib_backend}
+_default: Optional[JsonBackend] = None
+
+
+def load_json_backend(name: str) -> JsonBackend:
+    """
+    The backend called ``name``, one of JSON_BACKENDS.
+
+    Raises:
+        ValueError: for an unknown name
+        ImportError: if its library is not installed
+    """
+    if name not in _FACTORIES:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected one of {', '.join(JSON_BACKENDS)}")
+    return _FACTORIES[name]()
+
+
+def json_backend() -> JsonBackend:
+    """
+    The backend used by dumps and loads, chosen on first use.
+
+    That is $KAMAJI_JSON_BACKEND if set and installed, else the first
+    installed of JSON_BACKENDS; the standard library is always there. An
+    unknown or missing configured backend falls back to it with a warning.
+    """
+    global _default
+    if _default is None:
+        configured = os.environ.get("KAMAJI_JSON_BACKEND")
+        for name in [configured] if configured else JSON_BACKENDS:
+            try:
+                _default = load_json_backend(name)
+                break
+            except (ImportError, ValueError) as e:
+                if configured:
+                    logger.warning(f"Cannot use JSON backend {configured} ({e}), using the standard library")
+        else:
+            _default = _stdlib_backend()
+        logger.info(f"Using the {_default.name} JSON backend")
+    return _default
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON of ``value``; Decimals are written as numbers."""
+    return json_backend().dumps(value)
+
+
+def loads(data: Any) -> Any:
+    """Value of a JSON document, given as str or bytes."""
+    return json_backend().loads(data)
+
+
+def loads_days(data: Any) -> Days:
+    """ "M-D" -> year -> events map of a JSON document, given as str or bytes."""
+    return json_backend().loads_days(data)
+
+
+def deserialize_value(value: AttributeValue) -> Any:
+    """
+    Python value of a typed DynamoDB value, as TypeDeserializer gives it.
+
+    Maps of lists of strings, which days are, are decoded directly rather
+    than one typed value at a time.
+    """
+    try:
+        return {key: [item["S"] for item in items["L"]] for key, items in value["M"].items()}
+    except (KeyError, TypeError):
+        return _deserializer.deserialize(value)
+
+
+class _NotStrings(Exception):
+    pass
+
+
+def _strings(items: Any) -> AttributeValue:
+    if type(items) is not list:
+        raise _NotStrings()
+    values = []
+    for item in items:
+        if type(item) is not str:
+            raise _NotStrings()
+        values.append({"S": item})
+    return {"L": values}
+
+
+def serialize_value(value: Any) -> AttributeValue:
+    """Typed DynamoDB value of a Python value, as TypeSerializer gives it, days directly."""
+    if type(value) is dict:
+        try:
+            return {"M": {key: _strings(items) for key, items in value.items()}}
+        except _NotStrings:
+            pass
+    return _serializer.serialize(value)
+
+
+def deserialize_map(value: AttributeValue) -> Dict[str, Any]:
+    """Attributes of an item from their typed {"M": ...} value."""
+    return {key: deserialize_value(item) for key, item in value["M"].items()}
+
+
+def serialize_map(attributes: Dict[str, Any]) -> AttributeValue:
+    """Typed {"M": ...} value of an item's attributes."""
+    return {"M": {key: serialize_value(value) for key, value in attributes.items()}}
@@ -0,0 +1,257 @@
+"""Time budget of persistence calls, derived from the time the Lambda has left for the request."""
+
+import copy
+import logging
+import random
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.exceptions import PersistenceException
+from ask_sdk_dynamodb.partition_keygen import user_id_partition_keygen
+from ask_sdk_model import RequestEnvelope
+
+from .codec import Days
+from .projection import project_day
+from .versioning import ConcurrentModificationError
+
+logger = logging.getLogger(__name__)
+
+# Seconds kept back to build and send the response once persistence gives up
+DEFAULT_RESPONSE_RESERVE = 0.5
+# No call is started with less time left than this
+MIN_CALL_TIME = 0.05
+DEFAULT_MAX_READ_ATTEMPTS = 3
+READ_BACKOFF_BASE = 0.02
+READ_BACKOFF_CAP = 0.2
+DEFAULT_CACHE_SIZE = 256
+# botocore's standard retry mode sleeps up to a second before its first retry
+RETRY_BACKOFF_CAP = 1.0
+
+
+class DeadlineExceededError(PersistenceException):
+    """Raised when a persistence call cannot complete within the request's time budget."""
+
+
+class Deadline:
+    """Point in time by which persistence calls of the current request must be done."""
+
+    def __init__(self, expires_at: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.expires_at = expires_at
+        self.clock = clock
+
+    @classmethod
+    def from_context(
+        cls,
+        context: Any,
+        reserve: float = DEFAULT_RESPONSE_RESERVE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> "Deadline":
+        """
+        Deadline of a request from its Lambda context.
+
+        Args:
+            context: Lambda context, with get_remaining_time_in_millis()
+            reserve: Seconds kept back for building the response
+            clock: Monotonic clock, in seconds
+
+        Returns:
+            The request's persistence deadline
+        """
+        remaining = context.get_remaining_time_in_millis() / 1000 - reserve
+        return cls(clock() + remaining, clock)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - self.clock())
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("persistence_deadline", default=None)
+
+
+def set_deadline(deadline: Optional[Deadline]) -> None:
+    """Set the deadline of the request being handled, None for no limit."""
+    _current_deadline.set(deadline)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def bound_client_calls(client) -> None:
+    """
+    Bound every attempt of a botocore client's calls by the current deadline.
+
+    Each attempt gets the time left as its read timeout, capped at the
+    client's configured one; no attempt is sent, and no retry made, once the
+    time left could not cover it. Calls outside a request, without a
+    deadline, keep the client's configuration.
+    """
+    read_timeout = client.meta.config.read_timeout
+
+    def before_send(request, **kwargs) -> None:
+        deadline = current_deadline()
+        if deadline is None:
+            return
+        remaining = deadline.remaining()
+        if remaining < MIN_CALL_TIME:
+            raise DeadlineExceededError("No time left for another attempt")
+        # Older botocore releases have no per-request timeouts: they keep the configured one
+        context = getattr(request, "context", None)
+        if context is not None:
+            context["read_timeout"] = min(read_timeout, remaining)
+
+    def needs_retry(caught_exception=None, response=None, **kwargs) -> None:
+        deadline = current_deadline()
+        failed = caught_exception is not None or (response is not None and "Error" in response[1])
+        if deadline is not None and failed and deadline.remaining() < RETRY_BACKOFF_CAP + MIN_CALL_TIME:
+            raise DeadlineExceededError("No time left to retry")
+
+    client.meta.events.register_first("before-send", before_send)
+    client.meta.events.register_first("needs-retry", needs_retry)
+
+
+class _CallTimeout(Exception):
+    pass
+
+
+class DeadlinePersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Wraps another adapter, bounding its calls by the current request's deadline.
+
+    Calls run on the caller's thread; clients passed to bound_client_calls
+    time out, and stop retrying, by the deadline. Failed reads are retried,
+    with jittered backoff, as long as time is left; once it runs out, the
+    user's attributes from the last successful read or save in this
+    container are served instead, if any. They are kept as read and only
+    copied when served; a failed save forgets them, since the handler may
+    have changed them. Saves are attempted once, since retrying a save that
+    timed out could apply it twice; a save that cannot complete in time
+    raises DeadlineExceededError, which the skill answers by asking to try
+    again shortly. Without a deadline (set by interceptors.DeadlineInterceptor)
+    calls go straight to the adapter.
+    """
+
+    def __init__(
+        self,
+        adapter: AbstractPersistenceAdapter,
+        partition_keygen: Callable[[RequestEnvelope], str] = user_id_partition_keygen,
+        max_read_attempts: int = DEFAULT_MAX_READ_ATTEMPTS,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        self.adapter = adapter
+        self.partition_keygen = partition_keygen
+        self.max_read_attempts = max_read_attempts
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+
+    def _remember(self, key: str, attributes: Dict[str, object]) -> None:
+        self._cache[key] = attributes
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _call(self, deadline: Deadline, method: Callable[..., Any], *args: Any) -> Any:
+        if deadline.remaining() < MIN_CALL_TIME:
+            raise _CallTimeout()
+        try:
+            return method(*args)
+        except ConcurrentModificationError:
+            raise
+        except PersistenceException as e:
+            # Adapters wrap the errors of bound_client_calls in their own
+            if deadline.remaining() < MIN_CALL_TIME or isinstance(e.__context__, DeadlineExceededError):
+                raise _CallTimeout()
+            raise
+
+    def _read(
+        self, key: str, deadline: Deadline, method: Callable[..., Dict[str, object]], *args: Any
+    ) -> Optional[Dict[str, object]]:
+        """Result of a read retried within the deadline, None once time runs out."""
+        for attempt in range(self.max_read_attempts):
+            try:
+                return self._call(deadline, method, *args)
+            except _CallTimeout:
+                logger.warning(f"Reading {key} did not complete within the request deadline")
+                return None
+            except PersistenceException as e:
+                logger.warning(f"Reading {key} failed (attempt {attempt + 1}): {e}")
+                backoff = random.uniform(0, min(READ_BACKOFF_CAP, READ_BACKOFF_BASE * 2 ** attempt))
+                time.sleep(min(backoff, deadline.remaining()))
+        return None
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        key = self.partition_keygen(request_envelope)
+        deadline = current_deadline()
+        if deadline is None:
+            attributes = self.adapter.get_attributes(request_envelope)
+        else:
+            attributes = self._read(key, deadline, self.adapter.get_attributes, request_envelope)
+        if attributes is not None:
+            self._remember(key, attributes)
+            return attributes
+
+        if key in self._cache:
+            logger.warning(f"Serving cached attributes of {key}")
+            return copy.deepcopy(self._cache[key])
+        raise DeadlineExceededError(f"Could not read attributes of {key} in time")
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        key = self.partition_keygen(request_envelope)
+        deadline = current_deadline()
+        if deadline is None:
+            return self.adapter.get_day_attributes(request_envelope, day)
+        attributes = self._read(key, deadline, self.adapter.get_day_attributes, request_envelope, day)
+        if attributes is not None:
+            return attributes
+
+        if key in self._cache:
+            logger.warning(f"Serving cached attributes of {key} for {day}")
+            return copy.deepcopy(project_day(self._cache[key], day))
+        raise DeadlineExceededError(f"Could not read {day} of {key} in time")
+
+    def get_archived_days(self, request_envelope: RequestEnvelope) -> Days:
+        key = self.partition_keygen(request_envelope)
+        deadline = current_deadline()
+        if deadline is None:
+            return self.adapter.get_archived_days(request_envelope)
+        days = self._read(key, deadline, self.adapter.get_archived_days, request_envelope)
+        if days is None:
+            raise DeadlineExceededError(f"Could not read the archive of {key} in time")
+        return days
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        key = self.partition_keygen(request_envelope)
+        deadline = current_deadline()
+        try:
+            if deadline is None:
+                self.adapter.save_attributes(request_envelope, attributes)
+            else:
+                self._call(deadline, self.adapter.save_attributes, request_envelope, attributes)
+        except _CallTimeout:
+            # The save may still land: the item version keeps a retry from overwriting it
+            self._cache.pop(key, None)
+            raise DeadlineExceededError(f"Could not save attributes of {key} in time")
+        except ConcurrentModificationError as e:
+            self._remember(key, e.current_attributes)
+            raise
+        except PersistenceException:
+            self._cache.pop(key, None)
+            raise
+        self._remember(key, attributes)
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        key = self.partition_keygen(request_envelope)
+        deadline = current_deadline()
+        try:
+            if deadline is None:
+                self.adapter.delete_attributes(request_envelope)
+            else:
+                self._call(deadline, self.adapter.delete_attributes, request_envelope)
+        except _CallTimeout:
+            raise DeadlineExceededError(f"Could not delete attributes of {key} in time")
+        self._cache.pop(key, None)
@@ -0,0 +1,201 @@
+"""DynamoDB persistence with version-conditioned writes, journal and archive items."""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+from ask_sdk_core.exceptions import PersistenceException
+from ask_sdk_dynamodb.adapter import DynamoDbAdapter
+from ask_sdk_model import RequestEnvelope
+
+from .archive import ARCHIVE_PARTITION_SUFFIX, ArchiveStore, Days, decode_archive, encode_archive
+from .journal import JOURNAL_PARTITION_SUFFIX, JournalStore, Mutation
+from .lazy import LazyAttributes, serialize_attributes
+from .projection import DAY_INDEX_KEYS, ITEM_METADATA_KEYS
+from .versioning import VERSION_KEY, ConcurrentModificationError, item_version
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedDynamoDbAdapter(DynamoDbAdapter):
+    """
+    DynamoDbAdapter whose saves only succeed if the item still has the
+    version the attributes were read with.
+
+    The stored version is bumped on every save, so two devices saving the
+    same item concurrently cannot silently overwrite each other: the
+    second one gets a ConcurrentModificationError carrying the winning
+    item, returned by DynamoDB on the failed condition at no extra read.
+    Day reads project the item on one day, so their size and latency
+    follow that day's events rather than the whole history. Whole items
+    are read through the low-level client as LazyAttributes, so only the
+    days a request touches are decoded and encoded again on save. That
+    client is separate from the resource's, which converts every value:
+    by default one with the resource's region, endpoint and config.
+    """
+
+    def __init__(self, table_name: str, dynamodb_client: Optional[Any] = None, **kwargs: Any) -> None:
+        super().__init__(table_name, **kwargs)
+        if dynamodb_client is None:
+            meta = self.dynamodb.meta.client.meta
+            dynamodb_client = boto3.client(
+                "dynamodb", region_name=meta.region_name, endpoint_url=meta.endpoint_url, config=meta.config
+            )
+        self.client = dynamodb_client
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        try:
+            response = self.client.get_item(
+                TableName=self.table_name,
+                Key={self.partition_key_name: {"S": self.partition_keygen(request_envelope)}},
+                ConsistentRead=True,
+            )
+        except Exception as e:
+            raise PersistenceException(
+                f"Failed to retrieve attributes from DynamoDb table: {type(e).__name__}: {e}"
+            )
+        return self._lazy_attributes(response.get("Item"))
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        names = {"#a": self.attribute_name, "#d": day}
+        paths = ["#a.#d"]
+        for i, key in enumerate(DAY_INDEX_KEYS):
+            names[f"#i{i}"] = key
+            paths.append(f"#a.#i{i}.#d")
+        for i, key in enumerate(ITEM_METADATA_KEYS):
+            names[f"#m{i}"] = key
+            paths.append(f"#a.#m{i}")
+
+        try:
+            response = self.dynamodb.Table(self.table_name).get_item(
+                Key={self.partition_key_name: self.partition_keygen(request_envelope)},
+                ProjectionExpression=", ".join(paths),
+                ExpressionAttributeNames=names,
+                ConsistentRead=True,
+            )
+        except Exception as e:
+            raise PersistenceException(
+                f"Failed to retrieve {day} from DynamoDb table: {type(e).__name__}: {e}"
+            )
+        return response.get("Item", {}).get(self.attribute_name, {})
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        expected = item_version(attributes)
+        if expected:
+            condition = "#a.#v = :expected"
+            values = {":expected": {"N": str(expected)}}
+        else:
+            condition = "attribute_not_exists(#a.#v)"
+            values = None
+
+        client = self.client
+        item_attributes = serialize_attributes(attributes)
+        item_attributes[VERSION_KEY] = {"N": str(expected + 1)}
+        request = {
+            "TableName": self.table_name,
+            "Item": {
+                self.partition_key_name: {"S": self.partition_keygen(request_envelope)},
+                self.attribute_name: {"M": item_attributes},
+            },
+            "ConditionExpression": condition,
+            "ExpressionAttributeNames": {"#a": self.attribute_name, "#v": VERSION_KEY},
+            "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+        }
+        if values:
+            request["ExpressionAttributeValues"] = values
+
+        try:
+            client.put_item(**request)
+        except client.exceptions.ConditionalCheckFailedException as e:
+            raise ConcurrentModificationError(self._current_attributes(request_envelope, e.response))
+        except Exception as e:
+            raise PersistenceException(
+                f"Failed to save attributes to DynamoDb table: {type(e).__name__}: {e}"
+            )
+        attributes[VERSION_KEY] = expected + 1
+
+    def _lazy_attributes(self, item: Optional[dict]) -> Dict[str, object]:
+        if item is None:
+            return {}
+        return LazyAttributes(item.get(self.attribute_name, {"M": {}})["M"])
+
+    def _current_attributes(self, request_envelope: RequestEnvelope, response: dict) -> Dict[str, object]:
+        if "Item" not in response:
+            # Not every endpoint (e.g. older DynamoDB Local) returns the item
+            return self.get_attributes(request_envelope)
+        return self._lazy_attributes(response["Item"])
+
+
+class DynamoDbJournalStore(JournalStore):
+    """
+    Journals as ``<user>#journal`` items of the persistence table.
+
+    The table only has a partition key, so the journal cannot share the
+    user's partition; appends use ``list_append`` and never conflict.
+    """
+
+    def __init__(self, table_name: str, dynamodb_resource, partition_key_name: str = "id") -> None:
+        self.table = dynamodb_resource.Table(table_name)
+        self.partition_key_name = partition_key_name
+
+    def _key(self, key: str) -> Dict[str, str]:
+        return {self.partition_key_name: key + JOURNAL_PARTITION_SUFFIX}
+
+    def read(self, key: str) -> Tuple[int, List[Mutation]]:
+        item = self.table.get_item(Key=self._key(key), ConsistentRead=True).get("Item", {})
+        return int(item.get("base", 0)), item.get("entries", [])
+
+    def append(self, key: str, mutations: List[Mutation]) -> Tuple[int, int]:
+        response = self.table.update_item(
+            Key=self._key(key),
+            UpdateExpression="SET #e = list_append(if_not_exists(#e, :empty), :new), #b = if_not_exists(#b, :zero)",
+            ExpressionAttributeNames={"#e": "entries", "#b": "base"},
+            ExpressionAttributeValues={":empty": [], ":new": mutations, ":zero": 0},
+            ReturnValues="ALL_NEW",
+        )
+        journal = response["Attributes"]
+        base = int(journal["base"])
+        return base, base + len(journal["entries"])
+
+    def trim(self, key: str, base: int, upto: int) -> None:
+        if upto <= base:
+            return
+        removed = ", ".join(f"#e[{i}]" for i in range(upto - base))
+        try:
+            self.table.update_item(
+                Key=self._key(key),
+                UpdateExpression=f"REMOVE {removed} SET #b = :upto",
+                ConditionExpression="#b = :base",
+                ExpressionAttributeNames={"#e": "entries", "#b": "base"},
+                ExpressionAttributeValues={":base": base, ":upto": upto},
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            logger.info(f"Journal of {key} was trimmed concurrently")
+
+    def delete(self, key: str) -> None:
+        self.table.delete_item(Key=self._key(key))
+
+
+class DynamoDbArchiveStore(ArchiveStore):
+    """Archives as ``<user>#archive`` items of the persistence table, compressed into one binary attribute."""
+
+    def __init__(self, table_name: str, dynamodb_resource, partition_key_name: str = "id") -> None:
+        self.table = dynamodb_resource.Table(table_name)
+        self.partition_key_name = partition_key_name
+
+    def _key(self, key: str) -> Dict[str, str]:
+        return {self.partition_key_name: key + ARCHIVE_PARTITION_SUFFIX}
+
+    def read(self, key: str) -> Days:
+        item = self.table.get_item(Key=self._key(key), ConsistentRead=True).get("Item")
+        if item is None:
+            return {}
+        return decode_archive(item["archive"].value)
+
+    def write(self, key: str, days: Days) -> None:
+        self.table.put_item(Item={**self._key(key), "archive": encode_archive(days)})
+
+    def delete(self, key: str) -> None:
+        self.table.delete_item(Key=self._key(key))
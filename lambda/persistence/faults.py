@@ -0,0 +1,245 @@
+"""Latency and fault injection into DynamoDB clients, for resilience and capacity tests."""
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from botocore.awsrequest import AWSResponse
+
+logger = logging.getLogger(__name__)
+
+DYNAMODB_OPERATIONS = ("GetItem", "PutItem", "UpdateItem", "DeleteItem", "BatchGetItem", "BatchWriteItem", "Scan")
+
+# DynamoDB rejects items larger than 400 KB
+MAX_ITEM_SIZE = 400 * 1024
+
+# Seconds of latency for one request attempt, drawn from the injector's random generator
+Latency = Callable[[random.Random], float]
+
+
+def constant_latency(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def uniform_latency(low: float, high: float) -> Latency:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float) -> Latency:
+    """Long-tailed latency, as typically seen from a busy table: ``median`` plus rare slow calls."""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+_LATENCIES: Dict[str, Callable[..., Latency]] = {
+    "constant": constant_latency,
+    "uniform": uniform_latency,
+    "lognormal": lognormal_latency,
+}
+
+
+def attribute_value_size(value: dict) -> int:
+    """Approximate stored size in bytes of a typed attribute value."""
+    (kind, content), = value.items()
+    if kind == "S":
+        return len(content.encode("utf-8"))
+    if kind == "N":
+        return len(content.lstrip("-").replace(".", "")) // 2 + 2
+    if kind == "B":
+        return len(content)
+    if kind in ("BOOL", "NULL"):
+        return 1
+    if kind == "L":
+        return 3 + sum(1 + attribute_value_size(v) for v in content)
+    if kind == "M":
+        return 3 + sum(
+            1 + len(k.encode("utf-8")) + attribute_value_size(v) for k, v in content.items()
+        )
+    if kind == "SS":
+        return sum(len(v.encode("utf-8")) for v in content)
+    return sum(attribute_value_size({kind[0]: v}) for v in content)
+
+
+def item_size(item: dict) -> int:
+    """Size of a typed item as DynamoDB bills it: attribute names plus values."""
+    return sum(len(name.encode("utf-8")) + attribute_value_size(value) for name, value in item.items())
+
+
+@dataclass
+class OperationCounters:
+    """
+    What one operation went through. ``calls`` are client calls, ``attempts``
+    the requests botocore sent for them, retries included.
+    """
+
+    calls: int = 0
+    attempts: int = 0
+    throttled: int = 0
+    unprocessed: int = 0
+    rejected: int = 0
+    latency: float = 0.0
+    consumed_capacity: float = 0.0
+
+
+class _Body:
+    """Raw stream of a canned HTTP response."""
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, **kwargs: Any) -> Iterable[bytes]:
+        yield self.body
+
+
+def _error_body(code: str, message: str) -> bytes:
+    return json.dumps({"__type": f"com.amazonaws.dynamodb.v20120810#{code}", "message": message}).encode("utf-8")
+
+
+class FaultInjector:
+    """
+    Makes a DynamoDB client slow and unreliable on purpose.
+
+    Attached to a botocore client (a low-level one, or a boto3 resource's
+    ``meta.client``), it delays every request attempt by ``latency``,
+    answers a ``throttle_rate`` share of them with
+    ProvisionedThroughputExceededException, which botocore retries like the
+    real thing, returns the same share of BatchWriteItem requests as
+    UnprocessedItems, and rejects items over ``max_item_size``. Requests that
+    get through reach whatever the client points at: DynamoDB Local, moto in
+    tests, or a real table. With a ``seed`` the faults are reproducible for
+    a single-threaded caller; per-operation counters record what happened.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[Latency] = None,
+        throttle_rate: float = 0.0,
+        max_item_size: int = MAX_ITEM_SIZE,
+        operations: Iterable[str] = DYNAMODB_OPERATIONS,
+        seed: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_item_size = max_item_size
+        self.operations = tuple(operations)
+        self.random = random.Random(seed)
+        self.sleep = sleep
+        self.counters: Dict[str, OperationCounters] = {op: OperationCounters() for op in self.operations}
+        self._lock = threading.Lock()
+
+    def attach(self, client: Any) -> Any:
+        """Register the injector's hooks on a client and return it."""
+        events = client.meta.events
+        for operation in self.operations:
+            events.register(f"before-parameter-build.dynamodb.{operation}", partial(self._drop_writes, operation))
+            events.register(f"before-call.dynamodb.{operation}", partial(self._check_sizes, operation))
+            events.register(f"before-send.dynamodb.{operation}", partial(self._delay_or_throttle, operation))
+            events.register(f"after-call.dynamodb.{operation}", partial(self._record_response, operation))
+        return client
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self.random.random()
+
+    def _drop_writes(self, operation: str, params: dict, context: dict, **kwargs: Any) -> None:
+        if operation != "BatchWriteItem" or not self.throttle_rate:
+            return
+        dropped: Dict[str, list] = {}
+        for table, requests in params.get("RequestItems", {}).items():
+            kept = [request for request in requests if self._draw() >= self.throttle_rate]
+            # A batch always gets some work done, or it fails as a whole
+            kept = kept or requests[:1]
+            dropped[table] = [request for request in requests if request not in kept]
+            params["RequestItems"][table] = kept
+        context["unprocessed_writes"] = {table: requests for table, requests in dropped.items() if requests}
+
+    def _check_sizes(self, operation: str, params: dict, **kwargs: Any) -> Optional[tuple]:
+        body = json.loads(params.get("body") or b"{}")
+        if operation == "PutItem":
+            items = [body.get("Item", {})]
+        elif operation == "UpdateItem":
+            # Lower bound: the item after the update holds at least these values
+            items = [{**body.get("Key", {}), **body.get("ExpressionAttributeValues", {})}]
+        elif operation == "BatchWriteItem":
+            items = [
+                request["PutRequest"]["Item"]
+                for requests in body.get("RequestItems", {}).values()
+                for request in requests
+                if "PutRequest" in request
+            ]
+        else:
+            return None
+        oversized = max((item_size(item) for item in items), default=0)
+        if oversized <= self.max_item_size:
+            return None
+
+        with self._lock:
+            self.counters[operation].rejected += 1
+        message = f"Item size {oversized} has exceeded the maximum allowed size of {self.max_item_size}"
+        response = AWSResponse("", 400, {"x-amzn-RequestId": "fault-injector"}, _Body(b""))
+        return response, {"Error": {"Code": "ValidationException", "Message": message}, "ResponseMetadata": {}}
+
+    def _delay_or_throttle(self, operation: str, request: Any, **kwargs: Any) -> Optional[AWSResponse]:
+        with self._lock:
+            delay = self.latency(self.random) if self.latency else 0.0
+            throttled = operation != "BatchWriteItem" and self.random.random() < self.throttle_rate
+            counters = self.counters[operation]
+            counters.attempts += 1
+            counters.latency += delay
+            counters.throttled += throttled
+        if delay:
+            self.sleep(delay)
+        if not throttled:
+            return None
+        body = _error_body("ProvisionedThroughputExceededException", "Injected throttling")
+        headers = {"x-amzn-RequestId": "fault-injector", "Content-Type": "application/x-amz-json-1.0"}
+        return AWSResponse(request.url, 400, headers, _Body(body))
+
+    def _record_response(self, operation: str, parsed: dict, context: dict, **kwargs: Any) -> None:
+        unprocessed = context.get("unprocessed_writes") or {}
+        if unprocessed:
+            for table, requests in unprocessed.items():
+                parsed.setdefault("UnprocessedItems", {}).setdefault(table, []).extend(requests)
+        consumed = parsed.get("ConsumedCapacity", [])
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        with self._lock:
+            counters = self.counters[operation]
+            counters.calls += 1
+            counters.unprocessed += sum(len(requests) for requests in unprocessed.values())
+            counters.consumed_capacity += sum(c.get("CapacityUnits", 0.0) for c in consumed)
+
+
+def parse_fault_spec(spec: str) -> FaultInjector:
+    """
+    Build a FaultInjector from ``key=value`` pairs separated by semicolons.
+
+    For example ``latency=lognormal:0.02:0.8;throttle=0.05;seed=7``; keys are
+    ``latency`` (constant:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA),
+    ``throttle``, ``max_item_size``, ``operations`` (comma separated) and ``seed``.
+    """
+    options: Dict[str, Any] = {}
+    for pair in filter(None, (part.strip() for part in spec.split(";"))):
+        key, _, value = pair.partition("=")
+        if key == "latency":
+            kind, *args = value.split(":")
+            if kind not in _LATENCIES:
+                raise ValueError(f"Unknown latency distribution {kind!r}, expected one of {sorted(_LATENCIES)}")
+            options["latency"] = _LATENCIES[kind](*map(float, args))
+        elif key == "throttle":
+            options["throttle_rate"] = float(value)
+        elif key == "max_item_size":
+            options["max_item_size"] = int(value)
+        elif key == "operations":
+            options["operations"] = value.split(",")
+        elif key == "seed":
+            options["seed"] = int(value)
+        else:
+            raise ValueError(f"Unknown fault option {key!r}")
+    return FaultInjector(**options)
@@ -0,0 +1,133 @@
+"""Separate items for each member of a household, recognized by their Alexa voice profile."""
+
+import copy
+import logging
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_model import Person, RequestEnvelope
+
+from .archive import merge_days
+from .codec import Days
+from .recurring import RECURRING_KEY
+from .versioning import ConcurrentModificationError, item_version
+
+logger = logging.getLogger(__name__)
+
+# Reserved attributes key (see schema.RESERVED_PREFIX), in the household's item
+PERSONS_KEY = "_persons"  # person ids of the members with an item of their own
+
+# A member's item lives next to the household's: "<user id>#person#<person id>"
+PERSON_PARTITION_SEPARATOR = "#person#"
+
+MAX_REGISTER_ATTEMPTS = 5
+
+
+def person_id(request_envelope: RequestEnvelope) -> Optional[str]:
+    """Id of the voice profile Alexa recognized for the request, None if no one was."""
+    system = request_envelope.context.system if request_envelope.context else None
+    person = system.person if system else None
+    return person.person_id if person else None
+
+
+def person_partition_keygen(request_envelope: RequestEnvelope) -> str:
+    """
+    Partition key of the speaker's own item, or of the household's when the voice is not recognized.
+
+    Items saved before voice profiles were in use, and the events of
+    unrecognized speakers, stay in the household's item.
+    """
+    user_id = request_envelope.context.system.user.user_id
+    person = person_id(request_envelope)
+    return f"{user_id}{PERSON_PARTITION_SEPARATOR}{person}" if person else user_id
+
+
+def for_person(request_envelope: RequestEnvelope, person: Optional[str]) -> RequestEnvelope:
+    """A copy of the envelope as if ``person`` had spoken, the household's unrecognized voice if None."""
+    system = copy.copy(request_envelope.context.system)
+    system.person = Person(person_id=person) if person else None
+    context = copy.copy(request_envelope.context)
+    context.system = system
+    envelope = copy.copy(request_envelope)
+    envelope.context = context
+    return envelope
+
+
+class HouseholdPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Wraps another adapter, listing each member in the household's item before their first save.
+
+    The adapter below must key items with person_partition_keygen. A member
+    is added to PERSONS_KEY before their own item is created, so that a
+    failure leaves at worst a member without events, never events that
+    projection.HouseholdView cannot find.
+    """
+
+    def __init__(self, adapter: AbstractPersistenceAdapter) -> None:
+        self.adapter = adapter
+        # Members this container registered or found registered
+        self._registered: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        return self.adapter.get_attributes(request_envelope)
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        return self.adapter.get_day_attributes(request_envelope, day)
+
+    def get_archived_days(self, request_envelope: RequestEnvelope) -> Days:
+        return self.adapter.get_archived_days(request_envelope)
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        person = person_id(request_envelope)
+        if person is not None and item_version(attributes) == 0:
+            self.register(request_envelope, person)
+        self.adapter.save_attributes(request_envelope, attributes)
+
+    def register(self, request_envelope: RequestEnvelope, person: str) -> None:
+        """Add ``person`` to the household's members, unless already listed."""
+        key = (request_envelope.context.system.user.user_id, person)
+        with self._lock:
+            if key in self._registered:
+                return
+
+        household = for_person(request_envelope, None)
+        attributes = self.adapter.get_attributes(household)
+        for attempt in range(MAX_REGISTER_ATTEMPTS):
+            persons = list(attributes.get(PERSONS_KEY, []))
+            if person in persons:
+                break
+            attributes[PERSONS_KEY] = persons + [person]
+            try:
+                self.adapter.save_attributes(household, attributes)
+                logger.info(f"Registered person {person} in household {key[0]}")
+                break
+            except ConcurrentModificationError as e:
+                if attempt == MAX_REGISTER_ATTEMPTS - 1:
+                    raise
+                attributes = e.current_attributes
+        with self._lock:
+            self._registered.add(key)
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        self.adapter.delete_attributes(request_envelope)
+
+
+def merge_day(target: Dict[str, object], source: Dict[str, object], day: str) -> None:
+    """
+    Add a partition's day, and its recurring events, to a merged day read, in place.
+
+    The same event told by two members in the same year, or the same
+    recurring event, is kept once.
+    """
+    if source.get(day):
+        merge_days(target, {day: source[day]})
+    recurrences = source.get(RECURRING_KEY, {}).get(day, [])
+    if recurrences:
+        merged = target.setdefault(RECURRING_KEY, {}).setdefault(day, [])
+        texts = {r["text"] for r in merged}
+        merged.extend(r for r in recurrences if r["text"] not in texts)
+
@@ -0,0 +1,100 @@
+"""Suppression of duplicate writes when Alexa or Lambda retries a request."""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .journal import JOURNAL_KEY
+
+logger = logging.getLogger(__name__)
+
+# Reserved attributes key (see schema.RESERVED_PREFIX)
+REQUESTS_KEY = "_requests"  # request id -> expiry of the marker, in epoch seconds
+
+# Retries of a request arrive within seconds; markers are pruned on later saves
+DEFAULT_MARKER_TTL = 300
+MAX_REQUEST_MARKERS = 20
+DEFAULT_RESPONSE_CACHE_SIZE = 512
+
+
+def is_request_applied(
+    attributes: Dict[str, Any],
+    request_id: Optional[str],
+    now: Optional[float] = None,
+) -> bool:
+    """
+    Whether the change of a request is already in the attributes.
+
+    A change is marked with its request id in the same write that stores
+    it: under REQUESTS_KEY in the item, or in its journal entry when the
+    adapter keeps a journal.
+    """
+    if not request_id:
+        return False
+    now = time.time() if now is None else now
+    if attributes.get(REQUESTS_KEY, {}).get(request_id, 0) > now:
+        return True
+    return any(entry.get("request") == request_id for entry in attributes.get(JOURNAL_KEY, []))
+
+
+def mark_request(
+    attributes: Dict[str, Any],
+    request_id: Optional[str],
+    ttl: float = DEFAULT_MARKER_TTL,
+    now: Optional[float] = None,
+) -> None:
+    """Record a request's change in the attributes, dropping expired markers, in place."""
+    if not request_id:
+        return
+    now = time.time() if now is None else now
+    markers = {rid: expiry for rid, expiry in attributes.get(REQUESTS_KEY, {}).items() if expiry > now}
+    markers[request_id] = int(now + ttl)
+    latest = sorted(markers.items(), key=lambda marker: marker[1])[-MAX_REQUEST_MARKERS:]
+    attributes[REQUESTS_KEY] = dict(latest)
+
+
+class ResponseCache:
+    """
+    Responses already produced in this container, by request id.
+
+    A least recently used map whose entries expire after ``ttl`` seconds;
+    safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_RESPONSE_CACHE_SIZE,
+        ttl: float = DEFAULT_MARKER_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, request_id: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """Return the (response, session attributes) of a request, None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is None:
+                return None
+            expires_at, response, session_attributes = entry
+            if expires_at <= self.clock():
+                del self._entries[request_id]
+                return None
+            self._entries.move_to_end(request_id)
+        return response, copy.deepcopy(session_attributes)
+
+    def put(self, request_id: str, response: Any, session_attributes: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[request_id] = (self.clock() + self.ttl, response, copy.deepcopy(session_attributes))
+            self._entries.move_to_end(request_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, request_id: str) -> bool:
+        return self.get(request_id) is not None
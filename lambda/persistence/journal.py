@@ -0,0 +1,225 @@
+"""Append-only journal of event mutations, periodically folded into the stored snapshot."""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_dynamodb.partition_keygen import user_id_partition_keygen
+from ask_sdk_model import RequestEnvelope
+
+from .codec import Days
+from .tags import retag_event, tag_event, untag_event
+from .versioning import ConcurrentModificationError
+
+logger = logging.getLogger(__name__)
+
+# Reserved attributes keys (see schema.RESERVED_PREFIX)
+JOURNAL_KEY = "_journal"          # journal entries, attached to attributes on read
+PENDING_KEY = "_pending"          # mutations recorded by the helpers, appended on save
+JOURNAL_SEQ_KEY = "_journal_seq"  # journal entries already folded into the attributes
+
+# Journals live in their own item, next to the user's snapshot item
+JOURNAL_PARTITION_SUFFIX = "#journal"
+
+DEFAULT_COMPACTION_THRESHOLD = 50
+# Entries kept in the journal after compaction, so recent changes stay undoable
+DEFAULT_UNDO_WINDOW = 10
+
+Mutation = Dict[str, Any]
+
+
+def _locate(year_events: List[str], index: int, text: str) -> Optional[int]:
+    if index < len(year_events) and year_events[index] == text:
+        return index
+    if text in year_events:
+        return year_events.index(text)
+    return None
+
+
+def apply_mutation(attributes: Dict[str, Any], mutation: Mutation) -> bool:
+    """
+    Apply one add, edit or delete to "M-D" -> year -> events attributes.
+
+    Edits and deletes find their event by index and text, so mutations made
+    concurrently on other devices replay correctly; a mutation whose event
+    no longer exists is skipped. The categories index (see tags.TAGS_KEY)
+    follows the events; an add's "tags" are those set by voice.
+
+    Returns:
+        True if the attributes changed
+    """
+    day, year, index = mutation["day"], mutation["year"], int(mutation["index"])
+    if mutation["op"] == "add":
+        year_events = attributes.setdefault(day, {}).setdefault(year, [])
+        index = min(index, len(year_events))
+        year_events.insert(index, mutation["text"])
+        tag_event(attributes, day, year, index, mutation["text"], mutation.get("tags", ()))
+        return True
+
+    year_events = attributes.get(day, {}).get(year, [])
+    if mutation["op"] == "edit":
+        idx = _locate(year_events, index, mutation["previous"])
+        if idx is None:
+            return False
+        year_events[idx] = mutation["text"]
+        retag_event(attributes, day, year, idx, mutation["text"])
+        return True
+
+    idx = _locate(year_events, index, mutation["text"])
+    if idx is None:
+        return False
+    untag_event(attributes, day, year, idx)
+    year_events.pop(idx)
+    if not year_events:
+        attributes[day].pop(year)
+        if not attributes[day]:
+            attributes.pop(day)
+    return True
+
+
+def inverse_mutation(mutation: Mutation) -> Mutation:
+    """The mutation undoing ``mutation``."""
+    inverse = {key: mutation[key] for key in ("day", "year", "index", "text")}
+    if mutation["op"] == "add":
+        inverse["op"] = "delete"
+    elif mutation["op"] == "delete":
+        inverse["op"] = "add"
+        if mutation.get("tags"):
+            inverse["tags"] = mutation["tags"]
+    else:
+        inverse.update(op="edit", text=mutation["previous"], previous=mutation["text"])
+    return inverse
+
+
+def last_undoable(entries: List[Mutation]) -> Optional[Mutation]:
+    """Most recent journal entry that is neither an undo nor undone already."""
+    undone = {entry["undoes"] for entry in entries if "undoes" in entry}
+    for entry in reversed(entries):
+        if "undoes" not in entry and entry["seq"] not in undone:
+            return entry
+    return None
+
+
+class JournalStore(ABC):
+    """
+    Storage of users' journals: a list of entries, of which the first
+    ``base`` have been trimmed away after compaction.
+    """
+
+    @abstractmethod
+    def read(self, key: str) -> Tuple[int, List[Mutation]]:
+        """Return (base, entries) of a journal, (0, []) if there is none."""
+
+    @abstractmethod
+    def append(self, key: str, mutations: List[Mutation]) -> Tuple[int, int]:
+        """Atomically append entries and return the new (base, end) of the journal."""
+
+    @abstractmethod
+    def trim(self, key: str, base: int, upto: int) -> None:
+        """Drop entries before ``upto`` if the journal still starts at ``base``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a journal."""
+
+
+class JournalingPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Keeps each user's events as a snapshot plus an append-only journal.
+
+    Reads fold the journal tail into the snapshot. Saves carrying mutations
+    recorded by the utils.attributes helpers only append them to the
+    journal, so a turn writes a few hundred bytes instead of the whole map;
+    any other save rewrites the snapshot. Once the journal reaches
+    ``compaction_threshold`` entries it is folded into the snapshot and
+    trimmed down to the last ``undo_window`` entries.
+    """
+
+    def __init__(
+        self,
+        snapshots: AbstractPersistenceAdapter,
+        journal: JournalStore,
+        partition_keygen: Callable[[RequestEnvelope], str] = user_id_partition_keygen,
+        compaction_threshold: int = DEFAULT_COMPACTION_THRESHOLD,
+        undo_window: int = DEFAULT_UNDO_WINDOW,
+    ) -> None:
+        self.snapshots = snapshots
+        self.journal = journal
+        self.partition_keygen = partition_keygen
+        self.compaction_threshold = compaction_threshold
+        self.undo_window = min(undo_window, compaction_threshold - 1)
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        attributes = self.snapshots.get_attributes(request_envelope)
+        base, entries = self.journal.read(self.partition_keygen(request_envelope))
+        if not attributes and not entries:
+            # A new user: their first save writes a plain snapshot
+            return attributes
+
+        folded = int(attributes.get(JOURNAL_SEQ_KEY, 0))
+        tail = [{**entry, "seq": base + i} for i, entry in enumerate(entries)]
+        for entry in tail:
+            if entry["seq"] >= folded:
+                apply_mutation(attributes, entry)
+        attributes[JOURNAL_SEQ_KEY] = base + len(entries)
+        attributes[JOURNAL_KEY] = tail
+        return attributes
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        """One day of the snapshot, with the journal entries about that day folded in."""
+        attributes = self.snapshots.get_day_attributes(request_envelope, day)
+        base, entries = self.journal.read(self.partition_keygen(request_envelope))
+        if not attributes and not entries:
+            return attributes
+
+        folded = int(attributes.get(JOURNAL_SEQ_KEY, 0))
+        for seq, entry in enumerate(entries, base):
+            if seq >= folded and entry["day"] == day:
+                apply_mutation(attributes, entry)
+        attributes[JOURNAL_SEQ_KEY] = base + len(entries)
+        return attributes
+
+    def get_archived_days(self, request_envelope: RequestEnvelope) -> Days:
+        # Journal entries only touch the days in the item
+        return self.snapshots.get_archived_days(request_envelope)
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        pending = attributes.pop(PENDING_KEY, None)
+        tail = attributes.pop(JOURNAL_KEY, [])
+        try:
+            if pending:
+                base, end = self.journal.append(self.partition_keygen(request_envelope), pending)
+                tail += [{**mutation, "seq": end - len(pending) + i} for i, mutation in enumerate(pending)]
+                # The in-memory attributes already include the appended mutations
+                attributes[JOURNAL_SEQ_KEY] = end
+                if end - base >= self.compaction_threshold:
+                    self.compact(request_envelope)
+            else:
+                try:
+                    self.snapshots.save_attributes(request_envelope, attributes)
+                except ConcurrentModificationError:
+                    # Hand callers the folded item, not the bare snapshot
+                    raise ConcurrentModificationError(self.get_attributes(request_envelope))
+        finally:
+            attributes[JOURNAL_KEY] = tail
+
+    def compact(self, request_envelope: RequestEnvelope) -> None:
+        """Fold the journal into the snapshot, keeping the last entries for undo."""
+        key = self.partition_keygen(request_envelope)
+        attributes = self.get_attributes(request_envelope)
+        tail = attributes.pop(JOURNAL_KEY, [])
+        try:
+            self.snapshots.save_attributes(request_envelope, attributes)
+        except ConcurrentModificationError:
+            logger.info(f"Skipping compaction of {key}: snapshot changed concurrently")
+            return
+        if tail:
+            self.journal.trim(key, tail[0]["seq"], int(attributes[JOURNAL_SEQ_KEY]) - self.undo_window)
+        logger.info(f"Compacted journal of {key} up to entry {attributes[JOURNAL_SEQ_KEY]}")
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        self.snapshots.delete_attributes(request_envelope)
+        self.journal.delete(self.partition_keygen(request_envelope))
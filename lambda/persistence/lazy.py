@@ -0,0 +1,74 @@
+"""Persistent attributes decoded from a raw DynamoDB item one key at a time."""
+
+import copy
+from itertools import chain
+from typing import Any, Dict, Iterator, MutableMapping
+
+from .codec import AttributeValue, deserialize_value, serialize_value
+
+
+class LazyAttributes(MutableMapping):
+    """
+    Attributes map over the typed value of a DynamoDB item, as the low-level client returns it.
+
+    A key's value, usually a whole day, is decoded the first time it is
+    accessed and kept. Keys never accessed stay in their typed form and are
+    written back as read, so a save serializes only the keys a request
+    touched, which is every key it may have changed in place.
+    """
+
+    def __init__(self, raw: Dict[str, AttributeValue]) -> None:
+        # Typed values not decoded yet; never mutated, so copies can share them
+        self._raw = dict(raw)
+        self._decoded: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._decoded:
+            self._decoded[key] = deserialize_value(self._raw.pop(key))
+        return self._decoded[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._raw.pop(key, None)
+        self._decoded[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._decoded:
+            del self._decoded[key]
+        else:
+            del self._raw[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._decoded or key in self._raw
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(chain(self._decoded, self._raw)))
+
+    def __len__(self) -> int:
+        return len(self._decoded) + len(self._raw)
+
+    def __repr__(self) -> str:
+        return f"LazyAttributes(decoded={self._decoded!r}, encoded={sorted(self._raw)!r})"
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "LazyAttributes":
+        clone = LazyAttributes(self._raw)
+        clone._decoded = copy.deepcopy(self._decoded, memo)
+        return clone
+
+    @property
+    def decoded_keys(self) -> frozenset:
+        """Keys decoded so far, or set by the caller."""
+        return frozenset(self._decoded)
+
+    def to_attribute_values(self) -> Dict[str, AttributeValue]:
+        """The attributes in typed form, serializing only the decoded keys."""
+        values = dict(self._raw)
+        for key, value in self._decoded.items():
+            values[key] = serialize_value(value)
+        return values
+
+
+def serialize_attributes(attributes: Dict[str, Any]) -> Dict[str, AttributeValue]:
+    """Typed form of attributes, reusing what a LazyAttributes never decoded."""
+    if isinstance(attributes, LazyAttributes):
+        return attributes.to_attribute_values()
+    return {key: serialize_value(value) for key, value in attributes.items()}
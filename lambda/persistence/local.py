@@ -0,0 +1,217 @@
+"""File-backed persistence adapter for running the skill offline."""
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+from urllib.parse import quote
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.exceptions import PersistenceException
+from ask_sdk_dynamodb.partition_keygen import user_id_partition_keygen
+from ask_sdk_model import RequestEnvelope
+
+from .archive import ArchiveStore, Days, decode_archive, encode_archive
+from .deadline import current_deadline
+from .journal import JournalStore, Mutation
+from .projection import project_day
+from .versioning import VERSION_KEY, ConcurrentModificationError, item_version
+
+logger = logging.getLogger(__name__)
+
+
+def local_item_path(directory: Path, partition_key: str) -> Path:
+    """
+    Path of the JSON file holding one user's attributes.
+
+    Shared with the kamaji CLI, which writes synthetic data in this layout.
+    """
+    return directory / f"{quote(partition_key, safe='')}.json"
+
+
+def _read_json(path: Path, default: Any) -> Any:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_json(path: Path, data: Any) -> None:
+    # Write to a temporary file first so readers never see a partial item
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class LocalPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Local stand-in for DynamoDbAdapter.
+
+    Stores each user's persistent attributes as a JSON file named after the
+    partition key, so the skill can run without AWS credentials or tables.
+    Saves are conditioned on the item version like VersionedDynamoDbAdapter,
+    with a per-item file lock standing in for DynamoDB's condition check.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        partition_keygen: Callable[[RequestEnvelope], str] = user_id_partition_keygen,
+    ) -> None:
+        self.directory = Path(directory)
+        self.partition_keygen = partition_keygen
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, request_envelope: RequestEnvelope) -> Path:
+        return local_item_path(self.directory, self.partition_keygen(request_envelope))
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        return _read_json(self._path(request_envelope), {})
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        # A local file is read whole anyway
+        return project_day(self.get_attributes(request_envelope), day)
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        path = self._path(request_envelope)
+        expected = item_version(attributes)
+        with _locked(path):
+            current = _read_json(path, {})
+            if item_version(current) != expected:
+                raise ConcurrentModificationError(current)
+            _write_json(path, {**attributes, VERSION_KEY: expected + 1})
+        attributes[VERSION_KEY] = expected + 1
+        logger.debug(f"Saved attributes to {path}")
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        path = self._path(request_envelope)
+        with _locked(path):
+            path.unlink(missing_ok=True)
+
+
+class LatencyInjectingAdapter(AbstractPersistenceAdapter):
+    """
+    Wraps another adapter, delaying every call to stand in for a slow DynamoDB.
+
+    ``latency`` is either fixed seconds or a function returning them per call.
+    Like a client passed to deadline.bound_client_calls, a call times out
+    when the current deadline comes first.
+    """
+
+    def __init__(
+        self,
+        adapter: AbstractPersistenceAdapter,
+        latency: Union[float, Callable[[], float]],
+    ) -> None:
+        self.adapter = adapter
+        self.latency = latency if callable(latency) else (lambda: latency)
+
+    def _wait(self) -> None:
+        latency = self.latency()
+        deadline = current_deadline()
+        if deadline is not None and latency > deadline.remaining():
+            time.sleep(deadline.remaining())
+            raise PersistenceException(f"Timed out after {latency:.3f}s of injected latency")
+        time.sleep(latency)
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        self._wait()
+        return self.adapter.get_attributes(request_envelope)
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        self._wait()
+        return self.adapter.get_day_attributes(request_envelope, day)
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        self._wait()
+        self.adapter.save_attributes(request_envelope, attributes)
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        self._wait()
+        self.adapter.delete_attributes(request_envelope)
+
+
+class LocalJournalStore(JournalStore):
+    """Journals as ``.journal`` JSON files next to the LocalPersistenceAdapter items."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{quote(key, safe='')}.journal"
+
+    def read(self, key: str) -> Tuple[int, List[Mutation]]:
+        journal = _read_json(self._path(key), {"base": 0, "entries": []})
+        return journal["base"], journal["entries"]
+
+    def append(self, key: str, mutations: List[Mutation]) -> Tuple[int, int]:
+        path = self._path(key)
+        with _locked(path):
+            journal = _read_json(path, {"base": 0, "entries": []})
+            journal["entries"].extend(mutations)
+            _write_json(path, journal)
+        return journal["base"], journal["base"] + len(journal["entries"])
+
+    def trim(self, key: str, base: int, upto: int) -> None:
+        path = self._path(key)
+        with _locked(path):
+            journal = _read_json(path, {"base": 0, "entries": []})
+            if journal["base"] != base or upto <= base:
+                return
+            journal["entries"] = journal["entries"][upto - base:]
+            journal["base"] = upto
+            _write_json(path, journal)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        with _locked(path):
+            path.unlink(missing_ok=True)
+
+
+class LocalArchiveStore(ArchiveStore):
+    """Archives as compressed ``.archive`` files next to the LocalPersistenceAdapter items."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{quote(key, safe='')}.archive"
+
+    def read(self, key: str) -> Days:
+        try:
+            return decode_archive(self._path(key).read_bytes())
+        except FileNotFoundError:
+            return {}
+
+    def write(self, key: str, days: Days) -> None:
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(encode_archive(days))
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
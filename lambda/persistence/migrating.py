@@ -0,0 +1,66 @@
+"""Persistence adapter wrapper that upgrades attributes to the current schema on read."""
+
+import logging
+from typing import Dict
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_model import RequestEnvelope
+
+from .codec import Days
+from .projection import project_day
+from .schema import CURRENT_SCHEMA_VERSION, SCHEMA_VERSION_KEY, migrate_attributes, schema_version
+from .versioning import ConcurrentModificationError
+
+logger = logging.getLogger(__name__)
+
+
+class MigratingPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Wraps another adapter, migrating each user's item the first time it is read.
+
+    AttributesManager loads persistent attributes lazily, so users are only
+    upgraded (and written back) when a handler actually touches their events.
+    New users are stamped with the current version on their first save.
+    """
+
+    def __init__(self, adapter: AbstractPersistenceAdapter) -> None:
+        self.adapter = adapter
+
+    def get_attributes(self, request_envelope: RequestEnvelope) -> Dict[str, object]:
+        attributes = self.adapter.get_attributes(request_envelope)
+        # Empty attributes are a user without an item: nothing to upgrade yet
+        if attributes and migrate_attributes(attributes):
+            try:
+                self.adapter.save_attributes(request_envelope, attributes)
+            except ConcurrentModificationError as e:
+                # Another device saved first; its item is upgraded in memory
+                # and written back with this request's own changes
+                attributes = e.current_attributes
+                migrate_attributes(attributes)
+        return attributes
+
+    def get_day_attributes(self, request_envelope: RequestEnvelope, day: str) -> Dict[str, object]:
+        attributes = self.adapter.get_day_attributes(request_envelope, day)
+        if schema_version(attributes) < CURRENT_SCHEMA_VERSION:
+            # Older layouts may keep the day under another key: upgrade the
+            # whole item first (new users end up here too, with an empty read)
+            return project_day(self.get_attributes(request_envelope), day)
+        return attributes
+
+    def get_archived_days(self, request_envelope: RequestEnvelope) -> Days:
+        # Archived days are upgraded before the archiver moves them
+        return self.adapter.get_archived_days(request_envelope)
+
+    def save_attributes(
+        self, request_envelope: RequestEnvelope, attributes: Dict[str, object]
+    ) -> None:
+        attributes.setdefault(SCHEMA_VERSION_KEY, CURRENT_SCHEMA_VERSION)
+        try:
+            self.adapter.save_attributes(request_envelope, attributes)
+        except ConcurrentModificationError as e:
+            # Callers re-apply their change on the current item: hand it over upgraded
+            migrate_attributes(e.current_attributes)
+            raise
+
+    def delete_attributes(self, request_envelope: RequestEnvelope) -> None:
+        self.adapter.delete_attributes(request_envelope)
@@ -0,0 +1,121 @@
+"""Reads of a single day of a user's item, for requests that never write."""
+
+from typing import Dict, List, Optional
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_model import RequestEnvelope
+
+from .archive import ARCHIVE_KEY
+from .codec import Days
+from .household import PERSONS_KEY, for_person, merge_day
+from .journal import JOURNAL_SEQ_KEY
+from .recurring import RECURRING_KEY
+from .schema import SCHEMA_VERSION_KEY
+from .tags import TaggedEvent, events_by_tag, merge_tagged_events
+from .versioning import VERSION_KEY
+
+# Item metadata a day read carries along with the day
+ITEM_METADATA_KEYS = (SCHEMA_VERSION_KEY, VERSION_KEY, JOURNAL_SEQ_KEY, PERSONS_KEY)
+# Reserved "M-D" -> value maps of which a day read carries the day's entry
+DAY_INDEX_KEYS = (ARCHIVE_KEY, RECURRING_KEY)
+
+# Request attribute holding the request's DayReader (see interceptors.DayReaderInterceptor)
+DAY_READER_ATTR = "day_reader"
+# Request attribute set once the request loaded the user's whole item (see utils.get_persistent_attr)
+ITEM_LOADED_ATTR = "item_loaded"
+# Request attribute holding the request's HouseholdView (see interceptors.HouseholdViewInterceptor)
+HOUSEHOLD_VIEW_ATTR = "household_view"
+
+
+def project_day(attributes: Dict[str, object], day: str) -> Dict[str, object]:
+    """
+    The part of the attributes about one day.
+
+    That is the day itself, the day's entries of the DAY_INDEX_KEYS maps and
+    the ITEM_METADATA_KEYS, each only if present: the layout every adapter's
+    ``get_day_attributes`` returns.
+    """
+    projected = {key: attributes[key] for key in (day, *ITEM_METADATA_KEYS) if key in attributes}
+    for key in DAY_INDEX_KEYS:
+        index = attributes.get(key, {})
+        if day in index:
+            projected[key] = {day: index[day]}
+    return projected
+
+
+class DayReader:
+    """
+    Reads of single days of the user's item, each day read at most once per request.
+
+    Adapters of this package provide ``get_day_attributes``, which only
+    fetches what project_day keeps; others are read whole and projected.
+    The days read are never saved: writes load the whole item. Archived
+    years are read the same way, the archive being decoded at most once.
+    """
+
+    def __init__(self, adapter: AbstractPersistenceAdapter, request_envelope: RequestEnvelope) -> None:
+        self.adapter = adapter
+        self.request_envelope = request_envelope
+        self._days: Dict[str, Dict[str, object]] = {}
+        self._archive: Optional[Days] = None
+
+    def __call__(self, day: str) -> Dict[str, object]:
+        if day not in self._days:
+            get_day_attributes = getattr(self.adapter, "get_day_attributes", None)
+            if get_day_attributes is None:
+                self._days[day] = project_day(self.adapter.get_attributes(self.request_envelope), day)
+            else:
+                self._days[day] = get_day_attributes(self.request_envelope, day)
+        return self._days[day]
+
+    def archived(self, day: str) -> Dict[str, List[str]]:
+        """The archived years of a day, left in the archive (see ArchivingPersistenceAdapter)."""
+        if self._archive is None:
+            get_archived_days = getattr(self.adapter, "get_archived_days", None)
+            self._archive = get_archived_days(self.request_envelope) if get_archived_days else {}
+        return self._archive.get(day, {})
+
+
+class HouseholdView:
+    """
+    Reads of single days across the household's item and each member's.
+
+    Nothing is read until a day is asked for; then the household's item
+    gives the day and the list of members, whose items are read in turn.
+    Days are merged as project_day lays them out, minus the item metadata
+    and archived years, which belong to each item. Category lookups go
+    through each item's own index, so they read the items whole.
+    """
+
+    def __init__(self, adapter: AbstractPersistenceAdapter, request_envelope: RequestEnvelope) -> None:
+        self.adapter = adapter
+        self.request_envelope = request_envelope
+        self._household = DayReader(adapter, for_person(request_envelope, None))
+        self._members: Dict[str, DayReader] = {}
+        self._days: Dict[str, Dict[str, object]] = {}
+        self._items: Optional[List[Dict[str, object]]] = None
+
+    def persons(self, day: str) -> List[str]:
+        """Members with an item of their own, as listed by the household's read of ``day``."""
+        return list(self._household(day).get(PERSONS_KEY, []))
+
+    def __call__(self, day: str) -> Dict[str, object]:
+        if day not in self._days:
+            merged: Dict[str, object] = {}
+            merge_day(merged, self._household(day), day)
+            for person in self.persons(day):
+                if person not in self._members:
+                    self._members[person] = DayReader(self.adapter, for_person(self.request_envelope, person))
+                merge_day(merged, self._members[person](day), day)
+            self._days[day] = merged
+        return self._days[day]
+
+    def events_by_tag(self, tag: str, year: Optional[str] = None) -> List[TaggedEvent]:
+        """The events with a tag in the household's item and every member's, by date."""
+        if self._items is None:
+            household = self.adapter.get_attributes(for_person(self.request_envelope, None))
+            self._items = [household] + [
+                self.adapter.get_attributes(for_person(self.request_envelope, person))
+                for person in household.get(PERSONS_KEY, [])
+            ]
+        return merge_tagged_events(*(events_by_tag(item, tag, year) for item in self._items))
@@ -0,0 +1,46 @@
+"""Events repeating every year, stored once per day and expanded when read."""
+
+from typing import Any, Dict, List, Optional
+
+# Reserved attributes key (see schema.RESERVED_PREFIX)
+RECURRING_KEY = "_recurring"  # "M-D" -> [{"text", optional "start" and "end" year}]
+
+# Pseudo-year under which a day's recurring events are listed next to its
+# years; it sorts after every year, so they come last when navigating
+RECURRING_YEAR = "~"
+
+Recurrence = Dict[str, Any]
+
+
+def occurs_in(recurrence: Recurrence, year: int) -> bool:
+    """Whether a recurring event happens in ``year``, its start and end years included."""
+    start = recurrence.get("start")
+    end = recurrence.get("end")
+    return (start is None or int(start) <= year) and (end is None or year <= int(end))
+
+
+def recurring_events(
+    attributes: Dict[str, Any], day: str, year: Optional[int] = None
+) -> List[Recurrence]:
+    """
+    The recurring events of a day.
+
+    Args:
+        attributes: Persistent attributes
+        day: Day key in "M-D" format
+        year: Only the events happening in this year, None for all
+
+    Returns:
+        Recurrences in the order they were added
+    """
+    recurrences = attributes.get(RECURRING_KEY, {}).get(day, [])
+    return [r for r in recurrences if year is None or occurs_in(r, year)]
+
+
+def with_recurring_events(attributes: Dict[str, Any], day: str) -> Dict[str, List[str]]:
+    """A day's events by year, plus its recurring ones under RECURRING_YEAR."""
+    events = dict(attributes.get(day, {}))
+    recurrences = recurring_events(attributes, day)
+    if recurrences:
+        events[RECURRING_YEAR] = [r["text"] for r in recurrences]
+    return events
@@ -0,0 +1,88 @@
+"""Versioned layout of the persistent attributes and the migrations between versions."""
+
+import logging
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Keys starting with "_" hold item metadata, never "M-D" days
+RESERVED_PREFIX = "_"
+SCHEMA_VERSION_KEY = "_schema_version"
+
+Attributes = Dict[str, object]
+
+
+def is_reserved_key(key: str) -> bool:
+    """Whether an attributes key holds metadata rather than a day."""
+    return key.startswith(RESERVED_PREFIX)
+
+
+def _normalize_days(attributes: Attributes) -> None:
+    """
+    Version 1: canonical "M-D" day keys without leading zeros, string years
+    and no empty years or days.
+
+    Items written by hand or by early imports used "03-05" style keys, which
+    the skill never finds since it looks days up as "3-5".
+    """
+    days = {key: value for key, value in attributes.items() if not is_reserved_key(key)}
+    for key in days:
+        del attributes[key]
+
+    for day, years in days.items():
+        month, day_of_month = (int(part) for part in day.split("-"))
+        canonical = f"{month}-{day_of_month}"
+        for year, events in years.items():
+            if events:
+                attributes.setdefault(canonical, {}).setdefault(str(int(year)), []).extend(events)
+
+
+def _build_tag_index(attributes: Attributes) -> None:
+    """
+    Version 2: the index of the events' categories (see tags.TAGS_KEY),
+    inferred from their descriptions.
+    """
+    # tags reads the days through is_reserved_key, so it imports this module
+    from .tags import rebuild_tag_index
+
+    rebuild_tag_index(attributes)
+
+
+# MIGRATIONS[n] upgrades attributes from version n to n + 1, in place
+MIGRATIONS: List[Callable[[Attributes], None]] = [
+    _normalize_days,
+    _build_tag_index,
+]
+CURRENT_SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(attributes: Attributes) -> int:
+    """Schema version of stored attributes; items that predate versioning are version 0."""
+    return int(attributes.get(SCHEMA_VERSION_KEY, 0))
+
+
+def migrate_attributes(attributes: Attributes, target_version: int = CURRENT_SCHEMA_VERSION) -> bool:
+    """
+    Upgrade attributes in place to ``target_version``.
+
+    Attributes written by a newer version of the skill are left untouched,
+    so rolling back a deployment never downgrades data.
+
+    Args:
+        attributes: Persistent attributes as stored
+        target_version: Version to upgrade to
+
+    Returns:
+        True if the attributes were changed and need saving
+    """
+    version = schema_version(attributes)
+    if version >= target_version:
+        if version > target_version:
+            logger.warning(f"Attributes have schema version {version}, newer than {target_version}")
+        return False
+
+    for migration in MIGRATIONS[version:target_version]:
+        migration(attributes)
+    attributes[SCHEMA_VERSION_KEY] = target_version
+    logger.info(f"Migrated attributes from schema version {version} to {target_version}")
+    return True
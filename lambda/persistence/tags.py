@@ -0,0 +1,206 @@
+"""Categories of events, such as trips or birthdays, indexed by where their events are."""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .schema import is_reserved_key
+
+# Reserved attributes key (see schema.RESERVED_PREFIX)
+TAGS_KEY = "_tags"  # tag -> ["M-D/YYYY/index", ...], "/v" appended for tags set by voice
+
+# Tags inferred from the words of an event; any other tag can only be set by voice
+TAG_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "compleanni": ("compleanno", "compleanni", "compie"),
+    "viaggi": ("viaggio", "viaggi", "vacanza", "vacanze", "gita", "mare", "montagna", "crociera", "volo"),
+    "scuola": ("scuola", "asilo", "esame", "esami", "pagella", "maestra", "recita", "laurea", "diploma"),
+    "lavoro": ("lavoro", "ufficio", "colloquio", "promozione", "riunione"),
+    "salute": ("medico", "dentista", "ospedale", "vaccino", "pediatra", "visita"),
+    "sport": ("partita", "calcio", "gara", "allenamento", "torneo", "piscina"),
+    "feste": ("natale", "pasqua", "capodanno", "matrimonio", "battesimo", "festa", "anniversario"),
+}
+# Other ways to say a tag, e.g. the singular of its name
+TAG_ALIASES: Dict[str, str] = {
+    "compleanno": "compleanni",
+    "viaggio": "viaggi",
+    "vacanza": "viaggi",
+    "vacanze": "viaggi",
+    "gite": "viaggi",
+    "festa": "feste",
+}
+
+VOICE_FLAG = "v"
+
+Entry = Tuple[str, str, int, bool]
+# (day, year, description) of an event found by tag
+TaggedEvent = Tuple[str, str, str]
+
+
+def canonical_tag(name: str) -> str:
+    """The tag a spoken category stands for."""
+    name = name.strip().lower()
+    return TAG_ALIASES.get(name, name)
+
+
+def infer_tags(text: str) -> List[str]:
+    """Tags whose keywords appear among the words of an event's description."""
+    words = set(re.findall(r"\w+", text.lower()))
+    return [tag for tag, keywords in TAG_KEYWORDS.items() if words.intersection(keywords)]
+
+
+def _format(day: str, year: str, index: int, by_voice: bool = False) -> str:
+    entry = f"{day}/{year}/{index}"
+    return f"{entry}/{VOICE_FLAG}" if by_voice else entry
+
+
+def _parse(entry: str) -> Entry:
+    day, year, index, *flags = entry.split("/")
+    return day, year, int(index), VOICE_FLAG in flags
+
+
+def _update(attributes: Dict[str, Any], change) -> None:
+    """Rewrite every entry with ``change(entry) -> entry or None``, dropping emptied tags."""
+    index = attributes.get(TAGS_KEY)
+    if not index:
+        return
+    updated = {}
+    for tag, entries in index.items():
+        kept = []
+        for entry in entries:
+            parsed = change(_parse(entry))
+            if parsed is not None:
+                kept.append(_format(*parsed))
+        if kept:
+            updated[tag] = kept
+    if updated:
+        attributes[TAGS_KEY] = updated
+    else:
+        attributes.pop(TAGS_KEY, None)
+
+
+def _shift(attributes: Dict[str, Any], day: str, year: str, start: int, delta: int) -> None:
+    """Move the entries of a day's year at ``start`` or after by ``delta`` positions."""
+    def shift(entry: Entry) -> Entry:
+        entry_day, entry_year, index, by_voice = entry
+        if entry_day == day and entry_year == year and index >= start:
+            return entry_day, entry_year, index + delta, by_voice
+        return entry
+    _update(attributes, shift)
+
+
+def _add(attributes: Dict[str, Any], tags: Iterable[str], day: str, year: str, index: int, by_voice: bool) -> None:
+    index_map = attributes.setdefault(TAGS_KEY, {})
+    for tag in tags:
+        entries = index_map.setdefault(tag, [])
+        position = (day, year, index)
+        if not any(_parse(entry)[:3] == position for entry in entries):
+            entries.append(_format(day, year, index, by_voice))
+    if not index_map:
+        attributes.pop(TAGS_KEY)
+
+
+def tag_event(
+    attributes: Dict[str, Any], day: str, year: str, index: int, text: str, tags: Sequence[str] = ()
+) -> None:
+    """
+    Index an event inserted at ``index`` of a day's year, in place.
+
+    The event gets the tags inferred from ``text`` plus ``tags``, set by
+    voice; events after it move up one position.
+    """
+    _shift(attributes, day, year, index, 1)
+    _add(attributes, [tag for tag in infer_tags(text) if tag not in tags], day, year, index, False)
+    _add(attributes, tags, day, year, index, True)
+
+
+def untag_event(attributes: Dict[str, Any], day: str, year: str, index: int) -> List[str]:
+    """
+    Drop an event about to be removed from ``index`` of a day's year, in place.
+
+    Events after it move down one position. Returns the tags that had been
+    set by voice, which cannot be inferred again should the event come back.
+    """
+    by_voice: List[str] = []
+    for tag, entries in attributes.get(TAGS_KEY, {}).items():
+        by_voice.extend(tag for entry in entries if _parse(entry) == (day, year, index, True))
+
+    def remove(entry: Entry) -> Optional[Entry]:
+        entry_day, entry_year, entry_index, flag = entry
+        if entry_day != day or entry_year != year or entry_index < index:
+            return entry
+        if entry_index == index:
+            return None
+        return entry_day, entry_year, entry_index - 1, flag
+    _update(attributes, remove)
+    return by_voice
+
+
+def retag_event(attributes: Dict[str, Any], day: str, year: str, index: int, text: str) -> None:
+    """Infer again the tags of an event whose description changed, keeping those set by voice."""
+    _update(attributes, lambda entry: None if entry == (day, year, index, False) else entry)
+    voiced = [tag for tag, entries in attributes.get(TAGS_KEY, {}).items()
+              if _format(day, year, index, True) in entries]
+    _add(attributes, [tag for tag in infer_tags(text) if tag not in voiced], day, year, index, False)
+
+
+def _by_date(event: TaggedEvent) -> Tuple[int, int, int]:
+    month, day_of_month = event[0].split("-")
+    return int(event[1]), int(month), int(day_of_month)
+
+
+def events_by_tag(
+    attributes: Dict[str, Any], tag: str, year: Optional[str] = None
+) -> List[TaggedEvent]:
+    """
+    The (day, year, description) of the events with a tag, by date.
+
+    Only the index and the days it points to are read. Entries no longer
+    matching an event, e.g. of years since archived, are skipped.
+    """
+    found = []
+    for entry in attributes.get(TAGS_KEY, {}).get(tag, []):
+        day, entry_year, index, _ = _parse(entry)
+        if year is not None and entry_year != year:
+            continue
+        year_events = attributes.get(day, {}).get(entry_year, [])
+        if index < len(year_events):
+            found.append((day, entry_year, year_events[index]))
+    return sorted(found, key=_by_date)
+
+
+def merge_tagged_events(*found: Iterable[TaggedEvent]) -> List[TaggedEvent]:
+    """
+    Events found by tag in several items, by date.
+
+    As with household.merge_day, the same event told in two items on the
+    same day of the same year is kept once.
+    """
+    merged: List[TaggedEvent] = []
+    for events in found:
+        present = list(merged)
+        for event in events:
+            if event in present:
+                present.remove(event)
+            else:
+                merged.append(event)
+    return sorted(merged, key=_by_date)
+
+
+def rebuild_tag_index(attributes: Dict[str, Any]) -> bool:
+    """
+    Rebuild the index from the events, in place.
+
+    Tags are inferred again from every description; tags set by voice are
+    kept while their event is still where they point. Returns True if the
+    index changed.
+    """
+    previous = attributes.get(TAGS_KEY, {})
+    voiced = [(tag, _parse(entry)) for tag, entries in previous.items() for entry in entries]
+    attributes.pop(TAGS_KEY, None)
+    for day in [key for key in attributes if not is_reserved_key(key)]:
+        for year, year_events in attributes[day].items():
+            for index, text in enumerate(year_events):
+                _add(attributes, infer_tags(text), day, year, index, False)
+    for tag, (day, year, index, by_voice) in voiced:
+        if by_voice and index < len(attributes.get(day, {}).get(year, [])):
+            _add(attributes, [tag], day, year, index, True)
+    return attributes.get(TAGS_KEY, {}) != previous
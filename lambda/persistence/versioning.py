@@ -0,0 +1,28 @@
+"""Item version numbers for optimistic concurrency between devices sharing a user item."""
+
+from typing import Dict
+
+from ask_sdk_core.exceptions import PersistenceException
+
+# Incremented by every successful save; absent on items never saved with it
+VERSION_KEY = "_version"
+
+
+class ConcurrentModificationError(PersistenceException):
+    """
+    Raised when the stored item changed since it was read.
+
+    ``current_attributes`` holds the item as now stored, so callers can
+    re-apply their change without another read.
+    """
+
+    def __init__(self, current_attributes: Dict[str, object]) -> None:
+        super().__init__(
+            f"Item changed concurrently: stored version is {item_version(current_attributes)}"
+        )
+        self.current_attributes = current_attributes
+
+
+def item_version(attributes: Dict[str, object]) -> int:
+    """Version of attributes as read; 0 for items that were never saved."""
+    return int(attributes.get(VERSION_KEY, 0))
@@ -28,5 +28,29 @@ NO_PREVIOUS_EVENTS = "NO_PREVIOUS_EVENTS"
 EDIT_EVENT_PROMPT = "EDIT_EVENT_PROMPT"
 EVENT_EDITED = "EVENT_EDITED"
 
+# Undo
+UNDO_ADD = "UNDO_ADD"
+UNDO_DELETE = "UNDO_DELETE"
+UNDO_EDIT = "UNDO_EDIT"
+NOTHING_TO_UNDO = "NOTHING_TO_UNDO"
+
+# Archived years
+OLDER_EVENTS_AVAILABLE = "OLDER_EVENTS_AVAILABLE"
+OLDER_EVENTS_INTRO = "OLDER_EVENTS_INTRO"
+
+# Recurring events
+RECURRING_EVENT_ADDED = "RECURRING_EVENT_ADDED"
+RECURRING_EVENT_EXISTS = "RECURRING_EVENT_EXISTS"
+RECURRING_EVENTS = "RECURRING_EVENTS"
+RECURRING_EVENT_PROMPT = "RECURRING_EVENT_PROMPT"
+
+# Categories
+CATEGORY_EVENTS = "CATEGORY_EVENTS"
+NO_CATEGORY_EVENTS = "NO_CATEGORY_EVENTS"
+NO_CATEGORY_EVENTS_IN_YEAR = "NO_CATEGORY_EVENTS_IN_YEAR"
+
+# Slow persistence
+TRY_AGAIN_SHORTLY = "TRY_AGAIN_SHORTLY"
+
 # Session continuity
 ANYTHING_ELSE = "ANYTHING_ELSE"
@@ -4,8 +4,18 @@ from .attributes import (
     get_session_attr,
     set_session_attr,
     get_persistent_attr,
+    get_day_attributes,
+    get_household_day_attributes,
     get_events_for_day,
+    get_recurring_events_for_day,
+    get_events_by_tag,
+    get_household_events_by_tag,
+    has_archived_years,
+    hydrate_archived_years,
     add_event_to_persistence,
+    add_recurring_event_to_persistence,
     delete_event_from_persistence,
     update_event_in_persistence,
+    save_with_retry,
+    undo_last_change,
 )
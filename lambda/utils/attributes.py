@@ -1,14 +1,47 @@
 """Helper functions for session and persistence attribute management."""
 
-from typing import Any, Dict, List, Optional, TypeVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
 import logging
+import random
+import time
 
 from ask_sdk_core.handler_input import HandlerInput
 
+from persistence import (
+    ARCHIVE_KEY,
+    DAY_READER_ATTR,
+    HOUSEHOLD_VIEW_ATTR,
+    HYDRATE_KEY,
+    ITEM_LOADED_ATTR,
+    JOURNAL_KEY,
+    PENDING_KEY,
+    RECURRING_KEY,
+    RECURRING_YEAR,
+    ConcurrentModificationError,
+    apply_mutation,
+    events_by_tag,
+    inverse_mutation,
+    is_request_applied,
+    last_undoable,
+    mark_request,
+    merge_days,
+    recurring_events,
+    retag_event,
+    tag_event,
+    untag_event,
+    with_recurring_events,
+)
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Saves that lose a race with another device are re-applied on the current
+# item, with exponential backoff and full jitter between attempts
+MAX_SAVE_ATTEMPTS = 10
+SAVE_BACKOFF_BASE = 0.02
+SAVE_BACKOFF_CAP = 0.5
+
 
 def get_session_attr(handler_input: HandlerInput, key: str, default: T = None) -> T:
     """
@@ -43,49 +76,462 @@ def get_persistent_attr(handler_input: HandlerInput) -> Dict[str, Any]:
     """
     Get all persistent attributes.
 
+    The whole item is loaded, if it was not yet; later reads of single
+    days in the request use it too (see get_day_attributes).
+
     Args:
         handler_input: Alexa handler input
 
     Returns:
         Dictionary of persistent attributes
     """
-    return handler_input.attributes_manager.persistent_attributes
+    attributes_manager = handler_input.attributes_manager
+    attributes_manager.request_attributes[ITEM_LOADED_ATTR] = True
+    return attributes_manager.persistent_attributes
+
+
+def get_day_attributes(handler_input: HandlerInput, event_day: str) -> Dict[str, Any]:
+    """
+    Get the persistent attributes about one day, for reading only.
+
+    Unless the request already loaded the whole item, only the day is
+    fetched, through the request's DayReader (see
+    interceptors.DayReaderInterceptor).
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format
+
+    Returns:
+        The day, its archived and recurring entries and the item metadata
+    """
+    request_attributes = handler_input.attributes_manager.request_attributes
+    reader = request_attributes.get(DAY_READER_ATTR)
+    if reader is None or request_attributes.get(ITEM_LOADED_ATTR):
+        return get_persistent_attr(handler_input)
+    return reader(event_day)
+
+
+def get_household_day_attributes(handler_input: HandlerInput, event_day: str) -> Dict[str, Any]:
+    """
+    Get one day of every household member's events merged, for reading only.
+
+    Members recognized by their voice profile keep their events in items of
+    their own (see persistence.person_partition_keygen); these are only read
+    here, through the request's HouseholdView. Without one, as when the skill
+    keeps a single item per household, this is the household's own day.
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format
+
+    Returns:
+        The day and its recurring entries, merged across the household
+    """
+    view = handler_input.attributes_manager.request_attributes.get(HOUSEHOLD_VIEW_ATTR)
+    if view is None:
+        return get_day_attributes(handler_input, event_day)
+    return view(event_day)
 
 
-def get_events_for_day(handler_input: HandlerInput, event_day: str) -> Dict[str, List[str]]:
+def get_events_for_day(
+    handler_input: HandlerInput,
+    event_day: str,
+    include_archived: bool = False,
+    include_recurring: bool = False
+) -> Dict[str, List[str]]:
     """
     Get all events for a specific day from persistence.
 
+    Archived years are included when asked for, or when the day has no
+    other years left. They are read from the archive for this request
+    only, and stay there until an edit brings them back (see
+    hydrate_archived_years).
+
     Args:
         handler_input: Alexa handler input
         event_day: Day key in "M-D" format
+        include_archived: Whether to include the day's archived years
+        include_recurring: Whether to list the day's recurring events,
+            under the RECURRING_YEAR pseudo-year
 
     Returns:
         Dict mapping year -> list of events, empty dict if none found
     """
-    persistence_attr = handler_input.attributes_manager.persistent_attributes
-    return persistence_attr.get(event_day, {})
+    persistence_attr = get_day_attributes(handler_input, event_day)
+    events = persistence_attr.get(event_day, {})
+    if has_archived_years(handler_input, event_day) and (include_archived or not events):
+        # Merged as ArchivingPersistenceAdapter would, into a copy
+        merged = {event_day: {year: list(year_events) for year, year_events in events.items()}}
+        merge_days(merged, {event_day: _get_archived_events(handler_input, event_day)})
+        events = merged[event_day]
+    if include_recurring:
+        return with_recurring_events(
+            {event_day: events, RECURRING_KEY: persistence_attr.get(RECURRING_KEY, {})}, event_day
+        )
+    return events
+
+
+def _get_archived_events(handler_input: HandlerInput, event_day: str) -> Dict[str, List[str]]:
+    """Archived years of a day, through the request's DayReader; none can be read without one."""
+    reader = handler_input.attributes_manager.request_attributes.get(DAY_READER_ATTR)
+    if reader is None:
+        logger.warning(f"No DayReader to read the archived years of {event_day}")
+        return {}
+    return reader.archived(event_day)
+
+
+def get_recurring_events_for_day(handler_input: HandlerInput, event_day: str) -> List[Dict[str, Any]]:
+    """
+    Get the events repeating every year on a day.
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format
+
+    Returns:
+        Recurrences with "text" and, when bounded, "start" and "end" years
+    """
+    persistence_attr = get_day_attributes(handler_input, event_day)
+    return recurring_events(persistence_attr, event_day)
+
+
+def get_events_by_tag(
+    handler_input: HandlerInput,
+    tag: str,
+    year: Optional[str] = None
+) -> List[Tuple[str, str, str]]:
+    """
+    Get the events of a category, through the index the write helpers keep.
+
+    Only the index and the days it points to are decoded. Archived years
+    and recurring events are not indexed. With an item per household
+    member, only the speaker's events are found: see
+    get_household_events_by_tag.
+
+    Args:
+        handler_input: Alexa handler input
+        tag: Category, as returned by persistence.canonical_tag
+        year: Year as string, None for every year
+
+    Returns:
+        (day, year, event) tuples in date order
+    """
+    return events_by_tag(get_persistent_attr(handler_input), tag, year)
+
+
+def get_household_events_by_tag(
+    handler_input: HandlerInput,
+    tag: str,
+    year: Optional[str] = None
+) -> List[Tuple[str, str, str]]:
+    """
+    Get the events of a category across every household member, for reading only.
+
+    The lookups of the household's item and of each member's are merged
+    through the request's HouseholdView. Without one, as when the skill
+    keeps a single item per household, these are the household's events.
+
+    Args:
+        handler_input: Alexa handler input
+        tag: Category, as returned by persistence.canonical_tag
+        year: Year as string, None for every year
+
+    Returns:
+        (day, year, event) tuples in date order
+    """
+    view = handler_input.attributes_manager.request_attributes.get(HOUSEHOLD_VIEW_ATTR)
+    if view is None:
+        return get_events_by_tag(handler_input, tag, year)
+    return view.events_by_tag(tag, year)
+
+
+def has_archived_years(handler_input: HandlerInput, event_day: str) -> bool:
+    """
+    Whether some years of a day were moved to the archive.
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format
+
+    Returns:
+        True if get_events_for_day can include archived years
+    """
+    persistence_attr = get_day_attributes(handler_input, event_day)
+    return event_day in persistence_attr.get(ARCHIVE_KEY, {})
+
+
+def save_with_retry(
+    handler_input: HandlerInput,
+    operation: Callable[[Dict[str, Any]], Tuple[T, bool]]
+) -> T:
+    """
+    Apply a logical change to the persistent attributes and save it.
+
+    If another device saved the item since it was read, the change is
+    re-applied to the item as now stored and saved again, up to
+    MAX_SAVE_ATTEMPTS times. ``operation`` must therefore only depend on
+    the attributes it is given.
+
+    Args:
+        handler_input: Alexa handler input
+        operation: Mutates the attributes in place and returns
+            (result, whether anything changed and needs saving)
+
+    Returns:
+        The result of the last application of ``operation``
+    """
+    attributes_manager = handler_input.attributes_manager
+    for attempt in range(MAX_SAVE_ATTEMPTS):
+        result, changed = operation(get_persistent_attr(handler_input))
+        if not changed:
+            return result
+        try:
+            attributes_manager.save_persistent_attributes()
+            return result
+        except ConcurrentModificationError as e:
+            if attempt == MAX_SAVE_ATTEMPTS - 1:
+                raise
+            logger.info(f"Concurrent save detected, retrying (attempt {attempt + 1})")
+            attributes_manager.persistent_attributes = e.current_attributes
+            time.sleep(random.uniform(0, min(SAVE_BACKOFF_CAP, SAVE_BACKOFF_BASE * 2 ** attempt)))
+
+
+def hydrate_archived_years(handler_input: HandlerInput, event_day: Optional[str] = None) -> bool:
+    """
+    Bring a day's archived years, or all of them, back into the persistent attributes.
+
+    Only needed to edit them: reads merge archived years in memory (see
+    get_events_for_day). The years stay with the other ones until the next
+    archive rollover.
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format, None for every archived day
+
+    Returns:
+        True if archived years were brought back
+    """
+    def hydrate(persistence_attr: Dict[str, Any]) -> Tuple[bool, bool]:
+        archived = persistence_attr.get(ARCHIVE_KEY, {})
+        if not archived or (event_day is not None and event_day not in archived):
+            return False, False
+        persistence_attr[HYDRATE_KEY] = [event_day] if event_day else []
+        return True, True
+
+    hydrated = save_with_retry(handler_input, hydrate)
+    if hydrated:
+        logger.info(f"Brought back archived years of {event_day or 'every day'}")
+
+    return hydrated
+
+
+def _request_id(handler_input: HandlerInput) -> Optional[str]:
+    """Id of the request being handled, shared by Alexa's retries of it."""
+    return handler_input.request_envelope.request.request_id
+
+
+def _record_mutation(
+    persistence_attr: Dict[str, Any],
+    mutation: Dict[str, Any],
+    request_id: Optional[str] = None
+) -> None:
+    """
+    Queue a mutation for the journal, when the persistence adapter keeps one.
+
+    The request making the change is marked in the same write, so that a
+    retry of it is recognized (see persistence.is_request_applied).
+    """
+    if JOURNAL_KEY in persistence_attr:
+        if request_id:
+            mutation = {**mutation, "request": request_id}
+        persistence_attr.setdefault(PENDING_KEY, []).append(mutation)
+    else:
+        mark_request(persistence_attr, request_id)
+
+
+def _locate_event(year_events: List[str], event_idx: int, event: str) -> Optional[int]:
+    """Index of an event read earlier, which other devices may have shifted."""
+    if event_idx < len(year_events) and year_events[event_idx] == event:
+        return event_idx
+    if event in year_events:
+        return year_events.index(event)
+    return None
+
+
+def _bring_back_archived_year(handler_input: HandlerInput, event_day: str, event_year: str) -> None:
+    """Move a day back from the archive before one of its archived years is edited."""
+    archived_years = get_day_attributes(handler_input, event_day).get(ARCHIVE_KEY, {}).get(event_day, [])
+    if event_year in archived_years:
+        hydrate_archived_years(handler_input, event_day)
 
 
 def add_event_to_persistence(
     handler_input: HandlerInput,
     event_day: str,
     event_year: str,
-    event: str
+    event: str,
+    tags: Sequence[str] = ()
 ) -> None:
     """
     Add an event to persistent storage.
 
+    A retry of a request whose event was already saved adds nothing. The
+    event is indexed under the categories inferred from its description,
+    plus ``tags``.
+
     Args:
         handler_input: Alexa handler input
         event_day: Day key in "M-D" format
         event_year: Year as string
         event: Event description
+        tags: Categories set by voice
     """
-    persistence_attr = handler_input.attributes_manager.persistent_attributes
-    persistence_attr.setdefault(event_day, {}).setdefault(event_year, []).append(event)
-    handler_input.attributes_manager.save_persistent_attributes()
-    logger.info(f"Added event to {event_day}/{event_year}: {event}")
+    request_id = _request_id(handler_input)
+
+    def add(persistence_attr: Dict[str, Any]) -> Tuple[bool, bool]:
+        if is_request_applied(persistence_attr, request_id):
+            # A retry of a request whose save landed, e.g. after a timeout
+            return False, False
+        year_events = persistence_attr.setdefault(event_day, {}).setdefault(event_year, [])
+        mutation = {"op": "add", "day": event_day, "year": event_year, "index": len(year_events), "text": event}
+        if tags:
+            mutation["tags"] = list(tags)
+        _record_mutation(persistence_attr, mutation, request_id)
+        year_events.append(event)
+        tag_event(persistence_attr, event_day, event_year, mutation["index"], event, tags)
+        return True, True
+
+    if save_with_retry(handler_input, add):
+        logger.info(f"Added event to {event_day}/{event_year}: {event}")
+    else:
+        logger.info(f"Request {request_id} already added its event to {event_day}/{event_year}")
+
+
+def add_recurring_event_to_persistence(
+    handler_input: HandlerInput,
+    event_day: str,
+    event: str,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None
+) -> bool:
+    """
+    Add an event repeating every year on a day, such as a birthday.
+
+    It is stored once, however many years it spans. Copies of the same
+    description in single years of the day are folded into it, the
+    earliest giving the start year when none is given.
+
+    Args:
+        handler_input: Alexa handler input
+        event_day: Day key in "M-D" format
+        event: Event description
+        start_year: First year of the event, None if always
+        end_year: Last year of the event, None if open-ended
+
+    Returns:
+        True if added, False if the day already has this recurring event
+    """
+    request_id = _request_id(handler_input)
+
+    def add(persistence_attr: Dict[str, Any]) -> Tuple[bool, bool]:
+        if is_request_applied(persistence_attr, request_id):
+            return True, False
+        if any(r["text"] == event for r in recurring_events(persistence_attr, event_day)):
+            return False, False
+
+        years = persistence_attr.get(event_day, {})
+        copies = sorted(year for year, year_events in years.items() if event in year_events)
+        for year in copies:
+            for idx in reversed([i for i, e in enumerate(years[year]) if e == event]):
+                untag_event(persistence_attr, event_day, year, idx)
+            years[year] = [e for e in years[year] if e != event]
+            if not years[year]:
+                del years[year]
+        if copies and not years:
+            del persistence_attr[event_day]
+
+        recurrence: Dict[str, Any] = {"text": event}
+        if start_year is not None or copies:
+            recurrence["start"] = start_year if start_year is not None else int(copies[0])
+        if end_year is not None:
+            recurrence["end"] = end_year
+        persistence_attr.setdefault(RECURRING_KEY, {}).setdefault(event_day, []).append(recurrence)
+        # Not journaled: the whole item is saved, as the change can span several years
+        mark_request(persistence_attr, request_id)
+        return True, True
+
+    added = save_with_retry(handler_input, add)
+    if added:
+        logger.info(f"Added recurring event to {event_day}: {event}")
+
+    return added
+
+
+def _delete_recurring_event(handler_input: HandlerInput, event_day: str, event_idx: int) -> List[str]:
+    """Delete a recurring event, returning the day's remaining ones."""
+    target: List[str] = []
+    request_id = _request_id(handler_input)
+
+    def delete(persistence_attr: Dict[str, Any]) -> Tuple[List[str], bool]:
+        texts = [r["text"] for r in recurring_events(persistence_attr, event_day)]
+        if is_request_applied(persistence_attr, request_id):
+            return texts, False
+        if not target:
+            if event_idx >= len(texts):
+                logger.warning(f"Recurring event index {event_idx} out of range for {event_day}")
+                return texts, False
+            target.append(texts[event_idx])
+
+        idx = _locate_event(texts, event_idx, target[0])
+        if idx is None:
+            return texts, False
+        recurring = persistence_attr[RECURRING_KEY]
+        del recurring[event_day][idx]
+        if not recurring[event_day]:
+            del recurring[event_day]
+        if not recurring:
+            del persistence_attr[RECURRING_KEY]
+        mark_request(persistence_attr, request_id)
+        return texts[:idx] + texts[idx + 1:], True
+
+    remaining_events = save_with_retry(handler_input, delete)
+    logger.info(f"Deleted recurring event at index {event_idx} from {event_day}")
+
+    return remaining_events
+
+
+def _update_recurring_event(
+    handler_input: HandlerInput, event_day: str, event_idx: int, new_event: str
+) -> bool:
+    """Change the description of a recurring event, keeping its years."""
+    target: List[str] = []
+    request_id = _request_id(handler_input)
+
+    def update(persistence_attr: Dict[str, Any]) -> Tuple[bool, bool]:
+        if is_request_applied(persistence_attr, request_id):
+            return True, False
+        texts = [r["text"] for r in recurring_events(persistence_attr, event_day)]
+        if not target:
+            if event_idx >= len(texts):
+                logger.warning(f"Recurring event index {event_idx} out of range for {event_day}")
+                return False, False
+            target.append(texts[event_idx])
+
+        idx = _locate_event(texts, event_idx, target[0])
+        if idx is None:
+            logger.warning(f"Recurring event to update in {event_day} was deleted concurrently")
+            return False, False
+        recurrences = persistence_attr[RECURRING_KEY][event_day]
+        recurrences[idx] = {**recurrences[idx], "text": new_event}
+        mark_request(persistence_attr, request_id)
+        return True, True
+
+    updated = save_with_retry(handler_input, update)
+    if updated:
+        logger.info(f"Updated recurring event at index {event_idx} in {event_day}: {new_event}")
+
+    return updated
 
 
 def delete_event_from_persistence(
@@ -97,35 +543,65 @@ def delete_event_from_persistence(
     """
     Delete an event from persistent storage.
 
+    The event is identified by its index when first read; if another
+    device changed the day meanwhile, the same description is deleted
+    wherever it now is. The events of an archived year are brought back
+    into the item first.
+
     Args:
         handler_input: Alexa handler input
         event_day: Day key in "M-D" format
-        event_year: Year as string
+        event_year: Year as string, RECURRING_YEAR for a recurring event
         event_idx: Index of event to delete
 
     Returns:
         Remaining events for that year after deletion
     """
-    persistence_attr = handler_input.attributes_manager.persistent_attributes
-    events = persistence_attr.get(event_day, {})
-
-    if event_year not in events:
-        logger.warning(f"Year {event_year} not found for day {event_day}")
-        return []
-
-    year_events = events[event_year]
-    remaining_events = [e for i, e in enumerate(year_events) if i != event_idx]
-
-    if remaining_events:
-        persistence_attr[event_day][event_year] = remaining_events
-    else:
-        # Remove the year if no events left
-        persistence_attr[event_day].pop(event_year, None)
-        # Remove the day if no years left
-        if not persistence_attr[event_day]:
-            persistence_attr.pop(event_day, None)
-
-    handler_input.attributes_manager.save_persistent_attributes()
+    if event_year == RECURRING_YEAR:
+        return _delete_recurring_event(handler_input, event_day, event_idx)
+    _bring_back_archived_year(handler_input, event_day, event_year)
+
+    target: List[str] = []
+    request_id = _request_id(handler_input)
+
+    def delete(persistence_attr: Dict[str, Any]) -> Tuple[List[str], bool]:
+        events = persistence_attr.get(event_day, {})
+        if is_request_applied(persistence_attr, request_id):
+            return list(events.get(event_year, [])), False
+        if event_year not in events:
+            logger.warning(f"Year {event_year} not found for day {event_day}")
+            return [], False
+
+        year_events = events[event_year]
+        if not target:
+            if event_idx >= len(year_events):
+                logger.warning(f"Event index {event_idx} out of range for {event_day}/{event_year}")
+                return list(year_events), False
+            target.append(year_events[event_idx])
+
+        idx = _locate_event(year_events, event_idx, target[0])
+        if idx is None:
+            # Already deleted by another device
+            return list(year_events), False
+        remaining_events = year_events[:idx] + year_events[idx + 1:]
+        mutation = {"op": "delete", "day": event_day, "year": event_year, "index": idx, "text": target[0]}
+        # Kept so that undoing the delete restores them
+        tags = untag_event(persistence_attr, event_day, event_year, idx)
+        if tags:
+            mutation["tags"] = tags
+        _record_mutation(persistence_attr, mutation, request_id)
+
+        if remaining_events:
+            persistence_attr[event_day][event_year] = remaining_events
+        else:
+            # Remove the year if no events left
+            persistence_attr[event_day].pop(event_year, None)
+            # Remove the day if no years left
+            if not persistence_attr[event_day]:
+                persistence_attr.pop(event_day, None)
+        return remaining_events, True
+
+    remaining_events = save_with_retry(handler_input, delete)
     logger.info(f"Deleted event at index {event_idx} from {event_day}/{event_year}")
 
     return remaining_events
@@ -141,30 +617,94 @@ def update_event_in_persistence(
     """
     Update an event in persistent storage.
 
+    As for deletion, a concurrently shifted event is found by its
+    description; an event deleted meanwhile is not recreated, and an
+    archived year is brought back into the item first.
+
     Args:
         handler_input: Alexa handler input
         event_day: Day key in "M-D" format
-        event_year: Year as string
+        event_year: Year as string, RECURRING_YEAR for a recurring event
         event_idx: Index of event to update
         new_event: New event description
 
     Returns:
         True if updated successfully, False otherwise
     """
-    persistence_attr = handler_input.attributes_manager.persistent_attributes
-    events = persistence_attr.get(event_day, {})
-
-    if event_year not in events:
-        logger.warning(f"Year {event_year} not found for day {event_day}")
-        return False
+    if event_year == RECURRING_YEAR:
+        return _update_recurring_event(handler_input, event_day, event_idx, new_event)
+    _bring_back_archived_year(handler_input, event_day, event_year)
+
+    target: List[str] = []
+    request_id = _request_id(handler_input)
+
+    def update(persistence_attr: Dict[str, Any]) -> Tuple[bool, bool]:
+        if is_request_applied(persistence_attr, request_id):
+            return True, False
+        events = persistence_attr.get(event_day, {})
+        if event_year not in events:
+            logger.warning(f"Year {event_year} not found for day {event_day}")
+            return False, False
+
+        year_events = events[event_year]
+        if not target:
+            if event_idx >= len(year_events):
+                logger.warning(f"Event index {event_idx} out of range for {event_day}/{event_year}")
+                return False, False
+            target.append(year_events[event_idx])
+
+        idx = _locate_event(year_events, event_idx, target[0])
+        if idx is None:
+            logger.warning(f"Event to update in {event_day}/{event_year} was deleted concurrently")
+            return False, False
+        _record_mutation(persistence_attr, {
+            "op": "edit", "day": event_day, "year": event_year, "index": idx,
+            "text": new_event, "previous": year_events[idx],
+        }, request_id)
+        year_events[idx] = new_event
+        retag_event(persistence_attr, event_day, event_year, idx, new_event)
+        return True, True
+
+    updated = save_with_retry(handler_input, update)
+    if updated:
+        logger.info(f"Updated event at index {event_idx} in {event_day}/{event_year}: {new_event}")
+
+    return updated
+
+
+def undo_last_change(handler_input: HandlerInput) -> Optional[Dict[str, Any]]:
+    """
+    Revert the most recent add, edit or delete that was not undone yet.
 
-    year_events = events[event_year]
-    if event_idx >= len(year_events):
-        logger.warning(f"Event index {event_idx} out of range for {event_day}/{event_year}")
-        return False
+    Only possible when the persistence adapter keeps a journal; repeated
+    calls walk further back through the journal's recent entries. A retry
+    of a request whose undo was saved undoes nothing more.
 
-    persistence_attr[event_day][event_year][event_idx] = new_event
-    handler_input.attributes_manager.save_persistent_attributes()
-    logger.info(f"Updated event at index {event_idx} in {event_day}/{event_year}: {new_event}")
+    Args:
+        handler_input: Alexa handler input
 
-    return True
+    Returns:
+        The undone mutation ("op", "day", "year", "index", "text" and, for
+        edits, "previous"), or None if there is nothing to undo
+    """
+    request_id = _request_id(handler_input)
+
+    def undo(persistence_attr: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        journal = persistence_attr.get(JOURNAL_KEY, [])
+        if is_request_applied(persistence_attr, request_id):
+            # A retry of a request whose undo landed: report the same change
+            applied = next((entry for entry in journal if entry.get("request") == request_id), None)
+            return (inverse_mutation(applied) if applied else None), False
+        entry = last_undoable(journal)
+        if entry is None:
+            return None, False
+        inverse = inverse_mutation(entry)
+        apply_mutation(persistence_attr, inverse)
+        _record_mutation(persistence_attr, {**inverse, "undoes": entry["seq"]}, request_id)
+        return entry, True
+
+    undone = save_with_retry(handler_input, undo)
+    if undone:
+        logger.info(f"Undid {undone['op']} of '{undone['text']}' in {undone['day']}/{undone['year']}")
+
+    return undone
@@ -0,0 +1,124 @@
+"""Answers to the scheduled pings keeping containers warm, given before the skill pipeline runs."""
+
+import importlib
+import json
+import logging
+import os
+import pkgutil
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Custom pings are {"warmup": true}, optionally with a "preload" list of steps
+WARMUP_KEY = "warmup"
+PRELOAD_KEY = "preload"
+# Partition key read by the DynamoDB step; no user has it
+WARMUP_PARTITION_KEY = "kamaji#warmup"
+DEFAULT_PRELOAD = ("dynamodb", "locales", "handlers")
+
+# An IntentRequest like the skill receives, whose deserialization imports
+# the request models the serializer otherwise loads on the first request
+_SAMPLE_ENVELOPE = {
+    "version": "1.0",
+    "session": {
+        "new": False,
+        "sessionId": "warmup",
+        "application": {"applicationId": "warmup"},
+        "attributes": {},
+        "user": {"userId": "warmup"},
+    },
+    "context": {"System": {"application": {"applicationId": "warmup"}, "user": {"userId": "warmup"}}},
+    "request": {
+        "type": "IntentRequest",
+        "requestId": "warmup",
+        "timestamp": "2024-01-01T00:00:00Z",
+        "locale": "it-IT",
+        "intent": {"name": "RetrieveEvents", "confirmationStatus": "NONE", "slots": {
+            "date": {"name": "date", "value": "2024-03-15", "confirmationStatus": "NONE"},
+        }},
+    },
+}
+
+
+def is_warmup_event(event: Any) -> bool:
+    """Whether a Lambda event is a warm-up ping: a custom one, or an EventBridge schedule."""
+    if not isinstance(event, dict) or "request" in event:
+        return False
+    return bool(event.get(WARMUP_KEY)) or event.get("source") == "aws.events"
+
+
+def import_skill_modules() -> None:
+    """Import every handler module and the models the serializer loads lazily."""
+    from ask_sdk_core.serialize import DefaultSerializer
+    from ask_sdk_model import RequestEnvelope, ResponseEnvelope
+
+    import handlers
+
+    for module in pkgutil.iter_modules(handlers.__path__):
+        importlib.import_module(f"handlers.{module.name}")
+    serializer = DefaultSerializer()
+    serializer.deserialize(json.dumps(_SAMPLE_ENVELOPE), RequestEnvelope)
+    serializer.serialize(ResponseEnvelope(version="1.0"))
+
+
+class Warmer:
+    """
+    Counts the container's invocations and answers warm-up pings.
+
+    ``steps`` are named preloads run on each ping (not only the first: idle
+    connections get closed); a ping lists the steps it wants under "preload",
+    else those of $KAMAJI_WARMUP_PRELOAD (comma separated) or DEFAULT_PRELOAD.
+    """
+
+    def __init__(self, steps: Dict[str, Callable[[], Any]], clock: Callable[[], float] = time.monotonic) -> None:
+        self.steps = steps
+        self.clock = clock
+        self.started_at = clock()
+        self.invocations = 0
+        self._lock = threading.Lock()
+
+    def invoked(self) -> bool:
+        """Count an invocation; True for the container's first one, i.e. a cold start."""
+        with self._lock:
+            self.invocations += 1
+            return self.invocations == 1
+
+    def _preload_steps(self, event: Dict[str, Any]) -> Iterable[str]:
+        if PRELOAD_KEY in event:
+            return event[PRELOAD_KEY]
+        configured = os.environ.get("KAMAJI_WARMUP_PRELOAD")
+        if configured is not None:
+            return [step.strip() for step in configured.split(",") if step.strip()]
+        return DEFAULT_PRELOAD
+
+    def warm(self, event: Dict[str, Any], cold: Optional[bool] = None) -> Dict[str, Any]:
+        """Run the ping's preload steps and report on the container."""
+        cold = self.invocations <= 1 if cold is None else cold
+        preloaded: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        for name in self._preload_steps(event):
+            step = self.steps.get(name)
+            if step is None:
+                # e.g. "dynamodb" with local persistence
+                continue
+            start = self.clock()
+            try:
+                step()
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+                errors[name] = str(e)
+            preloaded[name] = round(self.clock() - start, 4)
+
+        report = {
+            WARMUP_KEY: True,
+            "cold": cold,
+            "invocations": self.invocations,
+            "uptime": round(self.clock() - self.started_at, 3),
+            "preloaded": preloaded,
+        }
+        if errors:
+            report["errors"] = errors
+        logger.info(f"Warm-up ping: {json.dumps(report)}")
+        return report
@@ -4,10 +4,38 @@ import pytest
 from unittest.mock import patch, MagicMock
 
 from handlers.base import BaseHandler
+from handlers.idempotency import ReplayedRequestHandler
 from handlers.launch import LaunchRequestHandler
-from handlers.events import AddEventRequestHandler, AddEventTypeHandler
+from handlers.events import (
+    AddEventRequestHandler,
+    AddRecurringEventHandler,
+    AddEventTypeHandler,
+    ConfirmDeleteHandler,
+    NextEventHandler,
+    PreviousEventHandler,
+    RetrieveByCategoryHandler,
+    RetrieveEventHandler,
+    UndoLastChangeHandler,
+)
 from handlers.amazon_intents import HelpIntentHandler, CancelOrStopIntentHandler
-from exceptions.handlers import CatchAllExceptionHandler
+from handlers.static import StaticResponses
+from exceptions.handlers import CatchAllExceptionHandler, DeadlineExceededHandler
+from interceptors.idempotency import ResponseCacheInterceptor
+from interceptors.profiling import (
+    PROFILING_SESSION_ATTR,
+    ProfilingRequestInterceptor,
+    ProfilingResponseInterceptor,
+    ProfilingSettings,
+)
+from persistence import (
+    DAY_READER_ATTR,
+    HOUSEHOLD_VIEW_ATTR,
+    ITEM_LOADED_ATTR,
+    DayReader,
+    DeadlineExceededError,
+    ResponseCache,
+    project_day,
+)
 from constants import session_keys
 import prompts
 
@@ -110,6 +138,38 @@ class TestLaunchRequestHandler:
         assert "Ciao" in call_args
 
 
+class TestStaticResponses:
+    """Tests for the prebuilt responses of locale-only handlers."""
+
+    def test_returns_the_same_prebuilt_response(self, mock_handler_input):
+        """Handlers should return the response built once for the locale."""
+        strings_for = MagicMock(return_value={"HELP_MESSAGE": "Aiuto", "HELP_REPROMPT": "Allora?", "SKILL_NAME": "Kamaji"})
+        responses = StaticResponses(strings_for)
+        handler = HelpIntentHandler(responses)
+        responses.preload([handler], ["it-IT"])
+
+        first = handler.handle(mock_handler_input(intent_name="AMAZON.HelpIntent"))
+        second = handler.handle(mock_handler_input(intent_name="AMAZON.HelpIntent"))
+
+        assert first is second
+        strings_for.assert_called_once_with("it-IT")
+        assert first.output_speech.ssml == "<speak>Aiuto</speak>"
+        assert first.reprompt.output_speech.ssml == "<speak>Allora?</speak>"
+        assert first.card.title == "Kamaji"
+
+    def test_locales_are_built_separately_and_on_demand(self, mock_handler_input):
+        """Each locale should get its own response, built when first asked for."""
+        responses = StaticResponses(lambda locale: {"STOP_MESSAGE": "A presto!" if locale == "it-IT" else "Bye!"})
+        handler = CancelOrStopIntentHandler(responses)
+
+        italian = handler.handle(mock_handler_input(locale="it-IT"))
+        english = handler.handle(mock_handler_input(locale="en-US"))
+
+        assert italian.output_speech.ssml == "<speak>A presto!</speak>"
+        assert english.output_speech.ssml == "<speak>Bye!</speak>"
+        assert italian.reprompt is None
+
+
 class TestAddEventRequestHandler:
     """Tests for AddEventRequestHandler."""
 
@@ -178,6 +238,387 @@ class TestAddEventTypeHandler:
         handler_input.response_builder.speak.assert_called_once()
 
 
+class TestUndoLastChangeHandler:
+    """Tests for UndoLastChangeHandler."""
+
+    def test_reports_nothing_to_undo(self, mock_handler_input):
+        """Without journal entries nothing should be saved."""
+        handler_input = mock_handler_input(intent_name="UndoLastChange", persistent_attributes={})
+        UndoLastChangeHandler().handle(handler_input)
+
+        handler_input.attributes_manager.save_persistent_attributes.assert_not_called()
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech.startswith("NOTHING_TO_UNDO")
+
+    def test_restores_deleted_event(self, mock_handler_input):
+        """Undoing a delete should put the event back and save."""
+        journal = [{"op": "delete", "day": "3-15", "year": "2024", "index": 0, "text": "gita", "seq": 0}]
+        persistent_attributes = {"_journal": journal}
+        handler_input = mock_handler_input(
+            intent_name="UndoLastChange", persistent_attributes=persistent_attributes
+        )
+        UndoLastChangeHandler().handle(handler_input)
+
+        assert persistent_attributes["3-15"] == {"2024": ["gita"]}
+        assert persistent_attributes["_pending"][0]["undoes"] == 0
+        handler_input.attributes_manager.save_persistent_attributes.assert_called_once()
+
+
+class TestArchivedYears:
+    """Tests for handlers reaching years moved to the archive."""
+
+    def _archived_input(self, mock_handler_input, **kwargs):
+        persistent_attributes = {"3-15": {"2024": ["compleanno"]}, "_archive": {"3-15": ["2010"]}}
+        handler_input = mock_handler_input(persistent_attributes=persistent_attributes, **kwargs)
+        adapter = MagicMock(
+            get_day_attributes=lambda envelope, day: project_day(persistent_attributes, day),
+            get_archived_days=lambda envelope: {"3-15": {"2010": ["gita", "pranzo"]}},
+        )
+        handler_input.attributes_manager.request_attributes[DAY_READER_ATTR] = DayReader(
+            adapter, handler_input.request_envelope
+        )
+
+        def save():
+            # What ArchivingPersistenceAdapter does with the archive on save
+            if persistent_attributes.pop("_hydrate", None) is not None:
+                persistent_attributes.pop("_archive")
+                persistent_attributes["3-15"]["2010"] = ["gita", "pranzo"]
+
+        handler_input.attributes_manager.save_persistent_attributes.side_effect = save
+        return handler_input
+
+    def test_retrieve_mentions_archived_years(self, mock_handler_input):
+        """Plain retrieval should only read recent years and say more exist."""
+        handler_input = self._archived_input(mock_handler_input, intent_name="RetrieveEvents")
+        with patch('handlers.events.get_slot_value', return_value="2024-03-15"), \
+                patch('handlers.events.is_intent_name', return_value=lambda h: False):
+            RetrieveEventHandler().handle(handler_input)
+
+        handler_input.attributes_manager.save_persistent_attributes.assert_not_called()
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech.startswith("Nel 2024 compleanno.")
+        assert speech.endswith("OLDER_EVENTS_AVAILABLE")
+
+    def test_full_history_includes_archived_years(self, mock_handler_input):
+        """Asking for the full history should read the archived years, without saving anything."""
+        handler_input = self._archived_input(mock_handler_input, intent_name="RetrieveFullHistory")
+        with patch('handlers.events.get_slot_value', return_value="2024-03-15"), \
+                patch('handlers.events.is_intent_name', return_value=lambda h: True):
+            RetrieveEventHandler().handle(handler_input)
+
+        handler_input.attributes_manager.save_persistent_attributes.assert_not_called()
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "Nel 2010 gita; pranzo. Nel 2024 compleanno."
+
+    def test_next_continues_into_archived_years(self, mock_handler_input):
+        """Walking past the last recent year should continue with the archived ones."""
+        handler_input = self._archived_input(
+            mock_handler_input, intent_name="NextEvent",
+            session_attributes={session_keys.EVENT_DAY: "3-15", session_keys.CURR_YEAR_IDX: 0,
+                                session_keys.CURR_EVENT_IDX: 0},
+        )
+        NextEventHandler().handle(handler_input)
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "OLDER_EVENTS_INTRO Nel 2010 gita; cosa vuoi fare?"
+        session_attributes = handler_input.attributes_manager.session_attributes
+        assert session_attributes[session_keys.CURR_YEAR_IDX] == 0
+        assert session_attributes[session_keys.INCLUDE_ARCHIVED]
+        handler_input.attributes_manager.save_persistent_attributes.assert_not_called()
+
+        spoken = ["Nel 2024 compleanno; cosa vuoi fare?", "Nel 2010 gita; cosa vuoi fare?"]
+        while True:
+            NextEventHandler().handle(handler_input)
+            speech = handler_input.response_builder.speak.call_args[0][0]
+            if not speech.startswith("Nel "):
+                break
+            assert speech not in spoken
+            spoken.append(speech)
+        assert spoken[2:] == ["Nel 2010 pranzo; cosa vuoi fare?"]
+        assert speech == "Non ho trovato altri eventi!"
+
+    def test_previous_steps_into_archived_years(self, mock_handler_input):
+        """Walking back from the first recent year should continue with the last archived event."""
+        handler_input = self._archived_input(
+            mock_handler_input, intent_name="PreviousEvent",
+            session_attributes={session_keys.EVENT_DAY: "3-15", session_keys.CURR_YEAR_IDX: 0,
+                                session_keys.CURR_EVENT_IDX: 0},
+        )
+        PreviousEventHandler().handle(handler_input)
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "Nel 2010 pranzo; cosa vuoi fare?"
+        handler_input.attributes_manager.save_persistent_attributes.assert_not_called()
+
+    def test_deleting_an_archived_event_brings_its_day_back(self, mock_handler_input):
+        """Only an edit should move archived years back into the item."""
+        handler_input = self._archived_input(
+            mock_handler_input, intent_name="AMAZON.YesIntent",
+            session_attributes={session_keys.EVENT_DAY: "3-15", session_keys.CURR_YEAR_IDX: 0,
+                                session_keys.CURR_EVENT_IDX: 1, session_keys.INCLUDE_ARCHIVED: True,
+                                session_keys.PENDING_DELETE: True},
+        )
+        ConfirmDeleteHandler().handle(handler_input)
+
+        persistent_attributes = handler_input.attributes_manager.persistent_attributes
+        assert persistent_attributes["3-15"] == {"2010": ["gita"], "2024": ["compleanno"]}
+        assert "_archive" not in persistent_attributes
+
+
+class TestHouseholdRetrieval:
+    """Tests for retrieving the events of every household member."""
+
+    def test_tutti_reads_the_household_view(self, mock_handler_input):
+        """Asking for "tutti" should tell the merged day, without archive hints."""
+        handler_input = mock_handler_input(
+            intent_name="RetrieveEvents", persistent_attributes={"_archive": {"3-15": ["2010"]}}
+        )
+        handler_input.attributes_manager.request_attributes[HOUSEHOLD_VIEW_ATTR] = lambda day: {
+            "3-15": {"2023": ["gita"], "2024": ["partita"]},
+        }
+        slot_values = {"date": "2024-03-15", "household": "tutta la famiglia"}
+        with patch('handlers.events.get_slot_value', side_effect=lambda handler_input, slot_name: slot_values[slot_name]), \
+                patch('handlers.events.is_intent_name', return_value=lambda h: False):
+            RetrieveEventHandler().handle(handler_input)
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "Nel 2023 gita. Nel 2024 partita."
+
+
+class TestRetrieveByCategory:
+    """Tests for retrieving the events of a category through its index."""
+
+    PERSISTENT_ATTRIBUTES = {
+        "3-15": {"2022": ["compleanno di Luca", "gita al lago"]},
+        "8-10": {"2022": ["partenza per la Grecia"], "2023": ["crociera"]},
+        "_tags": {"viaggi": ["3-15/2022/1", "8-10/2022/0/v", "8-10/2023/0"], "compleanni": ["3-15/2022/0"]},
+    }
+
+    def _speech(self, mock_handler_input, slot_values):
+        handler_input = mock_handler_input(
+            intent_name="RetrieveByCategory", persistent_attributes=self.PERSISTENT_ATTRIBUTES
+        )
+        handler_input.attributes_manager.request_attributes[HOUSEHOLD_VIEW_ATTR] = MagicMock(
+            events_by_tag=lambda tag, year: [("3-15", "2022", "gita al lago"), ("6-2", "2022", "volo per Parigi")]
+        )
+        with patch('handlers.events.get_slot_value', side_effect=lambda handler_input, slot_name: slot_values.get(slot_name)):
+            RetrieveByCategoryHandler().handle(handler_input)
+        return handler_input.response_builder.speak.call_args[0][0]
+
+    def test_tells_a_year_of_the_category(self, mock_handler_input):
+        """Only the indexed events of the asked year should be told, by date."""
+        speech = self._speech(mock_handler_input, {"category": "viaggio", "year": "2022"})
+        assert speech == "CATEGORY_EVENTS Nel 2022 il 15 March gita al lago; il 10 August partenza per la Grecia."
+
+    def test_tutti_reads_the_household_view(self, mock_handler_input):
+        """Asking for "tutti" should tell every household member's events of the category."""
+        speech = self._speech(mock_handler_input, {"category": "viaggi", "year": "2022", "household": "tutti"})
+        assert speech == "CATEGORY_EVENTS Nel 2022 il 15 March gita al lago; il 02 June volo per Parigi."
+
+    def test_nothing_found(self, mock_handler_input):
+        """A category without events in the year should say so."""
+        speech = self._speech(mock_handler_input, {"category": "compleanni", "year": "2023"})
+        assert speech == "NO_CATEGORY_EVENTS_IN_YEAR"
+
+
+class TestRecurringEvents:
+    """Tests for handlers presenting events repeated every year."""
+
+    PERSISTENT_ATTRIBUTES = {
+        "3-15": {"2024": ["gita"]},
+        "_recurring": {"3-15": [{"text": "compleanno di Luca", "start": 1990}]},
+    }
+
+    def test_retrieve_tells_recurring_events_once(self, mock_handler_input):
+        """Recurring events should be told once, before the single years."""
+        handler_input = mock_handler_input(
+            intent_name="RetrieveEvents", persistent_attributes=self.PERSISTENT_ATTRIBUTES
+        )
+        with patch('handlers.events.get_slot_value', return_value="2024-03-15"), \
+                patch('handlers.events.is_intent_name', return_value=lambda h: False):
+            RetrieveEventHandler().handle(handler_input)
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "RECURRING_EVENTS Nel 2024 gita."
+
+    def test_next_reaches_recurring_events_last(self, mock_handler_input):
+        """Navigation should present recurring events after the last year."""
+        handler_input = mock_handler_input(
+            intent_name="NextEvent",
+            persistent_attributes=self.PERSISTENT_ATTRIBUTES,
+            session_attributes={session_keys.EVENT_DAY: "3-15", session_keys.CURR_YEAR_IDX: 0,
+                                session_keys.CURR_EVENT_IDX: 0},
+        )
+        NextEventHandler().handle(handler_input)
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert speech == "RECURRING_EVENT_PROMPT"
+        assert handler_input.attributes_manager.session_attributes[session_keys.CURR_YEAR_IDX] == 1
+
+    def test_add_recurring_event(self, mock_handler_input):
+        """Years given in the request should bound the recurring event."""
+        handler_input = mock_handler_input(intent_name="AddRecurringEvent")
+        slot_values = {"date": "2025-03-15", "event": "compleanno di Luca", "startYear": "1990", "endYear": None}
+        with patch('handlers.events.get_slot_value', side_effect=lambda handler_input, slot_name: slot_values[slot_name]):
+            AddRecurringEventHandler().handle(handler_input)
+
+        persistent_attributes = handler_input.attributes_manager.persistent_attributes
+        assert persistent_attributes["_recurring"] == {"3-15": [{"text": "compleanno di Luca", "start": 1990}]}
+        handler_input.attributes_manager.save_persistent_attributes.assert_called_once()
+
+
+class TestReplayedRequestHandler:
+    """Tests for answering retried requests from the response cache."""
+
+    def test_replays_cached_response_and_session(self, mock_handler_input):
+        """A retry should get the first response back, persistence untouched."""
+        cache = ResponseCache()
+        first = mock_handler_input(session_attributes={session_keys.EVENT_DAY: "3-15"})
+        response = MagicMock()
+        ResponseCacheInterceptor(cache).process(first, response)
+
+        retry = mock_handler_input()
+        handler = ReplayedRequestHandler(cache)
+        assert handler.can_handle(retry)
+        assert handler.handle(retry) is response
+        assert retry.attributes_manager.session_attributes == {session_keys.EVENT_DAY: "3-15"}
+        retry.attributes_manager.save_persistent_attributes.assert_not_called()
+
+    def test_ignores_unknown_requests(self, mock_handler_input):
+        """Requests never answered here should go to the other handlers."""
+        handler_input = mock_handler_input()
+        ResponseCacheInterceptor(ResponseCache()).process(handler_input, None)
+
+        assert not ReplayedRequestHandler(ResponseCache()).can_handle(handler_input)
+
+
+class TestProfilingInterceptors:
+    """Tests for opt-in request profiling."""
+
+    def test_settings_from_env(self):
+        """Profiling should be off unless asked for, and pick allowlisted users."""
+        assert not ProfilingSettings.from_env({}).enabled
+        settings = ProfilingSettings.from_env({"KAMAJI_PROFILE_USER_IDS": "alice, bob", "KAMAJI_PROFILE_MEMORY": "1"})
+        assert settings.enabled and settings.memory
+        assert settings.selects("bob")
+        assert not settings.selects("carol")
+
+    def test_profiles_are_written_and_logged(self, mock_handler_input, tmp_path, caplog):
+        """A selected request should leave a pstats file, a tracemalloc snapshot and a summary."""
+        import logging
+        import pstats
+
+        settings = ProfilingSettings(always=True, memory=True, top=5, directory=str(tmp_path))
+        handler_input = mock_handler_input(persistent_attributes={"3-15": {"2024": ["gita"]}})
+        handler_input.attributes_manager.request_attributes[ITEM_LOADED_ATTR] = True
+        ProfilingRequestInterceptor(settings).process(handler_input)
+        sorted(range(1000), key=str)
+        with caplog.at_level(logging.INFO, logger="interceptors.profiling"):
+            ProfilingResponseInterceptor(settings).process(handler_input, MagicMock())
+
+        assert PROFILING_SESSION_ATTR not in handler_input.attributes_manager.request_attributes
+        assert pstats.Stats(str(tmp_path / "test-request-id.pstats")).total_calls > 0
+        assert (tmp_path / "test-request-id.tracemalloc").exists()
+        assert "Persistent item of test-request-id: 20 bytes" in caplog.text
+
+    def test_unselected_and_failed_requests_leave_nothing(self, mock_handler_input, tmp_path):
+        """Profiles of requests that raised should be dropped by the next request."""
+        settings = ProfilingSettings(always=True, directory=str(tmp_path))
+        ProfilingRequestInterceptor(settings).process(mock_handler_input())
+
+        unselected = ProfilingSettings(user_ids=frozenset({"someone else"}), directory=str(tmp_path))
+        handler_input = mock_handler_input()
+        ProfilingRequestInterceptor(unselected).process(handler_input)
+        ProfilingResponseInterceptor(unselected).process(handler_input, MagicMock())
+        assert not list(tmp_path.iterdir())
+
+
+def _launch_envelope(request_id: str) -> dict:
+    return {
+        "version": "1.0",
+        "session": {"new": True, "sessionId": "session", "application": {"applicationId": "skill"},
+                    "user": {"userId": "amzn1.ask.account.TEST"}},
+        "context": {"System": {"application": {"applicationId": "skill"}, "user": {"userId": "amzn1.ask.account.TEST"}}},
+        "request": {"type": "LaunchRequest", "requestId": request_id, "timestamp": "2024-01-01T00:00:00Z", "locale": "it-IT"},
+    }
+
+
+class TestLocalServer:
+    """Tests for the local HTTP endpoint of the skill."""
+
+    def test_serves_envelopes_on_kept_alive_connections(self, tmp_path, monkeypatch):
+        """The real skill should answer over one connection, and /metrics count each request."""
+        import http.client
+        import importlib
+        import json
+        import threading
+
+        from local_server import SkillServer
+
+        monkeypatch.setenv("KAMAJI_LOCAL_PERSISTENCE_PATH", str(tmp_path))
+        lambda_function = importlib.import_module("lambda_function")
+        server = SkillServer(("127.0.0.1", 0), lambda_function.lambda_handler, threads=2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+            for i in range(2):
+                connection.request("POST", "/", body=json.dumps(_launch_envelope(f"request-{i}")))
+                response = connection.getresponse()
+                assert response.status == 200
+                assert json.loads(response.read())["response"]["outputSpeech"]["type"] == "SSML"
+
+            connection.request("POST", "/", body="not json")
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 400
+            connection.request("GET", "/metrics")
+            metrics = connection.getresponse().read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'kamaji_request_duration_seconds_count{intent="LaunchRequest"' in metrics
+        assert any(line.startswith("kamaji_request_duration_seconds_count") and line.endswith(" 2")
+                   for line in metrics.splitlines())
+        assert 'kamaji_request_errors_total{intent="invalid"' in metrics
+
+
+class TestWarmup:
+    """Tests for warm-up pings."""
+
+    def test_recognizes_pings_not_alexa_requests(self):
+        """Custom and scheduled pings are warm-ups, envelopes never."""
+        from warmup import is_warmup_event
+
+        assert is_warmup_event({"warmup": True})
+        assert is_warmup_event({"source": "aws.events", "detail-type": "Scheduled Event"})
+        assert not is_warmup_event(_launch_envelope("request"))
+        assert not is_warmup_event({})
+
+    def test_reports_cold_starts_and_runs_steps(self):
+        """Only the first invocation is cold; failing steps are reported, not raised."""
+        from warmup import Warmer
+
+        calls = []
+        warmer = Warmer({"locales": lambda: calls.append("locales"), "dynamodb": lambda: 1 / 0})
+        report = warmer.warm({"warmup": True, "preload": ["locales", "dynamodb", "unknown"]}, warmer.invoked())
+        assert report["cold"] and calls == ["locales"]
+        assert set(report["preloaded"]) == {"locales", "dynamodb"}
+        assert "division by zero" in report["errors"]["dynamodb"]
+        assert not warmer.warm({"warmup": True, "preload": []}, warmer.invoked())["cold"]
+
+    def test_lambda_handler_answers_pings_before_the_skill(self, tmp_path, monkeypatch):
+        """A ping should get the warm-up report, with no skill invocation."""
+        import importlib
+
+        monkeypatch.setenv("KAMAJI_LOCAL_PERSISTENCE_PATH", str(tmp_path))
+        lambda_function = importlib.import_module("lambda_function")
+        with patch.object(lambda_function, "skill_handler") as skill_handler:
+            report = lambda_function.lambda_handler({"warmup": True}, None)
+        skill_handler.assert_not_called()
+        assert report["warmup"] and set(report["preloaded"]) == {"locales", "handlers"}
+
+
 class TestCatchAllExceptionHandler:
     """Tests for CatchAllExceptionHandler."""
 
@@ -210,3 +651,25 @@ class TestCatchAllExceptionHandler:
         handler.handle(handler_input, Exception("test"))
 
         handler_input.response_builder.speak.assert_called_once()
+
+
+class TestDeadlineExceededHandler:
+    """Tests for DeadlineExceededHandler."""
+
+    def test_only_handles_deadline_errors(self, mock_handler_input):
+        """Other exceptions should reach the catch-all handler."""
+        handler_input = mock_handler_input()
+        handler = DeadlineExceededHandler()
+
+        assert handler.can_handle(handler_input, DeadlineExceededError("slow"))
+        assert not handler.can_handle(handler_input, RuntimeError("test"))
+
+    def test_asks_to_try_again_shortly(self, mock_handler_input):
+        """The user should hear a retry hint, even without localization."""
+        handler_input = mock_handler_input()
+        handler_input.attributes_manager.request_attributes = {}
+
+        DeadlineExceededHandler().handle(handler_input, DeadlineExceededError("slow"))
+
+        speech = handler_input.response_builder.speak.call_args[0][0]
+        assert "riprova tra poco" in speech.lower()
@@ -0,0 +1,711 @@
+"""Tests for the kamaji heatmap CLI."""
+
+import csv
+import json
+import time
+from datetime import date
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from kamaji.activities import ActivityArrays, month_day_counts, parse_activities, read_activities, read_export
+from kamaji.analytics import compute_calendar_analytics
+from kamaji.archiver import archive_table
+from kamaji.batch import plan_jobs
+from kamaji.capacity import measure_capacity
+from kamaji.dynamo import CapacityLimiter, dynamodb_client, scan_activities
+from kamaji.exporter import export_table, flatten_events
+from kamaji.importer import (
+    ImportEntry,
+    group_by_user,
+    import_entries,
+    import_user,
+    merge_entries,
+    read_entries,
+    to_item,
+)
+from kamaji.kamaji import activities_calendar, activities_heat_map, activities_heat_map_batch, capacity_report
+from kamaji.migrator import CURRENT_SCHEMA_VERSION, SCHEMA_VERSION_KEY, migrate_table, rebuild_tag_indexes
+from kamaji.rendering import HeatmapRenderer
+from kamaji.synthetic import GeneratorConfig, generate_user, to_typed, write_dataset
+from persistence.codec import deserialize_map
+from persistence.faults import item_size
+from persistence.tags import events_by_tag
+
+EXPORTED_ATTRIBUTES = {
+    "3-15": {"M": {
+        "2022": {"L": [{"S": "compleanno di Luca"}]},
+        "2023": {"L": [{"S": "compleanno di Luca"}, {"S": "gita al lago"}]},
+    }},
+    "8-20": {"M": {"2021": {"L": [{"S": "siamo andati al mare"}]}}},
+}
+
+
+@pytest.fixture
+def export_file(tmp_path):
+    """CSV export with a single user item, as downloaded from the console."""
+    path = tmp_path / "backup.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["id", "attributes"])
+        writer.writerow(["amzn1.ask.account.TEST", json.dumps(EXPORTED_ATTRIBUTES)])
+    return path
+
+
+class TestHeatmapRenderer:
+    """Tests for HeatmapRenderer."""
+
+    @pytest.mark.parametrize("mode,fmt", [
+        ("annotated", "png"),
+        ("fast", "png"),
+        ("fast", "svg"),
+        ("raw", "png"),
+    ])
+    def test_renders_each_mode(self, tmp_path, mode, fmt):
+        """Should write a non-empty file for every mode."""
+        output = tmp_path / f"heatmap.{fmt}"
+        HeatmapRenderer().render(np.ones((31, 12)), output, fmt=fmt, dpi=50, mode=mode)
+        assert output.stat().st_size > 0
+
+    def test_reuses_figure_without_leaking_axes(self, tmp_path):
+        """Consecutive renders should not accumulate axes on the figure."""
+        renderer = HeatmapRenderer()
+        for _ in range(3):
+            renderer.render(np.ones((31, 12)), tmp_path / "h.png", dpi=50, mode="annotated")
+        # heatmap axes + colorbar axes
+        assert len(renderer.figure.axes) == 2
+
+    def test_raw_mode_rejects_svg(self, tmp_path):
+        """Raw mode should refuse non-PNG formats."""
+        with pytest.raises(ValueError):
+            HeatmapRenderer().render(np.ones((31, 12)), tmp_path / "h.svg", fmt="svg", mode="raw")
+
+
+class TestActivitiesHeatMap:
+    """Tests for the heatmap command."""
+
+    def test_writes_svg(self, export_file, tmp_path):
+        """Should render the exported activities to the requested format."""
+        output = tmp_path / "heatmap.svg"
+        result = CliRunner().invoke(activities_heat_map, [
+            "--activities-file-path", str(export_file),
+            "--output-file-path", str(output),
+            "--format", "svg", "--mode", "fast",
+        ])
+        assert result.exit_code == 0, result.output
+        assert output.read_text().lstrip().startswith("<?xml")
+
+    def test_recurring_events_count_in_every_year(self):
+        """Recurring events should be expanded over their years, open ends up to the current year."""
+        attributes = to_typed({"3-15": {"2020": ["gita"]}})
+        attributes["_recurring"] = {"M": {
+            "8-20": {"L": [{"M": {"text": {"S": "festa"}}}]},
+            "12-25": {"L": [{"M": {"text": {"S": "natale"}, "start": {"N": "2021"}, "end": {"N": "2022"}}}]},
+        }}
+        arrays = parse_activities([("u", attributes)], current_year=2023)
+
+        cells = sorted(zip(arrays.year.tolist(), arrays.month.tolist(), arrays.day.tolist()))
+        assert cells == [
+            (2020, 3, 15), (2020, 8, 20), (2021, 8, 20), (2021, 12, 25),
+            (2022, 8, 20), (2022, 12, 25), (2023, 8, 20),
+        ]
+
+
+class TestBatch:
+    """Tests for the batch command."""
+
+    def test_renders_one_file_per_user_and_year(self, export_file, tmp_path):
+        """Should render a heatmap per (user, year) and list them in the manifest."""
+        template = str(tmp_path / "out" / "{user}" / "{year}.png")
+        result = CliRunner().invoke(activities_heat_map_batch, [
+            "--activities-file-path", str(export_file),
+            "--output-template", template,
+            "--mode", "raw", "--workers", "2",
+        ])
+        assert result.exit_code == 0, result.output
+
+        manifest = json.loads((tmp_path / "out" / "manifest.json").read_text())
+        assert {(e["year"], e["events"]) for e in manifest} == {(2021, 1), (2022, 1), (2023, 2)}
+        for entry in manifest:
+            assert Path(entry["path"]).exists()
+
+    def test_aggregates_missing_placeholders(self, export_file, tmp_path):
+        """A template without {year} should render the whole history per user."""
+        parsed = parse_activities(read_export(export_file))
+        planned = list(plan_jobs(parsed, str(tmp_path / "{user}.png"), None, 50, "raw"))
+        assert len(planned) == 1
+        assert planned[0][1].events == 4
+
+    def test_merges_users_per_year(self, tmp_path):
+        """A template without {user} should sum every user's cells into one grid per year."""
+        arrays = ActivityArrays(
+            users=["a", "b"], user=np.array([0, 1, 1], dtype=np.int32), year=np.array([2023, 2023, 2024], dtype=np.int32),
+            month=np.array([3, 3, 8], dtype=np.int8), day=np.array([15, 15, 20], dtype=np.int8), count=np.array([1, 2, 5]),
+        )
+        planned = list(plan_jobs(arrays, str(tmp_path / "{year}.png"), None, 50, "raw"))
+        assert [(entry.user, entry.year, entry.events) for _, entry in planned] == [(None, 2023, 3), (None, 2024, 5)]
+        assert planned[0][0].counts[14, 2] == 3
+
+    def test_rejects_unknown_placeholders(self, export_file, tmp_path):
+        """Should fail on template fields other than user and year."""
+        result = CliRunner().invoke(activities_heat_map_batch, [
+            "--activities-file-path", str(export_file),
+            "--output-template", str(tmp_path / "{month}.png"),
+        ])
+        assert result.exit_code != 0
+
+
+def _arrays(cells):
+    """Build ActivityArrays from (year, month, day, count) tuples of a single user."""
+    year, month, day, count = (np.array(c) for c in zip(*cells))
+    return ActivityArrays(
+        users=["u"], user=np.zeros(len(cells), dtype=np.int32),
+        year=year, month=month, day=day, count=count,
+    )
+
+
+class TestCalendarAnalytics:
+    """Tests for compute_calendar_analytics."""
+
+    def test_flags_impossible_dates(self):
+        """2-29 is only valid in leap years and 2-30 never is."""
+        analytics = compute_calendar_analytics(_arrays([
+            (2024, 2, 29, 1), (2023, 2, 29, 2), (2024, 2, 30, 3),
+        ]))
+        assert analytics.total_events == 1
+        assert analytics.invalid_events == 5
+
+    def test_weekdays_and_weeks(self):
+        """2024-01-01 is a Monday in the first column of the calendar."""
+        analytics = compute_calendar_analytics(_arrays([(2024, 1, 1, 2), (2024, 1, 7, 1)]))
+        assert analytics.weekday_counts.tolist() == [2, 0, 0, 0, 0, 0, 1]
+        grid = analytics.calendars[2024]
+        assert grid[0, 0] == 2
+        assert grid[6, 0] == 1
+
+    def test_streaks_busiest_dates_and_yearly_deltas(self):
+        """Streaks span year boundaries and deltas compare consecutive years."""
+        analytics = compute_calendar_analytics(_arrays([
+            (2022, 12, 31, 1), (2023, 1, 1, 4), (2023, 1, 2, 1), (2023, 3, 1, 1),
+        ]), top=2)
+        assert analytics.longest_streak.length == 3
+        assert analytics.longest_streak.start == "2022-12-31"
+        assert analytics.busiest_dates[0] == ("2023-01-01", 4)
+        assert analytics.yearly[1] == {"year": 2023, "events": 6, "delta": 5, "delta_pct": 500.0}
+
+    def test_calendar_command_writes_csv_tables(self, export_file, tmp_path):
+        """Should write the CSV tables and one calendar plot per year."""
+        result = CliRunner().invoke(activities_calendar, [
+            "--activities-file-path", str(export_file),
+            "--output-dir", str(tmp_path / "stats"),
+            "--table-format", "csv", "--plot", "--dpi", "50",
+        ])
+        assert result.exit_code == 0, result.output
+        assert (tmp_path / "stats" / "weekdays.csv").exists()
+        assert (tmp_path / "stats" / "calendar_2023.png").exists()
+
+
+@pytest.fixture
+def dynamodb_table(monkeypatch):
+    """Moto-backed persistence table with a few users, as the skill stores them."""
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = dynamodb_client("eu-west-1")
+        client.create_table(
+            TableName="kamaji-test",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for i in range(7):
+            client.put_item(TableName="kamaji-test", Item={
+                "id": {"S": f"amzn1.ask.account.{i}"},
+                "attributes": {"M": EXPORTED_ATTRIBUTES},
+            })
+        yield client
+
+
+def _put_journal(client, user: str) -> None:
+    """A journal whose first entry is already folded into the user's item, as after a compaction."""
+    client.update_item(
+        TableName="kamaji-test",
+        Key={"id": {"S": user}},
+        UpdateExpression="SET attributes.#s = :folded",
+        ExpressionAttributeNames={"#s": "_journal_seq"},
+        ExpressionAttributeValues={":folded": {"N": "4"}},
+    )
+    client.put_item(TableName="kamaji-test", Item={
+        "id": {"S": user + "#journal"},
+        "base": {"N": "3"},
+        "entries": {"L": [
+            {"M": {"op": {"S": "add"}, "day": {"S": "3-15"}, "year": {"S": "2023"}, "index": {"N": "0"},
+                   "text": {"S": "gita al lago"}}},
+            {"M": {"op": {"S": "add"}, "day": {"S": "3-15"}, "year": {"S": "2023"}, "index": {"N": "2"},
+                   "text": {"S": "cena con i nonni"}}},
+            {"M": {"op": {"S": "delete"}, "day": {"S": "8-20"}, "year": {"S": "2021"}, "index": {"N": "0"},
+                   "text": {"S": "siamo andati al mare"}}},
+        ]},
+    })
+
+
+class TestScan:
+    """Tests for the parallel DynamoDB reader."""
+
+    def test_reads_every_item_across_segments(self, dynamodb_table):
+        """All items should be read exactly once whatever the segment count."""
+        items = list(scan_activities("kamaji-test", client=dynamodb_table, segments=3, page_size=2))
+        assert sorted(user for user, _ in items) == [f"amzn1.ask.account.{i}" for i in range(7)]
+        assert items[0][1] == EXPORTED_ATTRIBUTES
+
+    def test_skips_journal_items(self, dynamodb_table):
+        """The skill's journal items should not be read as users."""
+        dynamodb_table.put_item(TableName="kamaji-test", Item={
+            "id": {"S": "amzn1.ask.account.0#journal"},
+            "base": {"N": "0"},
+            "entries": {"L": []},
+        })
+        users = [user for user, _ in scan_activities("kamaji-test", client=dynamodb_table)]
+        assert len(users) == 7
+
+    def test_replays_journal_entries(self, dynamodb_table):
+        """Changes still in a user's journal should be counted, those already folded only once."""
+        _put_journal(dynamodb_table, "amzn1.ask.account.0")
+        items = dict(scan_activities("kamaji-test", client=dynamodb_table, segments=3, page_size=2))
+        days = items["amzn1.ask.account.0"]
+        assert [event["S"] for event in days["3-15"]["M"]["2023"]["L"]] == [
+            "compleanno di Luca", "gita al lago", "cena con i nonni",
+        ]
+        assert "8-20" not in days
+        assert items["amzn1.ask.account.1"] == EXPORTED_ATTRIBUTES
+
+    def test_reads_everything_from_a_throttled_table(self, dynamodb_table, monkeypatch):
+        """Injected throttling should be retried by botocore, not lose pages."""
+        monkeypatch.setenv("KAMAJI_DYNAMODB_FAULTS", "throttle=0.3;seed=5;operations=Scan")
+        client = dynamodb_client("eu-west-1")
+        items = list(scan_activities("kamaji-test", client=client, segments=1, page_size=2))
+        assert len(items) == 7
+
+    def test_aggregates_like_the_csv_export(self, dynamodb_table):
+        """Scanned items should aggregate into the same grid as the export."""
+        arrays = parse_activities(scan_activities("kamaji-test", client=dynamodb_table, read_capacity=50))
+        counts = month_day_counts(arrays)
+        assert counts[14, 2] == 7 * 3
+        assert counts[19, 7] == 7
+
+    def test_rate_limiter_delays_when_in_debt(self):
+        """Consuming more than the budget should make the next wait block."""
+        limiter = CapacityLimiter(100)
+        limiter.consume(105)
+        start = time.monotonic()
+        limiter.wait()
+        assert time.monotonic() - start >= 0.04
+
+
+class TestExport:
+    """Tests for the streaming table export."""
+
+    def test_flattens_one_record_per_event(self):
+        """Every event should become a record with its date and list index."""
+        records = list(flatten_events("u", EXPORTED_ATTRIBUTES))
+        assert [(r.date, r.index, r.text) for r in records] == [
+            ("2022-03-15", 0, "compleanno di Luca"),
+            ("2023-03-15", 0, "compleanno di Luca"),
+            ("2023-03-15", 1, "gita al lago"),
+            ("2021-08-20", 0, "siamo andati al mare"),
+        ]
+
+    def test_exports_recurring_events(self, dynamodb_table, tmp_path):
+        """Recurring events should be exported once, marked recurring, and repeat yearly in calendars."""
+        dynamodb_table.put_item(TableName="kamaji-test", Item={
+            "id": {"S": "amzn1.ask.account.0"},
+            "attributes": {"M": {"_recurring": {"M": {
+                "2-29": {"L": [{"M": {"text": {"S": "compleanno di Anna"}}}]},
+                "12-8": {"L": [{"M": {"text": {"S": "festa del paese"}, "start": {"N": "2019"}, "end": {"N": "2024"}}}]},
+            }}}},
+        })
+        exported = {}
+        for export_format in ("ndjson", "csv", "ics"):
+            path = tmp_path / f"events.{export_format}"
+            assert export_table("kamaji-test", path, export_format, client=dynamodb_table) == (7, 26)
+            exported[export_format] = path.read_text()
+
+        records = [json.loads(line) for line in exported["ndjson"].splitlines()]
+        assert [record for record in records if record["year"] == "recurring"] == [
+            {"user": "amzn1.ask.account.0", "date": "--02-29", "year": "recurring", "index": 0, "text": "compleanno di Anna"},
+            {"user": "amzn1.ask.account.0", "date": "--12-08", "year": "recurring", "index": 0, "text": "festa del paese",
+             "start": 2019, "end": 2024},
+        ]
+        assert "amzn1.ask.account.0,--12-08,recurring,0,festa del paese,2019,2024\n" in exported["csv"]
+        assert "DTSTART;VALUE=DATE:20000229\nRRULE:FREQ=YEARLY\n" in exported["ics"]
+        assert "DTSTART;VALUE=DATE:20191208\nRRULE:FREQ=YEARLY;UNTIL=20241208\n" in exported["ics"]
+
+    @pytest.mark.parametrize("export_format", ["ndjson", "csv", "ics"])
+    def test_exports_every_event(self, dynamodb_table, tmp_path, export_format):
+        """All formats should hold one entry per event and clean up their parts."""
+        path = tmp_path / f"events.{export_format}"
+        assert export_table("kamaji-test", path, export_format, client=dynamodb_table, segments=3) == (7, 28)
+        content = path.read_text()
+        if export_format == "ndjson":
+            assert len(content.splitlines()) == 28
+            assert json.loads(content.splitlines()[0]).keys() == {"user", "date", "year", "index", "text"}
+        elif export_format == "csv":
+            assert len(content.splitlines()) == 29
+        else:
+            assert content.startswith("BEGIN:VCALENDAR") and content.count("BEGIN:VEVENT") == 28
+        assert not (tmp_path / f"events.{export_format}.parts").exists()
+
+    def test_exports_journal_entries(self, dynamodb_table, tmp_path):
+        """Changes not compacted yet should be exported, and journal items not as users."""
+        _put_journal(dynamodb_table, "amzn1.ask.account.0")
+        path = tmp_path / "events.ndjson"
+        assert export_table("kamaji-test", path, "ndjson", client=dynamodb_table, segments=3, page_size=2) == (7, 28)
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        texts = [record["text"] for record in records if record["user"] == "amzn1.ask.account.0"]
+        assert "cena con i nonni" in texts and "siamo andati al mare" not in texts
+
+    def test_resumes_after_interruption(self, dynamodb_table, tmp_path):
+        """A failed export should continue from its checkpoints without duplicates."""
+        calls = 0
+        scan = dynamodb_table.scan
+
+        def flaky_scan(**kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 4:
+                raise ConnectionError("connection reset")
+            return scan(**kwargs)
+
+        flaky = MagicMock(scan=flaky_scan, batch_get_item=dynamodb_table.batch_get_item)
+        path = tmp_path / "events.ndjson"
+        with pytest.raises(ConnectionError):
+            export_table("kamaji-test", path, "ndjson", client=flaky, segments=1, page_size=2)
+        assert (tmp_path / "events.ndjson.parts" / "segment-0000.json").exists()
+
+        assert export_table("kamaji-test", path, "ndjson", client=dynamodb_table, segments=1, page_size=2) == (7, 28)
+        users = [json.loads(line)["user"] for line in path.read_text().splitlines()]
+        assert sorted(set(users)) == [f"amzn1.ask.account.{i}" for i in range(7)]
+        assert len(users) == 28
+
+
+class TestMigrate:
+    """Tests for the offline schema migrator."""
+
+    def _versions(self, client):
+        return {
+            user: int(attributes.get(SCHEMA_VERSION_KEY, {"N": "0"})["N"])
+            for user, attributes in scan_activities("kamaji-test", client=client)
+        }
+
+    def test_migrates_every_item_once(self, dynamodb_table, tmp_path):
+        """All items should reach the current version; a second run finds nothing to do."""
+        progress = []
+        stats = migrate_table(
+            "kamaji-test", client=dynamodb_table, segments=2, page_size=2,
+            checkpoint_dir=tmp_path / "checkpoints", progress=progress.append,
+        )
+        assert (stats.scanned, stats.migrated, stats.errors) == (7, 7, 0)
+        assert progress[-1] == stats
+        assert set(self._versions(dynamodb_table).values()) == {CURRENT_SCHEMA_VERSION}
+        assert not (tmp_path / "checkpoints").exists()
+
+        again = migrate_table("kamaji-test", client=dynamodb_table, checkpoint_dir=tmp_path / "checkpoints")
+        assert (again.migrated, again.current) == (0, 7)
+
+    def test_reserved_keys_are_not_days(self, dynamodb_table, tmp_path):
+        """Migrated items should aggregate exactly as before."""
+        migrate_table("kamaji-test", client=dynamodb_table, checkpoint_dir=tmp_path / "checkpoints")
+        arrays = parse_activities(scan_activities("kamaji-test", client=dynamodb_table))
+        assert int(arrays.count.sum()) == 7 * 4
+
+    def test_concurrent_upgrade_is_not_overwritten(self, dynamodb_table, tmp_path):
+        """A write made by the skill between scan and update should win."""
+        update_item = dynamodb_table.update_item
+        raced = []
+
+        def racing_update_item(**kwargs):
+            if not raced:
+                user = kwargs["Key"]["id"]["S"]
+                raced.append(user)
+                dynamodb_table.put_item(TableName="kamaji-test", Item={
+                    "id": {"S": user},
+                    "attributes": {"M": {
+                        "1-1": {"M": {"2024": {"L": [{"S": "capodanno"}]}}},
+                        SCHEMA_VERSION_KEY: {"N": str(CURRENT_SCHEMA_VERSION)},
+                    }},
+                })
+            return update_item(**kwargs)
+
+        client = MagicMock(wraps=dynamodb_table, update_item=racing_update_item)
+        client.exceptions = dynamodb_table.exceptions
+        stats = migrate_table("kamaji-test", client=client, segments=1, checkpoint_dir=tmp_path / "checkpoints")
+        assert (stats.migrated, stats.conflicts, stats.current) == (6, 1, 1)
+
+        item = dynamodb_table.get_item(TableName="kamaji-test", Key={"id": {"S": raced[0]}})["Item"]
+        assert list(item["attributes"]["M"]) == ["1-1", SCHEMA_VERSION_KEY]
+
+    def test_rebuilds_stale_tag_indexes(self, dynamodb_table, tmp_path):
+        """Only items whose index no longer matches their events should be rewritten."""
+        migrate_table("kamaji-test", client=dynamodb_table, checkpoint_dir=tmp_path / "checkpoints")
+        dynamodb_table.put_item(TableName="kamaji-test", Item={
+            "id": {"S": "amzn1.ask.account.0"},
+            "attributes": {"M": {
+                **EXPORTED_ATTRIBUTES,
+                "_tags": {"M": {"sport": {"L": [{"S": "3-15/2022/0"}]}}},
+                SCHEMA_VERSION_KEY: {"N": str(CURRENT_SCHEMA_VERSION)},
+            }},
+        })
+
+        stats = rebuild_tag_indexes("kamaji-test", client=dynamodb_table, checkpoint_dir=tmp_path / "checkpoints")
+        assert (stats.migrated, stats.current) == (1, 6)
+        item = dynamodb_table.get_item(TableName="kamaji-test", Key={"id": {"S": "amzn1.ask.account.0"}})["Item"]
+        assert item["attributes"]["M"]["_tags"] == {"M": {
+            "compleanni": {"L": [{"S": "3-15/2022/0"}, {"S": "3-15/2023/0"}]},
+            "viaggi": {"L": [{"S": "3-15/2023/1"}, {"S": "8-20/2021/0"}]},
+        }}
+
+
+class TestArchive:
+    """Tests for the rollover of old years into archive items."""
+
+    def test_moves_old_years_out_of_user_items(self, dynamodb_table):
+        """Old years should leave the items but stay in the export; a second run finds nothing."""
+        stats = archive_table("kamaji-test", 2023, client=dynamodb_table, segments=2)
+        assert (stats.scanned, stats.archived_users, stats.archived_years, stats.errors) == (7, 7, 14, 0)
+
+        arrays = parse_activities(scan_activities("kamaji-test", client=dynamodb_table))
+        assert set(arrays.years.tolist()) == {2023}
+        item = dynamodb_table.get_item(TableName="kamaji-test", Key={"id": {"S": "amzn1.ask.account.0"}})["Item"]
+        assert item["attributes"]["M"]["_archive"]["M"]["8-20"]["L"] == [{"S": "2021"}]
+
+        again = archive_table("kamaji-test", 2023, client=dynamodb_table)
+        assert (again.scanned, again.archived_users) == (7, 0)
+
+    def test_export_includes_archived_years(self, dynamodb_table, tmp_path):
+        """Exports should still hold every event, attributed to its user."""
+        archive_table("kamaji-test", 2023, client=dynamodb_table)
+        path = tmp_path / "events.ndjson"
+        assert export_table("kamaji-test", path, "ndjson", client=dynamodb_table) == (7, 28)
+        users = {json.loads(line)["user"] for line in path.read_text().splitlines()}
+        assert users == {f"amzn1.ask.account.{i}" for i in range(7)}
+
+    def test_defers_users_with_unfolded_journal(self, dynamodb_table):
+        """Journal entries not yet in the item may target the years to move."""
+        dynamodb_table.put_item(TableName="kamaji-test", Item={
+            "id": {"S": "amzn1.ask.account.0"},
+            "attributes": {"M": {**EXPORTED_ATTRIBUTES, "_journal_seq": {"N": "0"}}},
+        })
+        dynamodb_table.put_item(TableName="kamaji-test", Item={
+            "id": {"S": "amzn1.ask.account.0#journal"},
+            "base": {"N": "0"},
+            "entries": {"L": [{"M": {"op": {"S": "delete"}}}]},
+        })
+        stats = archive_table("kamaji-test", 2023, client=dynamodb_table)
+        assert (stats.archived_users, stats.deferred) == (6, 1)
+
+
+class TestCapacity:
+    """Tests for the capacity-planning report."""
+
+    def _user_item(self, user: str, years: range, events_per_year: int, text: str = "evento") -> dict:
+        days = {}
+        for i in range(events_per_year):
+            day = days.setdefault(f"{i % 12 + 1}-{i % 28 + 1}", {"M": {}})
+            for year in years:
+                day["M"].setdefault(str(year), {"L": []})["L"].append({"S": f"{text} {i}"})
+        return {"id": {"S": user}, "attributes": {"M": days}}
+
+    def test_sizes_growth_and_flags(self):
+        """Large users should be flagged, for archiving if old years weigh and sharding otherwise."""
+        items = [
+            self._user_item("small", range(2022, 2025), 5),
+            self._user_item("old", range(2000, 2025), 60, "x" * 200),
+            self._user_item("recent", range(2023, 2025), 400, "x" * 400),
+            {"id": {"S": "small#journal"}, "base": {"N": "0"}, "entries": {"L": [{"M": {"op": {"S": "add"}}}]}},
+        ]
+        report = measure_capacity(items, current_year=2025, keep_years=5)
+        users = {user.user: user for user in report.users}
+
+        assert [user.user for user in report.users] == ["recent", "old", "small"]
+        assert users["small"].events == 15 and users["small"].growth == 5
+        assert users["small"].journal_size > 0 and not users["small"].flags
+        assert users["old"].flags == ["archive"]
+        assert users["recent"].flags == ["shard"]
+        assert report.years_per_day[25] == 60
+
+    def test_intent_costs_follow_item_size(self):
+        """Reads should cost per 4 KB of the item, writes per 1 KB, journal appends per journal size."""
+        items = [
+            self._user_item("a", range(2024, 2025), 100, "x" * 100),
+            self._user_item("b", range(2024, 2025), 100, "x" * 100),
+            {"id": {"S": "b#journal"}, "base": {"N": "0"}, "entries": {"L": []}},
+        ]
+        report = measure_capacity(items, current_year=2025)
+        size = report.users[0].item_size
+        retrieve, add = report.intents["RetrieveEvents"], report.intents["AddEventComplete"]
+        assert retrieve["rcu_p99"] == pytest.approx(-(-size // 4096) + 1, abs=0.1)
+        assert add["wcu_mean"] == (-(-size // 1024) + 1) / 2
+
+    def test_capacity_command_scans_the_table(self, dynamodb_table, tmp_path):
+        """The command should write the JSON report and print the summary."""
+        output = tmp_path / "capacity.json"
+        result = CliRunner().invoke(capacity_report, [
+            "--table-name", "kamaji-test", "--region", "eu-west-1", "--segments", "2",
+            "--output-file-path", str(output),
+        ])
+        assert result.exit_code == 0, result.output
+        report = json.loads(output.read_text())
+        assert len(report["users"]) == 7
+        assert report["users"][0]["events"] == 4
+        assert "7 users" in result.output and "AddEventComplete" in result.output
+
+
+class TestSyntheticGenerator:
+    """Tests for the synthetic dataset generator."""
+
+    def test_is_deterministic_by_seed(self):
+        """Same seed and user index should produce the same history."""
+        config = GeneratorConfig(events=200, seed=7)
+        assert generate_user(3, config) == generate_user(3, config)
+        assert generate_user(3, config) != generate_user(3, GeneratorConfig(events=200, seed=8))
+
+    def test_generates_requested_events_on_valid_dates(self):
+        """Every generated event should sit on a real calendar date."""
+        _, attributes = generate_user(0, GeneratorConfig(events=500))
+        arrays = parse_activities([("u", to_typed(attributes))])
+        assert int(arrays.count.sum()) == 500
+        assert compute_calendar_analytics(arrays).invalid_events == 0
+
+    @pytest.mark.parametrize("output_format,file_name", [
+        ("csv", "synthetic.csv"),
+        ("dynamodb-json", "synthetic.json"),
+    ])
+    def test_export_shapes_are_readable(self, tmp_path, output_format, file_name):
+        """CSV and DynamoDB JSON outputs should read back into the same aggregation."""
+        config = GeneratorConfig(users=3, events=100)
+        path = tmp_path / file_name
+        assert write_dataset(config, path, output_format, workers=1) == 3
+        arrays = parse_activities(read_activities(path))
+        assert len(arrays.users) == 3
+        assert int(arrays.count.sum()) == 300
+
+    def test_local_format_matches_persistence_layout(self, tmp_path):
+        """The local format should write one plain attributes file per user."""
+        write_dataset(GeneratorConfig(users=2, events=10), tmp_path, "local", workers=1)
+        files = sorted(tmp_path.glob("*.json"))
+        assert len(files) == 2
+        attributes = json.loads(files[0].read_text())
+        assert all(isinstance(events, list) for years in attributes.values() for events in years.values())
+
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+DTSTART;VALUE=DATE:20230315
+SUMMARY:compleanno di Luca\\, con la torta
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20220820T100000Z
+SUMMARY:siamo andati al mare con i nonni e abbiamo
+  visto i delfini
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class TestImport:
+    """Tests for the bulk importer."""
+
+    def test_reads_ics_with_folded_lines(self, tmp_path):
+        """Should unfold and unescape SUMMARY values and parse both DTSTART forms."""
+        path = tmp_path / "diary.ics"
+        path.write_text(ICS_CONTENT)
+        entries = list(read_entries(path, "ics", "amzn1.ask.account.TEST"))
+        assert [(e.date.isoformat(), e.description) for e in entries] == [
+            ("2023-03-15", "compleanno di Luca, con la torta"),
+            ("2022-08-20", "siamo andati al mare con i nonni e abbiamo visto i delfini"),
+        ]
+
+    def test_merge_appends_and_skips_duplicates(self, tmp_path):
+        """Imported events should be appended to existing years, once."""
+        path = tmp_path / "diary.jsonl"
+        path.write_text(
+            '{"user": "u", "date": "2023-03-15", "description": "compleanno di Luca"}\n'
+            '{"user": "u", "date": "2023-03-15", "description": "gita al lago"}\n'
+        )
+        attributes = {"3-15": {"2023": ["compleanno di Luca"]}}
+        imported, skipped = merge_entries(attributes, read_entries(path, "jsonl", None))
+        assert (imported, skipped) == (1, 1)
+        assert attributes == {"3-15": {"2023": ["compleanno di Luca", "gita al lago"]}}
+
+    def test_dry_run_reports_item_sizes(self):
+        """Dry runs should compute sizes without a table."""
+        grouped = {"u": [ImportEntry("u", date(2024, 1, 1), "capodanno")]}
+        [result] = import_entries(grouped, dry_run=True)
+        assert result.imported == 1
+        assert not result.written
+        assert result.item_size == item_size(to_item("u", {
+            "1-1": {"2024": ["capodanno"]}, "_tags": {"feste": ["1-1/2024/0"]},
+            "_schema_version": CURRENT_SCHEMA_VERSION, "_version": 1,
+        }))
+
+    def test_writes_batches_and_merges_existing_items(self, dynamodb_table, tmp_path):
+        """Should merge with stored items and write every user."""
+        path = tmp_path / "diary.csv"
+        rows = ["user,date,description", "amzn1.ask.account.0,2023-03-15,torta"]
+        rows += [f"new-{i},2020-01-0{i % 9 + 1},evento {i}" for i in range(40)]
+        path.write_text("\n".join(rows) + "\n")
+
+        grouped = group_by_user(read_entries(path, "csv", None))
+        results = import_entries(grouped, client=dynamodb_table, table_name="kamaji-test", workers=3)
+        assert all(r.written for r in results)
+
+        stored = dict(scan_activities("kamaji-test", client=dynamodb_table))
+        assert len(stored) == 7 + 40
+        assert stored["amzn1.ask.account.0"]["3-15"]["M"]["2023"]["L"][-1] == {"S": "torta"}
+
+    def test_import_survives_injected_partial_failures(self, dynamodb_table, monkeypatch):
+        """Writes throttled by the table should all land eventually."""
+        monkeypatch.setenv("KAMAJI_DYNAMODB_FAULTS", "throttle=0.4;seed=3;operations=PutItem")
+        client = dynamodb_client("eu-west-1")
+        grouped = {f"new-{i}": [ImportEntry(f"new-{i}", date(2020, 1, 1), "capodanno")] for i in range(30)}
+        results = import_entries(grouped, client=client, table_name="kamaji-test", workers=1)
+        # A write retried by botocore may have landed already: the conditional retry then finds it stored
+        assert not any(r.error for r in results)
+        stored = dict(scan_activities("kamaji-test", client=dynamodb_table))
+        assert all(stored[user]["1-1"]["M"]["2020"]["L"] == [{"S": "capodanno"}] for user in grouped)
+
+    def test_merges_again_after_concurrent_saves(self, dynamodb_table):
+        """A save by the skill between read and write should be kept, and the version incremented."""
+        client = dynamodb_client("eu-west-1")
+        stale = deserialize_map({"M": EXPORTED_ATTRIBUTES})
+        saved = {**stale, "12-25": {"2023": ["natale dai nonni"]}, "_version": 1}
+        client.put_item(TableName="kamaji-test", Item=to_item("amzn1.ask.account.0", saved))
+
+        result = import_user(client, "kamaji-test", "amzn1.ask.account.0",
+                             [ImportEntry("amzn1.ask.account.0", date(2024, 1, 1), "capodanno")], stale, backoff_base=0)
+        assert result.written
+
+        stored = deserialize_map(client.get_item(
+            TableName="kamaji-test", Key={"id": {"S": "amzn1.ask.account.0"}},
+        )["Item"]["attributes"])
+        assert stored["12-25"] == {"2023": ["natale dai nonni"]}
+        assert stored["1-1"]["2024"] == ["capodanno"]
+        assert stored["_version"] == 2
+
+    def test_indexes_imported_events_by_category(self, dynamodb_table):
+        """Imported events should be found by category, with the events already stored."""
+        grouped = {"amzn1.ask.account.0": [ImportEntry("amzn1.ask.account.0", date(2024, 7, 1), "vacanza al mare")]}
+        import_entries(grouped, client=dynamodb_table, table_name="kamaji-test")
+
+        stored = deserialize_map(dynamodb_table.get_item(
+            TableName="kamaji-test", Key={"id": {"S": "amzn1.ask.account.0"}},
+        )["Item"]["attributes"])
+        assert events_by_tag(stored, "viaggi") == [
+            ("8-20", "2021", "siamo andati al mare"), ("3-15", "2023", "gita al lago"), ("7-1", "2024", "vacanza al mare"),
+        ]
+        assert stored[SCHEMA_VERSION_KEY] == CURRENT_SCHEMA_VERSION
@@ -0,0 +1,954 @@
+"""Tests for the persistence adapters."""
+
+import importlib.util
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Optional
+from unittest.mock import ANY, MagicMock
+
+import pytest
+from ask_sdk_core.attributes_manager import AttributesManager
+from ask_sdk_core.exceptions import PersistenceException
+from ask_sdk_model import Context, IntentRequest, Person, RequestEnvelope, User
+from ask_sdk_model.interfaces.system import SystemState
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from persistence import codec
+from persistence import (
+    ARCHIVE_KEY,
+    CURRENT_SCHEMA_VERSION,
+    DAY_READER_ATTR,
+    HOUSEHOLD_VIEW_ATTR,
+    ITEM_LOADED_ATTR,
+    JOURNAL_KEY,
+    PENDING_KEY,
+    PERSONS_KEY,
+    RECURRING_KEY,
+    RECURRING_YEAR,
+    REQUESTS_KEY,
+    SCHEMA_VERSION_KEY,
+    TAGS_KEY,
+    VERSION_KEY,
+    ArchivingPersistenceAdapter,
+    ConcurrentModificationError,
+    DayReader,
+    Deadline,
+    DeadlineExceededError,
+    DeadlinePersistenceAdapter,
+    JSON_BACKENDS,
+    FaultInjector,
+    HouseholdPersistenceAdapter,
+    HouseholdView,
+    JournalingPersistenceAdapter,
+    LazyAttributes,
+    LatencyInjectingAdapter,
+    LocalArchiveStore,
+    LocalJournalStore,
+    LocalPersistenceAdapter,
+    MigratingPersistenceAdapter,
+    ResponseCache,
+    archive_years,
+    bound_client_calls,
+    deserialize_map,
+    events_by_tag,
+    is_request_applied,
+    item_version,
+    load_json_backend,
+    mark_request,
+    merge_days,
+    migrate_attributes,
+    person_partition_keygen,
+    project_day,
+    rebuild_tag_index,
+    recurring_events,
+    serialize_map,
+    set_deadline,
+)
+from utils import (
+    add_event_to_persistence,
+    add_recurring_event_to_persistence,
+    delete_event_from_persistence,
+    get_events_by_tag,
+    get_household_events_by_tag,
+    get_events_for_day,
+    has_archived_years,
+    hydrate_archived_years,
+    undo_last_change,
+    update_event_in_persistence,
+)
+
+
+def _envelope(user_id: str = "amzn1.ask.account.TEST") -> MagicMock:
+    envelope = MagicMock()
+    envelope.context.system.user.user_id = user_id
+    return envelope
+
+
+class TestLocalPersistenceAdapter:
+    """Tests for LocalPersistenceAdapter."""
+
+    def test_returns_empty_dict_for_unknown_user(self, tmp_path):
+        """Should behave like an item that was never saved."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        assert adapter.get_attributes(_envelope()) == {}
+
+    def test_round_trips_attributes(self, tmp_path):
+        """Saved attributes should be read back unchanged."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        attributes = {"3-15": {"2024": ["compleanno di Luca"]}}
+        adapter.save_attributes(_envelope(), attributes)
+        assert adapter.get_attributes(_envelope()) == attributes
+        assert adapter.get_attributes(_envelope("other")) == {}
+
+    def test_delete_attributes(self, tmp_path):
+        """Deleting should remove the user's item."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        adapter.save_attributes(_envelope(), {"1-1": {"2024": ["capodanno"]}})
+        adapter.delete_attributes(_envelope())
+        assert adapter.get_attributes(_envelope()) == {}
+
+
+class TestSchemaMigrations:
+    """Tests for the versioned attributes schema."""
+
+    def test_normalizes_legacy_day_keys(self):
+        """Zero-padded days should merge into the skill's "M-D" keys."""
+        attributes = {"03-05": {"2023": ["gita"]}, "3-5": {"2023": ["pizza"], "2024": []}}
+        assert migrate_attributes(attributes, target_version=1)
+        assert attributes == {"3-5": {"2023": ["gita", "pizza"]}, SCHEMA_VERSION_KEY: 1}
+
+    def test_current_and_newer_versions_are_left_alone(self):
+        """Migrating is a no-op once up to date, and never downgrades."""
+        attributes = {"1-1": {"2024": ["capodanno"]}, SCHEMA_VERSION_KEY: CURRENT_SCHEMA_VERSION + 1}
+        assert not migrate_attributes(attributes)
+        assert attributes[SCHEMA_VERSION_KEY] == CURRENT_SCHEMA_VERSION + 1
+
+
+class TestMigratingPersistenceAdapter:
+    """Tests for migrate-on-read."""
+
+    def test_upgrades_and_saves_on_first_read(self, tmp_path):
+        """Legacy items should be migrated and written back when read."""
+        local = LocalPersistenceAdapter(str(tmp_path))
+        local.save_attributes(_envelope(), {"01-01": {"2024": ["capodanno"]}})
+        adapter = MigratingPersistenceAdapter(local)
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["1-1"] == {"2024": ["capodanno"]}
+        assert local.get_attributes(_envelope()) == attributes
+
+    def test_new_users_are_stamped_on_save(self, tmp_path):
+        """Users without an item are not written until they save."""
+        local = LocalPersistenceAdapter(str(tmp_path))
+        adapter = MigratingPersistenceAdapter(local)
+        assert adapter.get_attributes(_envelope()) == {}
+        assert not list(tmp_path.iterdir())
+
+        adapter.save_attributes(_envelope(), {"1-1": {"2024": ["capodanno"]}})
+        assert local.get_attributes(_envelope())[SCHEMA_VERSION_KEY] == CURRENT_SCHEMA_VERSION
+
+
+def _handler_input(
+    adapter, user_id: str = "amzn1.ask.account.TEST", request_id: Optional[str] = None
+) -> MagicMock:
+    """Handler input with a real AttributesManager, as for one skill request."""
+    envelope = _envelope(user_id)
+    envelope.request.request_id = request_id or f"amzn1.echo-api.request.{uuid.uuid4()}"
+    return MagicMock(request_envelope=envelope, attributes_manager=AttributesManager(
+        request_envelope=envelope, persistence_adapter=adapter
+    ))
+
+
+class TestOptimisticConcurrency:
+    """Tests for version-conditioned saves and the retrying helpers."""
+
+    def test_stale_save_is_rejected_with_current_item(self, tmp_path):
+        """Saving attributes read before another save should fail."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        first = adapter.get_attributes(_envelope())
+        second = adapter.get_attributes(_envelope())
+        adapter.save_attributes(_envelope(), {**first, "1-1": {"2024": ["capodanno"]}})
+
+        with pytest.raises(ConcurrentModificationError) as e:
+            adapter.save_attributes(_envelope(), {**second, "1-2": {"2024": ["befana"]}})
+        assert e.value.current_attributes == {"1-1": {"2024": ["capodanno"]}, VERSION_KEY: 1}
+
+    def test_lost_race_is_reapplied(self, tmp_path):
+        """Two devices adding on the same stale read should both keep their event."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        kitchen, bedroom = _handler_input(adapter), _handler_input(adapter)
+        kitchen.attributes_manager.persistent_attributes
+        bedroom.attributes_manager.persistent_attributes
+
+        add_event_to_persistence(kitchen, "3-15", "2024", "compleanno di Luca")
+        add_event_to_persistence(bedroom, "3-15", "2024", "gita al lago")
+
+        stored = adapter.get_attributes(_envelope())
+        assert stored["3-15"] == {"2024": ["compleanno di Luca", "gita al lago"]}
+        assert item_version(stored) == 2
+
+    def test_delete_follows_concurrently_shifted_event(self, tmp_path):
+        """A delete racing with another delete should remove the event it was about."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        adapter.save_attributes(_envelope(), {"3-15": {"2024": ["a", "b", "c"]}})
+        kitchen, bedroom = _handler_input(adapter), _handler_input(adapter)
+        kitchen.attributes_manager.persistent_attributes
+        bedroom.attributes_manager.persistent_attributes
+
+        delete_event_from_persistence(kitchen, "3-15", "2024", 0)
+        assert delete_event_from_persistence(bedroom, "3-15", "2024", 2) == ["b"]
+
+    def test_contended_adds_lose_nothing(self, tmp_path):
+        """Many devices adding at once should all land, each with its own save."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        devices, adds = 4, 15
+
+        def device(d: int) -> None:
+            for i in range(adds):
+                add_event_to_persistence(_handler_input(adapter), "12-25", "2024", f"evento {d}-{i}")
+
+        with ThreadPoolExecutor(max_workers=devices) as executor:
+            list(executor.map(device, range(devices)))
+
+        stored = adapter.get_attributes(_envelope())
+        assert sorted(stored["12-25"]["2024"]) == sorted(
+            f"evento {d}-{i}" for d in range(devices) for i in range(adds)
+        )
+        assert item_version(stored) == devices * adds
+
+
+@pytest.fixture
+def versioned_dynamodb_adapter(monkeypatch):
+    """VersionedDynamoDbAdapter over a moto table."""
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-1")
+    with moto.mock_aws():
+        import boto3
+        from persistence.dynamodb import VersionedDynamoDbAdapter
+
+        resource = boto3.resource("dynamodb", region_name="eu-west-1")
+        resource.create_table(
+            TableName="kamaji-test",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield VersionedDynamoDbAdapter(table_name="kamaji-test", dynamodb_resource=resource)
+
+
+@pytest.fixture
+def dynamodb_journal_store(versioned_dynamodb_adapter):
+    """DynamoDbJournalStore on the same moto table."""
+    from persistence.dynamodb import DynamoDbJournalStore
+
+    return DynamoDbJournalStore("kamaji-test", versioned_dynamodb_adapter.dynamodb)
+
+
+class TestVersionedDynamoDbAdapter:
+    """Tests for version-conditioned DynamoDB saves."""
+
+    def test_saves_bump_the_version(self, versioned_dynamodb_adapter):
+        """Each save should store and hand back the next version."""
+        attributes = {"1-1": {"2024": ["capodanno"]}}
+        versioned_dynamodb_adapter.save_attributes(_envelope(), attributes)
+        versioned_dynamodb_adapter.save_attributes(_envelope(), attributes)
+        assert item_version(attributes) == 2
+        assert item_version(versioned_dynamodb_adapter.get_attributes(_envelope())) == 2
+
+    def test_stale_save_is_rejected_with_current_item(self, versioned_dynamodb_adapter):
+        """A save based on an outdated read should fail with the stored item."""
+        versioned_dynamodb_adapter.save_attributes(_envelope(), {"1-1": {"2024": ["capodanno"]}})
+        with pytest.raises(ConcurrentModificationError) as e:
+            versioned_dynamodb_adapter.save_attributes(_envelope(), {"1-2": {"2024": ["befana"]}})
+        assert e.value.current_attributes["1-1"] == {"2024": ["capodanno"]}
+        assert item_version(e.value.current_attributes) == 1
+
+    def test_journal_items_append_and_trim(self, dynamodb_journal_store):
+        """Journal items should grow by appends and shrink from the front."""
+        store = dynamodb_journal_store
+        mutation = {"op": "add", "day": "1-1", "year": "2024", "index": 0, "text": "capodanno"}
+        assert store.append("u", [mutation, mutation]) == (0, 2)
+        assert store.append("u", [mutation]) == (0, 3)
+
+        store.trim("u", 0, 2)
+        store.trim("u", 0, 3)  # stale base: ignored
+        base, entries = store.read("u")
+        assert (base, len(entries)) == (2, 1)
+        assert entries[0]["text"] == "capodanno"
+
+
+class TestLazyAttributes:
+    """Tests for attributes decoded one key at a time."""
+
+    def _raw(self):
+        from boto3.dynamodb.types import TypeSerializer
+
+        serializer = TypeSerializer()
+        attributes = {"3-15": {"2024": ["gita"]}, "3-16": {"2024": ["cena"]}, VERSION_KEY: 3}
+        return {key: serializer.serialize(value) for key, value in attributes.items()}
+
+    def test_only_touched_keys_are_decoded_and_encoded(self):
+        """Keys never accessed should be written back as they were read."""
+        raw = self._raw()
+        attributes = LazyAttributes(raw)
+        attributes["3-15"]["2024"].append("pizza")
+        attributes.setdefault("3-17", {})["2024"] = ["cinema"]
+
+        assert attributes.decoded_keys == {"3-15", "3-17"}
+        assert set(attributes) == {"3-15", "3-16", "3-17", VERSION_KEY}
+        values = attributes.to_attribute_values()
+        assert values["3-16"] is raw["3-16"]
+        assert values["3-15"] == {"M": {"2024": {"L": [{"S": "gita"}, {"S": "pizza"}]}}}
+
+    def test_copies_do_not_share_decoded_values(self):
+        """Deep copies should decode on their own, from the same typed values."""
+        import copy
+
+        attributes = LazyAttributes(self._raw())
+        attributes["3-15"]
+        clone = copy.deepcopy(attributes)
+        clone["3-15"]["2024"].clear()
+        del clone["3-16"]
+        assert attributes["3-15"] == {"2024": ["gita"]}
+        assert "3-16" in attributes and "3-16" not in clone
+
+    def test_dynamodb_items_are_read_lazily(self, versioned_dynamodb_adapter):
+        """Whole-item reads should decode only what helpers touch, and save the rest unchanged."""
+        adapter = versioned_dynamodb_adapter
+        adapter.save_attributes(_envelope(), {"3-15": {"2024": ["gita"]}, "3-16": {"2024": ["cena"]}})
+
+        handler_input = _handler_input(adapter)
+        add_event_to_persistence(handler_input, "3-15", "2024", "pizza")
+        attributes = handler_input.attributes_manager.persistent_attributes
+        assert isinstance(attributes, LazyAttributes)
+        assert "3-16" not in attributes.decoded_keys
+
+        stored = adapter.get_attributes(_envelope())
+        assert dict(stored) == {
+            "3-15": {"2024": ["gita", "pizza"]}, "3-16": {"2024": ["cena"]}, REQUESTS_KEY: ANY, VERSION_KEY: 2
+        }
+
+
+def _journaling_adapter(tmp_path, threshold: int = 50, undo_window: int = 10) -> JournalingPersistenceAdapter:
+    return JournalingPersistenceAdapter(
+        LocalPersistenceAdapter(str(tmp_path)),
+        LocalJournalStore(str(tmp_path)),
+        compaction_threshold=threshold,
+        undo_window=undo_window,
+    )
+
+
+class TestJournal:
+    """Tests for the append-only journal and its compaction."""
+
+    def test_changes_are_appended_not_rewritten(self, tmp_path):
+        """After the first save, helpers should only append to the journal."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2023", "compleanno di Luca")
+        snapshot = LocalPersistenceAdapter(str(tmp_path)).get_attributes(_envelope())
+
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "gita al lago")
+        update_event_in_persistence(_handler_input(adapter), "3-15", "2024", 0, "gita al mare")
+        delete_event_from_persistence(_handler_input(adapter), "3-15", "2023", 0)
+
+        assert LocalPersistenceAdapter(str(tmp_path)).get_attributes(_envelope()) == snapshot
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"] == {"2024": ["gita al mare"]}
+        assert [entry["op"] for entry in attributes[JOURNAL_KEY]] == ["add", "edit", "delete"]
+
+    def test_compaction_folds_and_trims(self, tmp_path):
+        """Past the threshold the journal should fold into the snapshot, keeping the undo window."""
+        adapter = _journaling_adapter(tmp_path, threshold=5, undo_window=2)
+        for i in range(8):
+            add_event_to_persistence(_handler_input(adapter), "1-1", "2024", f"evento {i}")
+
+        snapshot = LocalPersistenceAdapter(str(tmp_path)).get_attributes(_envelope())
+        base, entries = LocalJournalStore(str(tmp_path)).read("amzn1.ask.account.TEST")
+        assert len(snapshot["1-1"]["2024"]) == 6
+        assert (base, len(entries)) == (3, 4)
+        assert adapter.get_attributes(_envelope())["1-1"]["2024"] == [f"evento {i}" for i in range(8)]
+
+    def test_undo_walks_back_through_changes(self, tmp_path):
+        """Each undo should revert the latest change not undone yet."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "a")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "b")
+        update_event_in_persistence(_handler_input(adapter), "3-15", "2024", 0, "A")
+        delete_event_from_persistence(_handler_input(adapter), "3-15", "2024", 1)
+
+        assert undo_last_change(_handler_input(adapter))["op"] == "delete"
+        assert adapter.get_attributes(_envelope())["3-15"]["2024"] == ["A", "b"]
+        assert undo_last_change(_handler_input(adapter))["op"] == "edit"
+        assert undo_last_change(_handler_input(adapter))["text"] == "b"
+        assert adapter.get_attributes(_envelope())["3-15"]["2024"] == ["a"]
+
+    def test_nothing_to_undo_without_journal(self, tmp_path):
+        """Plain adapters keep no history to undo."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "a")
+        assert undo_last_change(_handler_input(adapter)) is None
+        assert PENDING_KEY not in adapter.get_attributes(_envelope())
+
+
+class TestIdempotency:
+    """Tests for the suppression of writes by retried requests."""
+
+    def test_retried_add_is_saved_once(self, tmp_path):
+        """A retry of an add whose save landed should not add the event again."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        add_event_to_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", "gita")
+        add_event_to_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", "gita")
+        add_event_to_persistence(_handler_input(adapter, request_id="req-2"), "3-15", "2024", "gita")
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"]["2024"] == ["gita", "gita"]
+        assert set(attributes[REQUESTS_KEY]) == {"req-1", "req-2"}
+        assert item_version(attributes) == 2
+
+    def test_retried_delete_removes_one_event(self, tmp_path):
+        """A retried delete should not delete an identical event as well."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        adapter.save_attributes(_envelope(), {"3-15": {"2024": ["gita", "gita"]}})
+        delete_event_from_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", 0)
+        remaining = delete_event_from_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", 0)
+
+        assert remaining == ["gita"]
+        assert adapter.get_attributes(_envelope())["3-15"]["2024"] == ["gita"]
+
+    def test_retried_add_is_recognized_from_the_journal(self, tmp_path):
+        """With a journal the request id should travel in the appended entry."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "1-1", "2024", "capodanno")
+        add_event_to_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", "gita")
+        add_event_to_persistence(_handler_input(adapter, request_id="req-1"), "3-15", "2024", "gita")
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"]["2024"] == ["gita"]
+        assert [entry.get("request") for entry in attributes[JOURNAL_KEY]] == ["req-1"]
+
+    def test_retried_undo_reverts_one_change(self, tmp_path):
+        """A retried undo should report its change again, not undo an older one."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "1-1", "2024", "capodanno")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "a")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "b")
+
+        assert undo_last_change(_handler_input(adapter, request_id="req-1"))["text"] == "b"
+        retried = undo_last_change(_handler_input(adapter, request_id="req-1"))
+        assert (retried["op"], retried["text"]) == ("add", "b")
+        assert adapter.get_attributes(_envelope())["3-15"]["2024"] == ["a"]
+
+    def test_markers_expire_and_are_pruned(self):
+        """Expired markers should neither match nor survive the next write."""
+        attributes = {}
+        mark_request(attributes, "req-1", ttl=10, now=1000)
+        assert is_request_applied(attributes, "req-1", now=1005)
+        assert not is_request_applied(attributes, "req-1", now=1011)
+
+        mark_request(attributes, "req-2", ttl=10, now=1011)
+        assert list(attributes[REQUESTS_KEY]) == ["req-2"]
+        assert not is_request_applied(attributes, None)
+
+    def test_response_cache_is_a_bounded_lru_with_ttl(self):
+        """Entries should expire, and the least recently used go first."""
+        now = [0.0]
+        cache = ResponseCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.put("a", "response a", {"step": 1})
+        cache.put("b", "response b", None)
+        assert cache.get("a") == ("response a", {"step": 1})
+        cache.put("c", "response c", None)
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        now[0] = 10.0
+        assert cache.get("a") is None
+
+
+class TestRecurringEvents:
+    """Tests for events stored once and repeated every year."""
+
+    def test_copies_in_single_years_are_folded(self, tmp_path):
+        """A birthday re-added every year should become one recurring event."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        adapter.save_attributes(_envelope(), {"3-15": {
+            "2019": ["compleanno di Luca"],
+            "2020": ["compleanno di Luca", "gita"],
+        }})
+
+        assert add_recurring_event_to_persistence(_handler_input(adapter), "3-15", "compleanno di Luca")
+        assert not add_recurring_event_to_persistence(_handler_input(adapter), "3-15", "compleanno di Luca")
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"] == {"2020": ["gita"]}
+        assert attributes[RECURRING_KEY] == {"3-15": [{"text": "compleanno di Luca", "start": 2019}]}
+
+    def test_bounded_recurrences_only_occur_in_their_years(self):
+        """Start and end years should both be included."""
+        attributes = {RECURRING_KEY: {"8-20": [
+            {"text": "festa del paese"},
+            {"text": "vacanze al mare", "start": 2015, "end": 2020},
+        ]}}
+        assert [r["text"] for r in recurring_events(attributes, "8-20", 2015)] == [
+            "festa del paese", "vacanze al mare",
+        ]
+        assert [r["text"] for r in recurring_events(attributes, "8-20", 2021)] == ["festa del paese"]
+
+    def test_edit_and_delete_through_the_recurring_year(self, tmp_path):
+        """The pseudo-year used while navigating should reach the recurring events."""
+        adapter = LocalPersistenceAdapter(str(tmp_path))
+        add_recurring_event_to_persistence(_handler_input(adapter), "3-15", "compleanno", start_year=1990)
+        add_recurring_event_to_persistence(_handler_input(adapter), "3-15", "onomastico")
+
+        assert update_event_in_persistence(_handler_input(adapter), "3-15", RECURRING_YEAR, 0, "compleanno di Luca")
+        assert delete_event_from_persistence(_handler_input(adapter), "3-15", RECURRING_YEAR, 1) == [
+            "compleanno di Luca",
+        ]
+        assert adapter.get_attributes(_envelope())[RECURRING_KEY] == {
+            "3-15": [{"text": "compleanno di Luca", "start": 1990}],
+        }
+
+        delete_event_from_persistence(_handler_input(adapter), "3-15", RECURRING_YEAR, 0)
+        assert RECURRING_KEY not in adapter.get_attributes(_envelope())
+
+    def test_journaled_items_save_recurring_events(self, tmp_path):
+        """Recurring changes should rewrite the snapshot and survive journal folding."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2023", "compleanno")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "compleanno")
+        add_recurring_event_to_persistence(_handler_input(adapter), "3-15", "compleanno")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "gita")
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"] == {"2024": ["gita"]}
+        assert attributes[RECURRING_KEY]["3-15"] == [{"text": "compleanno", "start": 2023}]
+
+
+def _archiving_adapter(tmp_path, attributes, horizon_year: int) -> ArchivingPersistenceAdapter:
+    """Archiving adapter over a local item whose years before the horizon were rolled over."""
+    local = LocalPersistenceAdapter(str(tmp_path))
+    archive = LocalArchiveStore(str(tmp_path))
+    archive.write("amzn1.ask.account.TEST", archive_years(attributes, horizon_year))
+    local.save_attributes(_envelope(), attributes)
+    return ArchivingPersistenceAdapter(local, archive)
+
+
+class TestArchive:
+    """Tests for the archive of old years and their hydration."""
+
+    def test_archive_years_splits_at_the_horizon(self):
+        """Old years should move out, with an index of what moved."""
+        attributes = {"3-15": {"2010": ["gita"], "2024": ["compleanno"]}, "8-20": {"2011": ["mare"]}}
+        moved = archive_years(attributes, 2020)
+        assert moved == {"3-15": {"2010": ["gita"]}, "8-20": {"2011": ["mare"]}}
+        assert attributes == {"3-15": {"2024": ["compleanno"]}, ARCHIVE_KEY: {"3-15": ["2010"], "8-20": ["2011"]}}
+
+    def test_merging_twice_adds_nothing(self):
+        """An interrupted move merged again should not duplicate events."""
+        target = {"3-15": {"2010": ["gita", "gita"]}}
+        merge_days(target, {"3-15": {"2010": ["gita", "gita", "pizza"]}})
+        merge_days(target, {"3-15": {"2010": ["gita", "pizza"]}})
+        assert target == {"3-15": {"2010": ["gita", "gita", "pizza"]}}
+
+    def test_old_years_are_only_read_when_asked_for(self, tmp_path):
+        """Retrieval should read the day's archived years only on request, moving nothing back."""
+        attributes = {"3-15": {"2010": ["gita"], "2024": ["compleanno"]}, "8-20": {"2011": ["mare"]}}
+        adapter = _archiving_adapter(tmp_path, attributes, 2020)
+
+        handler_input = _day_reading_input(adapter)
+        assert get_events_for_day(handler_input, "3-15") == {"2024": ["compleanno"]}
+        assert has_archived_years(handler_input, "3-15")
+
+        assert get_events_for_day(handler_input, "3-15", include_archived=True) == {
+            "2010": ["gita"], "2024": ["compleanno"],
+        }
+        assert adapter.get_attributes(_envelope())[ARCHIVE_KEY] == {"3-15": ["2010"], "8-20": ["2011"]}
+        assert LocalArchiveStore(str(tmp_path)).read("amzn1.ask.account.TEST") == {
+            "3-15": {"2010": ["gita"]}, "8-20": {"2011": ["mare"]},
+        }
+
+    def test_day_with_only_archived_years_is_read_from_the_archive(self, tmp_path):
+        """A day with no recent years should be told from the archive, which is left as it is."""
+        adapter = _archiving_adapter(tmp_path, {"8-20": {"2011": ["mare"]}}, 2020)
+        handler_input = _day_reading_input(adapter)
+        assert get_events_for_day(handler_input, "8-20") == {"2011": ["mare"]}
+        assert ITEM_LOADED_ATTR not in handler_input.attributes_manager.request_attributes
+        assert adapter.get_attributes(_envelope())[ARCHIVE_KEY] == {"8-20": ["2011"]}
+        assert LocalArchiveStore(str(tmp_path)).read("amzn1.ask.account.TEST") == {"8-20": {"2011": ["mare"]}}
+
+    def test_editing_an_archived_year_brings_the_day_back(self, tmp_path):
+        """An edit should move the day's archived years back into the item first."""
+        adapter = _archiving_adapter(tmp_path, {
+            "3-15": {"2010": ["gita", "festa di compleanno"], "2024": ["pizza"]}, "8-20": {"2011": ["mare"]},
+        }, 2020)
+        assert update_event_in_persistence(_handler_input(adapter), "3-15", "2010", 0, "gita al lago")
+
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"] == {"2010": ["gita al lago", "festa di compleanno"], "2024": ["pizza"]}
+        assert attributes[ARCHIVE_KEY] == {"8-20": ["2011"]}
+        # The years brought back are indexed by category
+        assert events_by_tag(attributes, "compleanni") == [("3-15", "2010", "festa di compleanno")]
+        assert LocalArchiveStore(str(tmp_path)).read("amzn1.ask.account.TEST") == {"8-20": {"2011": ["mare"]}}
+
+    def test_hydration_retries_on_concurrent_save(self, tmp_path):
+        """A save by another device between read and hydration should not be lost."""
+        adapter = _archiving_adapter(tmp_path, {"3-15": {"2010": ["gita"], "2024": ["compleanno"]}}, 2020)
+        handler_input = _handler_input(adapter)
+        handler_input.attributes_manager.persistent_attributes
+        add_event_to_persistence(_handler_input(adapter), "1-1", "2025", "capodanno")
+
+        assert hydrate_archived_years(handler_input)
+        attributes = adapter.get_attributes(_envelope())
+        assert attributes["3-15"] == {"2010": ["gita"], "2024": ["compleanno"]}
+        assert attributes["1-1"] == {"2025": ["capodanno"]}
+
+    def test_dynamodb_archive_store_round_trip(self, versioned_dynamodb_adapter):
+        """Archives should be stored compressed in their own item."""
+        from persistence.dynamodb import DynamoDbArchiveStore
+
+        store = DynamoDbArchiveStore("kamaji-test", versioned_dynamodb_adapter.dynamodb)
+        assert store.read("amzn1.ask.account.TEST") == {}
+        store.write("amzn1.ask.account.TEST", {"8-20": {"2011": ["mare"]}})
+        assert store.read("amzn1.ask.account.TEST") == {"8-20": {"2011": ["mare"]}}
+        store.delete("amzn1.ask.account.TEST")
+        assert store.read("amzn1.ask.account.TEST") == {}
+
+
+@pytest.fixture
+def deadline():
+    """Set a request deadline this many seconds away, cleared after the test."""
+    yield lambda seconds: set_deadline(Deadline.from_context(
+        MagicMock(get_remaining_time_in_millis=lambda: (seconds + 0.5) * 1000)
+    ))
+    set_deadline(None)
+
+
+class TestDeadline:
+    """Tests for persistence calls bounded by the Lambda's remaining time."""
+
+    def _slow_adapter(self, tmp_path, latencies):
+        local = LocalPersistenceAdapter(str(tmp_path))
+        local.save_attributes(_envelope(), {"1-1": {"2024": ["capodanno"]}})
+        latencies = iter(latencies)
+        return DeadlinePersistenceAdapter(LatencyInjectingAdapter(local, lambda: next(latencies)))
+
+    def test_slow_read_is_served_from_cache(self, tmp_path, deadline):
+        """A read past the deadline should return the last attributes read."""
+        adapter = self._slow_adapter(tmp_path, [0, 1.0])
+        deadline(0.2)
+        assert adapter.get_attributes(_envelope())["1-1"] == {"2024": ["capodanno"]}
+
+        start = time.monotonic()
+        assert adapter.get_attributes(_envelope())["1-1"] == {"2024": ["capodanno"]}
+        assert time.monotonic() - start < 0.5
+
+    def test_slow_read_without_cache_gives_up_in_time(self, tmp_path, deadline):
+        """Without anything cached the read should fail before the deadline passes."""
+        adapter = self._slow_adapter(tmp_path, [1.0])
+        deadline(0.1)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            adapter.get_attributes(_envelope())
+        assert time.monotonic() - start < 0.5
+
+    def test_failed_reads_are_retried_within_budget(self, tmp_path, deadline):
+        """Transient read errors should be retried while time is left."""
+        local = LocalPersistenceAdapter(str(tmp_path))
+        flaky = MagicMock(wraps=local)
+        flaky.get_attributes.side_effect = [PersistenceException("throttled"), {"1-1": {"2024": ["capodanno"]}}]
+        deadline(1.0)
+        assert DeadlinePersistenceAdapter(flaky).get_attributes(_envelope()) == {"1-1": {"2024": ["capodanno"]}}
+
+    def test_slow_save_is_reported_not_retried(self, tmp_path, deadline):
+        """A save past the deadline should raise once, for the skill to ask for a retry."""
+        adapter = self._slow_adapter(tmp_path, [0, 1.0])
+        deadline(0.2)
+        attributes = adapter.get_attributes(_envelope())
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            adapter.save_attributes(_envelope(), {**attributes, "1-2": {"2024": ["befana"]}})
+        assert time.monotonic() - start < 0.5
+
+    def test_client_attempts_time_out_by_the_deadline(self, versioned_dynamodb_adapter, deadline):
+        """Each attempt should get the time left as its read timeout, and none be sent without it."""
+        client = versioned_dynamodb_adapter.client
+        bound_client_calls(client)
+        timeouts = []
+        client.meta.events.register("before-send", lambda request, **kwargs: timeouts.append(request.context["read_timeout"]))
+
+        deadline(0.3)
+        DeadlinePersistenceAdapter(versioned_dynamodb_adapter).get_attributes(_envelope())
+        assert 0 < timeouts[0] <= 0.3
+
+        deadline(0)
+        with pytest.raises(DeadlineExceededError):
+            client.get_item(TableName="kamaji-test", Key={"id": {"S": "amzn1.ask.account.TEST"}})
+        assert len(timeouts) == 1
+
+    def test_no_deadline_calls_through(self, tmp_path):
+        """Without a Lambda context calls should not be bounded."""
+        adapter = self._slow_adapter(tmp_path, [0.05, 0.05])
+        adapter.save_attributes(_envelope(), {**adapter.get_attributes(_envelope()), "1-2": {"2024": ["befana"]}})
+        assert LocalPersistenceAdapter(str(tmp_path)).get_attributes(_envelope())["1-2"] == {"2024": ["befana"]}
+
+
+def _day_reading_input(adapter) -> MagicMock:
+    """Handler input of a request whose handlers read days through a DayReader."""
+    handler_input = _handler_input(adapter)
+    handler_input.attributes_manager.request_attributes[DAY_READER_ATTR] = DayReader(
+        adapter, handler_input.request_envelope
+    )
+    return handler_input
+
+
+class TestDayReads:
+    """Tests for reads of single days."""
+
+    def test_project_day_keeps_the_day_and_metadata(self):
+        """Only the day, its archived and recurring entries and the item metadata are kept."""
+        attributes = {
+            "3-15": {"2024": ["gita"]},
+            "3-16": {"2024": ["cena"]},
+            ARCHIVE_KEY: {"3-15": "blob", "3-16": "other"},
+            RECURRING_KEY: {"3-16": [{"text": "onomastico"}]},
+            VERSION_KEY: 4,
+        }
+        assert project_day(attributes, "3-15") == {
+            "3-15": {"2024": ["gita"]},
+            ARCHIVE_KEY: {"3-15": "blob"},
+            VERSION_KEY: 4,
+        }
+
+    def test_reads_do_not_load_the_whole_item(self, tmp_path):
+        """Read-only requests should go through the DayReader, journal entries included."""
+        adapter = MigratingPersistenceAdapter(_journaling_adapter(tmp_path))
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2023", "compleanno di Luca")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2024", "gita al lago")
+        add_event_to_persistence(_handler_input(adapter), "3-16", "2024", "cena")
+
+        handler_input = _day_reading_input(adapter)
+        assert get_events_for_day(handler_input, "3-15") == {
+            "2023": ["compleanno di Luca"], "2024": ["gita al lago"]
+        }
+        assert ITEM_LOADED_ATTR not in handler_input.attributes_manager.request_attributes
+
+        add_event_to_persistence(handler_input, "3-15", "2024", "pizza")
+        assert get_events_for_day(handler_input, "3-15")["2024"] == ["gita al lago", "pizza"]
+        assert adapter.get_attributes(_envelope())["3-16"] == {"2024": ["cena"]}
+
+    def test_legacy_items_are_read_whole(self, tmp_path):
+        """Items of older schemas should be migrated before a day is picked."""
+        local = LocalPersistenceAdapter(str(tmp_path))
+        local.save_attributes(_envelope(), {"03-15": {"2024": ["gita"]}})
+        day = MigratingPersistenceAdapter(local).get_day_attributes(_envelope(), "3-15")
+        assert day["3-15"] == {"2024": ["gita"]}
+        assert day[SCHEMA_VERSION_KEY] == CURRENT_SCHEMA_VERSION
+
+    def test_dynamodb_reads_project_the_day(self, versioned_dynamodb_adapter):
+        """DynamoDB should hand back the day and the item metadata only."""
+        versioned_dynamodb_adapter.save_attributes(_envelope(), {
+            "3-15": {"2024": ["gita"]},
+            "3-16": {"2024": ["cena"]},
+            RECURRING_KEY: {"3-15": [{"text": "onomastico"}], "3-16": [{"text": "altro"}]},
+        })
+        day = versioned_dynamodb_adapter.get_day_attributes(_envelope(), "3-15")
+        assert day == {
+            "3-15": {"2024": ["gita"]},
+            RECURRING_KEY: {"3-15": [{"text": "onomastico"}]},
+            VERSION_KEY: 1,
+        }
+        assert versioned_dynamodb_adapter.get_day_attributes(_envelope("other"), "3-15") == {}
+
+
+def _member_input(adapter, person: Optional[str]) -> MagicMock:
+    """Handler input of a request by a household member, None for an unrecognized voice."""
+    envelope = RequestEnvelope(
+        context=Context(system=SystemState(
+            user=User(user_id="amzn1.ask.account.TEST"),
+            person=Person(person_id=person) if person else None,
+        )),
+        request=IntentRequest(request_id=f"amzn1.echo-api.request.{uuid.uuid4()}"),
+    )
+    return MagicMock(request_envelope=envelope, attributes_manager=AttributesManager(
+        request_envelope=envelope, persistence_adapter=adapter
+    ))
+
+
+class TestHouseholdPartitions:
+    """Tests for per-member items and the household view over them."""
+
+    def _adapter(self, tmp_path):
+        local = LocalPersistenceAdapter(str(tmp_path), person_partition_keygen)
+        return HouseholdPersistenceAdapter(MigratingPersistenceAdapter(local)), local
+
+    def test_members_write_their_own_items(self, tmp_path):
+        """Recognized voices should get an item each, listed in the household's."""
+        adapter, local = self._adapter(tmp_path)
+        add_event_to_persistence(_member_input(adapter, None), "3-15", "2020", "trasloco")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "3-15", "2024", "gita")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "3-16", "2024", "cena")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.LUCA"), "3-15", "2024", "partita")
+
+        household = local.get_attributes(_member_input(adapter, None).request_envelope)
+        anna = local.get_attributes(_member_input(adapter, "amzn1.ask.person.ANNA").request_envelope)
+        assert household["3-15"] == {"2020": ["trasloco"]}
+        assert household[PERSONS_KEY] == ["amzn1.ask.person.ANNA", "amzn1.ask.person.LUCA"]
+        assert anna["3-15"] == {"2024": ["gita"]} and anna["3-16"] == {"2024": ["cena"]}
+        assert (tmp_path / "amzn1.ask.account.TEST%23person%23amzn1.ask.person.LUCA.json").exists()
+
+    def test_view_merges_members_lazily(self, tmp_path):
+        """The household view should read nothing until asked, then every member's day."""
+        adapter, _ = self._adapter(tmp_path)
+        add_event_to_persistence(_member_input(adapter, None), "3-15", "2024", "compleanno")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "3-15", "2024", "compleanno")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "3-15", "2023", "gita")
+        add_recurring_event_to_persistence(_member_input(adapter, "amzn1.ask.person.LUCA"), "3-15", "onomastico")
+
+        spy = MagicMock(wraps=adapter)
+        view = HouseholdView(spy, _member_input(adapter, "amzn1.ask.person.ANNA").request_envelope)
+        spy.get_day_attributes.assert_not_called()
+
+        day = view("3-15")
+        assert day["3-15"] == {"2024": ["compleanno"], "2023": ["gita"]}
+        assert recurring_events(day, "3-15") == [{"text": "onomastico"}]
+        assert spy.get_day_attributes.call_count == 3
+        view("3-15")
+        assert spy.get_day_attributes.call_count == 3
+
+    def test_category_lookups_span_the_household(self, tmp_path):
+        """The speaker's lookup should only find their events, the household view everyone's."""
+        adapter, _ = self._adapter(tmp_path)
+        add_event_to_persistence(_member_input(adapter, None), "8-20", "2021", "siamo andati al mare")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "8-20", "2021", "siamo andati al mare")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.ANNA"), "3-15", "2023", "gita al lago")
+        add_event_to_persistence(_member_input(adapter, "amzn1.ask.person.LUCA"), "7-1", "2023", "volo per Parigi")
+
+        anna = _member_input(adapter, "amzn1.ask.person.ANNA")
+        assert get_events_by_tag(anna, "viaggi") == [("8-20", "2021", "siamo andati al mare"), ("3-15", "2023", "gita al lago")]
+
+        anna.attributes_manager.request_attributes[HOUSEHOLD_VIEW_ATTR] = HouseholdView(adapter, anna.request_envelope)
+        # The trip told by both the household and Anna is told once
+        assert get_household_events_by_tag(anna, "viaggi") == [
+            ("8-20", "2021", "siamo andati al mare"), ("3-15", "2023", "gita al lago"), ("7-1", "2023", "volo per Parigi"),
+        ]
+        assert get_household_events_by_tag(anna, "viaggi", "2021") == [("8-20", "2021", "siamo andati al mare")]
+
+
+class TestTagIndex:
+    """Tests for the index of the events' categories."""
+
+    def test_helpers_keep_the_index_through_the_journal(self, tmp_path):
+        """Adds, edits, deletes and undos should leave the index as a rebuild would."""
+        adapter = _journaling_adapter(tmp_path)
+        add_event_to_persistence(_handler_input(adapter), "8-10", "2022", "partenza per la Grecia", tags=["viaggi"])
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2022", "compleanno di Luca")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2022", "gita al lago")
+        add_event_to_persistence(_handler_input(adapter), "3-15", "2023", "gita in montagna")
+        update_event_in_persistence(_handler_input(adapter), "3-15", "2022", 0, "cena con Luca")
+        delete_event_from_persistence(_handler_input(adapter), "8-10", "2022", 0)
+        undo_last_change(_handler_input(adapter))
+
+        handler_input = _handler_input(adapter)
+        assert get_events_by_tag(handler_input, "viaggi", "2022") == [
+            ("3-15", "2022", "gita al lago"), ("8-10", "2022", "partenza per la Grecia"),
+        ]
+        assert get_events_by_tag(handler_input, "compleanni") == []
+        attributes = adapter.get_attributes(_envelope())
+        index = attributes[TAGS_KEY]
+        assert not rebuild_tag_index(attributes)
+        assert attributes[TAGS_KEY] == index
+
+    def test_migration_builds_the_index(self, tmp_path):
+        """Items written before the index should get it on first read."""
+        local = LocalPersistenceAdapter(str(tmp_path))
+        local.save_attributes(_envelope(), {
+            "7-1": {"2022": ["vacanze al mare", "trasloco"]}, SCHEMA_VERSION_KEY: 1,
+        })
+        attributes = MigratingPersistenceAdapter(local).get_attributes(_envelope())
+        assert attributes[TAGS_KEY] == {"viaggi": ["7-1/2022/0"]}
+
+        attributes["7-1"]["2022"].pop(0)
+        assert rebuild_tag_index(attributes)
+        assert TAGS_KEY not in attributes
+
+
+class TestCodec:
+    """Tests for the JSON backends and the typed DynamoDB encoding."""
+
+    ATTRIBUTES = {
+        "3-15": {"2023": ["compleanno di Luca", "gita al lago"], "2024": []},
+        "_recurring": {"3-15": [{"text": "onomastico", "start": Decimal(1990)}]},
+        "_tags": {"viaggi": ["3-15/2023/1"]},
+        "_persons": ["amzn1.ask.person.ANNA"],
+        VERSION_KEY: Decimal(3),
+    }
+
+    def test_typed_values_match_boto3(self):
+        """Days take the fast path; every value should encode and decode as with boto3."""
+        typed = TypeSerializer().serialize(self.ATTRIBUTES)
+        assert serialize_map(self.ATTRIBUTES) == typed
+        assert deserialize_map(typed) == TypeDeserializer().deserialize(typed) == self.ATTRIBUTES
+
+    @pytest.mark.parametrize("name", JSON_BACKENDS)
+    def test_backends_round_trip(self, name):
+        """Every installed backend should read back what any of them wrote."""
+        if name != "json":
+            pytest.importorskip(name)
+        backend = load_json_backend(name)
+        data = backend.dumps(self.ATTRIBUTES)
+        assert load_json_backend("json").loads(data)["_recurring"]["3-15"][0]["start"] == 1990
+        assert backend.loads(data.decode("utf-8"))[VERSION_KEY] == 3
+        assert backend.loads_days(load_json_backend("json").dumps({"3-15": self.ATTRIBUTES["3-15"]})) == {
+            "3-15": self.ATTRIBUTES["3-15"],
+        }
+
+    @pytest.mark.parametrize("configured", ["simplejson", "msgspec"])
+    def test_unusable_configured_backend_falls_back(self, monkeypatch, configured):
+        """An unknown or missing $KAMAJI_JSON_BACKEND should not break encoding."""
+        if configured == "msgspec" and importlib.util.find_spec("msgspec"):
+            pytest.skip("msgspec is installed")
+        monkeypatch.setenv("KAMAJI_JSON_BACKEND", configured)
+        monkeypatch.setattr(codec, "_default", None)
+        assert codec.json_backend().name == "json"
+        assert codec.loads(codec.dumps({"3-15": {"2024": ["gita"]}})) == {"3-15": {"2024": ["gita"]}}
+
+
+class TestFaultInjector:
+    """Tests for latency and fault injection into the skill's DynamoDB client."""
+
+    def test_throttled_reads_are_retried_by_botocore(self, versioned_dynamodb_adapter):
+        """Injected throttling should cost attempts, not failed reads."""
+        versioned_dynamodb_adapter.save_attributes(_envelope(), {"1-1": {"2024": ["capodanno"]}})
+        faults = FaultInjector(throttle_rate=0.5, operations=["GetItem"], seed=1)
+        faults.attach(versioned_dynamodb_adapter.client)
+
+        for _ in range(5):
+            assert versioned_dynamodb_adapter.get_attributes(_envelope())["1-1"] == {"2024": ["capodanno"]}
+        counters = faults.counters["GetItem"]
+        assert counters.calls == 5
+        assert counters.throttled > 0
+        assert counters.attempts == counters.calls + counters.throttled
+
+    def test_oversized_items_are_rejected(self, versioned_dynamodb_adapter):
+        """Saves over the item-size limit should fail like DynamoDB's validation."""
+        faults = FaultInjector(max_item_size=1024, operations=["PutItem"])
+        faults.attach(versioned_dynamodb_adapter.client)
+
+        with pytest.raises(PersistenceException, match="maximum allowed size"):
+            versioned_dynamodb_adapter.save_attributes(_envelope(), {"1-1": {"2024": ["x" * 2000]}})
+        assert faults.counters["PutItem"].rejected == 1
+        assert versioned_dynamodb_adapter.get_attributes(_envelope()) == {}
+
+    def test_latency_is_drawn_per_attempt(self, versioned_dynamodb_adapter):
+        """Latency should be recorded for every attempt, with a pluggable sleep."""
+        delays = []
+        faults = FaultInjector(latency=lambda rng: 0.25, operations=["GetItem"], sleep=delays.append)
+        faults.attach(versioned_dynamodb_adapter.client)
+
+        versioned_dynamodb_adapter.get_attributes(_envelope())
+        versioned_dynamodb_adapter.get_attributes(_envelope())
+        assert delays == [0.25, 0.25]
+        assert faults.counters["GetItem"].latency == 0.5